@@ -0,0 +1,40 @@
+#! /usr/bin/env python2.7
+# coding: utf-8
+
+"""
+比较 SortedSet 使用不同 item_type 时，解码结果所占用的内存和所需的时间。
+
+解码的输入是伪造的 ZRANGE ... WITHSCORES 回复，所以不需要连接 Redis 服务器。
+
+用法：
+
+    $ python benchmarks/sorted_set_item_type.py [元素数量]
+"""
+
+import sys
+import timeit
+
+from ooredis.key.sorted_set import SortedSet, ScoredMember
+
+def deep_size(items):
+    """
+    计算结果列表本身以及列表中每个元素所占用的内存，
+    member 和 score 对象由 Redis 回复和解码过程共享，不计算在内。
+    """
+    return sys.getsizeof(items) + sum(sys.getsizeof(item) for item in items)
+
+def main(count):
+    reply = [('member-{0}'.format(i), float(i)) for i in range(count)]
+
+    print('{0:>14} {1:>14} {2:>14}'.format('item_type', 'bytes', 'seconds'))
+
+    for item_type in (dict, tuple, ScoredMember):
+        s = SortedSet('benchmark', item_type=item_type)
+
+        size = deep_size(s._decode_items(reply))
+        seconds = min(timeit.repeat(lambda: s._decode_items(reply), number=10, repeat=3))
+
+        print('{0:>14} {1:>14} {2:>14.4f}'.format(item_type.__name__, size, seconds))
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
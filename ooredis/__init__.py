@@ -4,6 +4,8 @@ __all__ = [
     'connect', 'get_client',
     'type_case',
     'Dict', 'Set', 'SortedSet', 'String', 'Counter', 'Deque',
+    'Leaderboard', 'DelayedQueue', 'TimeSeries', 'ReliableQueue',
+    'WorkerPool',
     '__version__',
 ]
 
@@ -17,5 +19,11 @@ from key.deque import Deque
 from key.string import String
 from key.counter import Counter
 from key.sorted_set import SortedSet
+from key.leaderboard import Leaderboard
+from key.delayed_queue import DelayedQueue
+from key.time_series import TimeSeries
+from key.reliable_queue import ReliableQueue
+
+from worker_pool import WorkerPool
 
 __version__ = "1.9.7"
@@ -14,5 +14,22 @@ REDIS_TYPE = {
 LEFTMOST = 0
 RIGHTMOST = -1
 
+# redis 有序集的 score 区间边界
+MIN_SCORE = '-inf'
+MAX_SCORE = '+inf'
+
+# redis 有序集的字典序区间边界
+MIN_LEX = '-'
+MAX_LEX = '+'
+
 # 默认增量和减量
 DEFAULT_INCREMENT = DEFAULT_DECREMENT = 1
+
+# 分页遍历列表和有序集时，每次从 Redis 取出的元素数量
+DEFAULT_PAGE_SIZE = 1000
+
+# 批量写入时，每个命令携带的元素数量
+DEFAULT_CHUNK_SIZE = 1000
+
+# 保存中间结果的临时 key 的生存时间，以秒为单位
+TEMPORARY_KEY_TTL = 60
@@ -0,0 +1,233 @@
+# coding: utf-8
+
+__all__ = ['DelayedQueue']
+
+__metaclass__ = type
+
+import time
+
+from ooredis.type_case import GenericTypeCase
+from ooredis.const import DEFAULT_CHUNK_SIZE
+
+from deque import Deque
+from base_key import BaseKey
+from sorted_set import SortedSet
+from helper import format_key, wrap_exception, run_script
+from common_key_property_mixin import CommonKeyPropertyMixin
+
+# 默认每次移动的到期任务数量
+DEFAULT_POLL_BATCH_SIZE = 100
+
+# 将最多 ARGV[2] 个到期时间不迟于 ARGV[1] 的任务从有序集移动到列表
+# KEYS[1]: 保存任务的有序集
+# KEYS[2]: 保存到期任务的列表
+POLL_SCRIPT = """
+local items = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+-- unpack 一次最多只能展开大约 8000 个值，所以每 1000 个任务执行一次命令
+for i = 1, #items, 1000 do
+    local last = math.min(i + 999, #items)
+    redis.call('ZREM', KEYS[1], unpack(items, i, last))
+    redis.call('RPUSH', KEYS[2], unpack(items, i, last))
+end
+return #items
+"""
+
+class DelayedQueue(BaseKey, CommonKeyPropertyMixin):
+
+    """
+    延迟队列，任务按到期时间保存在一个有序集里面，
+    到期的任务由 poll 方法移动到一个双端队列，然后由消费者取出。
+
+    poll 使用 Lua 脚本原子地移动任务，多个 poll 可以同时执行，
+    每个任务只会被移动一次。
+
+    注意相同的任务在有序集中只会保存一份，重复加入只会更新它的到期时间。
+    """
+
+    def __init__(self, name, client=None, type_case=GenericTypeCase, ready=None):
+        """
+        初始化一个 DelayedQueue 类实例。
+
+        Args:
+            name: 保存任务的有序集的 key 名
+            client: 客户端，默认为全局客户端
+            type_case: 类型转换类
+            ready: 保存到期任务的 Deque 对象，默认为 key 名是 name + ':ready' 的 Deque
+        """
+        super(DelayedQueue, self).__init__(name=name, client=client, type_case=type_case)
+
+        self.schedule = SortedSet(name, client=self._client, type_case=type_case)
+        # 不能用 ready or Deque(...) ，因为空的 Deque 对象的真值为 False
+        if ready is None:
+            ready = Deque(name + ':ready', client=self._client, type_case=type_case)
+        self.ready = ready
+
+
+    def __repr__(self):
+        return format_key(self, self.name, list(self.schedule))
+
+
+    def __len__(self):
+        """
+        返回还没有到期(还没有被移动)的任务数量。
+
+        Time:
+            O(1)
+
+        Returns:
+            int
+
+        Raises:
+            TypeError: 当 key 不是有序集类型时抛出。
+        """
+        return len(self.schedule)
+
+
+    def put(self, item, due):
+        """
+        加入一个任务，任务在 unix 时间戳 due 到期。
+
+        Args:
+            item: 任务
+            due: 任务的到期时间，以 unix 时间戳表示。
+
+        Time:
+            O(log(N)) ， N 为还没有到期的任务数量。
+
+        Returns:
+            None
+
+        Raises:
+            TypeError: 当 key 不是有序集类型时抛出。
+        """
+        self.schedule[item] = due
+
+
+    def put_after(self, item, delay):
+        """
+        加入一个任务，任务在 delay 秒之后到期。
+
+        Args:
+            item: 任务
+            delay: 以秒为单位的延迟时间。
+
+        Time:
+            O(log(N)) ， N 为还没有到期的任务数量。
+
+        Returns:
+            None
+
+        Raises:
+            TypeError: 当 key 不是有序集类型时抛出。
+        """
+        self.put(item, time.time() + delay)
+
+
+    def put_many(self, mapping_or_pairs, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        批量加入多个任务。
+
+        Args:
+            mapping_or_pairs: 一个以任务为键、到期时间为值的字典，
+                              或者一个包含 (item, due) 二元组的 iterable 。
+            chunk_size: 每个 ZADD 命令携带的任务数量。
+
+        Time:
+            O(M*log(N)) ， N 为还没有到期的任务数量，而 M 为被加入的任务数量。
+
+        Returns:
+            int: 新加入的任务数量。
+
+        Raises:
+            TypeError: 当 key 不是有序集类型时抛出。
+        """
+        return self.schedule.update(mapping_or_pairs, chunk_size=chunk_size)
+
+
+    def cancel(self, item):
+        """
+        取消一个还没有到期的任务，如果任务不存在，不做动作。
+
+        Args:
+            item: 任务
+
+        Time:
+            O(log(N)) ， N 为还没有到期的任务数量。
+
+        Returns:
+            None
+
+        Raises:
+            TypeError: 当 key 不是有序集类型时抛出。
+        """
+        self.schedule.remove(item)
+
+
+    @wrap_exception
+    def poll(self, now=None, batch_size=DEFAULT_POLL_BATCH_SIZE):
+        """
+        将最多 batch_size 个到期的任务原子地移动到 self.ready 。
+
+        如果返回值等于 batch_size ，说明可能还有到期的任务，可以再次执行 poll 。
+
+        Args:
+            now: 当前时间的 unix 时间戳，默认使用本机时间。
+            batch_size: 最多移动的任务数量，必须是正整数。
+
+        Time:
+            O(log(N)+M) ， N 为还没有到期的任务数量，而 M 为被移动的任务数量。
+
+        Returns:
+            int: 被移动的任务数量。
+
+        Raises:
+            TypeError: 当 key 的类型不正确时抛出。
+            ValueError: batch_size 不是正整数时抛出。
+        """
+        # 负数会变成 LIMIT 0 -1 ，一次移动所有到期的任务
+        if batch_size <= 0:
+            raise ValueError('batch_size must be a positive integer')
+
+        if now is None:
+            now = time.time()
+
+        return run_script(self._client, POLL_SCRIPT,
+                          keys=[self.schedule.name, self.ready.name],
+                          args=[now, batch_size])
+
+
+    def get(self, timeout=0):
+        """
+        取出最早到期的任务，如果没有到期的任务，
+        那么阻塞 timeout 秒，直到获取任务或超时为止。
+
+        Args:
+            timeout: 等待任务时的最大阻塞秒数，为 0 时一直阻塞。
+
+        Time:
+            O(1)
+
+        Returns:
+            None: 超时时返回
+            item: 到期的任务
+
+        Raises:
+            TypeError: 当 self.ready 不是 list 类型时抛出。
+        """
+        return self.ready.block_popleft(timeout)
+
+
+    def clear(self):
+        """
+        删除所有任务，包括已经到期但是还没有被取出的任务。
+
+        Time:
+            O(N)
+
+        Returns:
+            None
+
+        Raises:
+            None
+        """
+        self._client.delete(self.schedule.name, self.ready.name)
@@ -1,84 +1,583 @@
 # coding: utf-8
 
-__all__ = ['Deque']
+__all__ = ['Deque', 'block_pop_any', 'block_popleft_any', 'fan_out']
 
 __metaclass__ = type
 
+import time
 import redis
 
+from ooredis.type_case import GenericTypeCase
+from ooredis.const import LEFTMOST, RIGHTMOST, DEFAULT_PAGE_SIZE, DEFAULT_CHUNK_SIZE
+
 from base_key import BaseKey
-from helper import format_key, wrap_exception
+from helper import (
+    format_key,
+    wrap_exception,
+    slice_to_range,
+    chunks,
+    is_unknown_command,
+    run_script,
+    encode_name,
+)
 from common_key_property_mixin import CommonKeyPropertyMixin
 
+# extend 和 extendleft 每次执行 pipeline 时发送的命令数量，
+# pipeline 中最多缓存 PIPELINE_CHUNKS*chunk_size 个元素
+PIPELINE_CHUNKS = 16
+
+# 按 Python 的语义原子地删除或替换列表的一个下标或者一个 slice
+# KEYS[1]: 列表
+# ARGV[1]: 操作， 'del' 删除 slice ， 'set' 替换 slice ， 'delindex' 删除单个下标
+# ARGV[2], ARGV[3], ARGV[4]: slice 的 start 、 stop 和 step ，空字符串表示 None ，
+#                            'delindex' 只使用 ARGV[2] 作为下标
+# ARGV[5...]: 'set' 操作使用的新元素
+# 返回 0 表示成功，
+# 返回 -1 表示下标超出范围('delindex')，或者新元素的数量和扩展 slice 的长度不一致('set')
+SLICE_SCRIPT = """
+local key = KEYS[1]
+local len = redis.call('LLEN', key)
+
+local function push(command, items, first, last)
+    for i = first, last, 1000 do
+        redis.call(command, key, unpack(items, i, math.min(i + 999, last)))
+    end
+end
+
+-- 将 [lo, hi) 区间内的元素替换为 values ，
+-- 只移动 lo 左边和 hi 右边的元素中较少的一边
+local function replace(lo, hi, values)
+    if lo <= len - hi then
+        -- lo 为 0 时 LRANGE 0 -1 会取回整个列表
+        local head = {}
+        if lo > 0 then head = redis.call('LRANGE', key, 0, lo - 1) end
+        redis.call('LTRIM', key, hi, -1)
+        local front = {}
+        for i = #values, 1, -1 do front[#front+1] = values[i] end
+        for i = #head, 1, -1 do front[#front+1] = head[i] end
+        push('LPUSH', front, 1, #front)
+    else
+        local tail = redis.call('LRANGE', key, hi, -1)
+        redis.call('LTRIM', key, 0, lo - 1)
+        push('RPUSH', values, 1, #values)
+        push('RPUSH', tail, 1, #tail)
+    end
+end
+
+if ARGV[1] == 'delindex' then
+    local index = tonumber(ARGV[2])
+    if index < 0 then index = index + len end
+    if index < 0 or index >= len then
+        return -1
+    end
+    replace(index, index + 1, {})
+    return 0
+end
+
+-- 和 Python 的 slice.indices 一样规范化 start 和 stop
+local step = tonumber(ARGV[4]) or 1
+local lower, upper = 0, len
+if step < 0 then lower, upper = -1, len - 1 end
+
+local function normalize(index, default)
+    index = tonumber(index)
+    if index == nil then return default end
+    if index < 0 then index = index + len end
+    if index < lower then return lower end
+    if index > upper then return upper end
+    return index
+end
+
+local start, stop
+if step < 0 then
+    start, stop = normalize(ARGV[2], upper), normalize(ARGV[3], lower)
+else
+    start, stop = normalize(ARGV[2], lower), normalize(ARGV[3], upper)
+end
+
+local values = {}
+for i = 5, #ARGV do values[#values+1] = ARGV[i] end
+
+if step == 1 then
+    replace(start, math.max(start, stop), values)
+    return 0
+end
+
+local positions = {}
+local index = start
+while (step > 0 and index < stop) or (step < 0 and index > stop) do
+    positions[#positions+1] = index
+    index = index + step
+end
+
+if ARGV[1] == 'set' then
+    if #values ~= #positions then
+        return -1
+    end
+    for i, position in ipairs(positions) do
+        redis.call('LSET', key, position, values[i])
+    end
+    return 0
+end
+
+if #positions == 0 then
+    return 0
+end
+
+local lo = math.min(positions[1], positions[#positions])
+local hi = math.max(positions[1], positions[#positions])
+local deleted = {}
+for _, position in ipairs(positions) do deleted[position] = true end
+
+local kept = {}
+for i, item in ipairs(redis.call('LRANGE', key, lo, hi)) do
+    if not deleted[lo + i - 1] then kept[#kept+1] = item end
+end
+replace(lo, hi + 1, kept)
+return 0
+"""
+
+# 在服务器上分页扫描列表中介于 start 和 stop 之间的元素，用于 count ，
+# 以及需要 start 和 stop 参数或者服务器不支持 LPOS 时的 index 调用
+# KEYS[1]: 列表
+# ARGV[1]: 要查找的元素
+# ARGV[2], ARGV[3]: 和 Python 的 list.index 一样的 start 和 stop ，空字符串表示 None
+# ARGV[4]: 'first' 返回第一个相等元素的下标(找不到时返回 -1)， 'count' 返回相等元素的数量
+SCAN_SCRIPT = """
+local key = KEYS[1]
+local len = redis.call('LLEN', key)
+
+local function normalize(index, default)
+    index = tonumber(index)
+    if index == nil then return default end
+    if index < 0 then index = index + len end
+    return math.max(0, math.min(index, len))
+end
+
+local start = normalize(ARGV[2], 0)
+local stop = normalize(ARGV[3], len)
+local count = 0
+
+for page = start, stop - 1, 1000 do
+    local items = redis.call('LRANGE', key, page, math.min(page + 999, stop - 1))
+    for i, item in ipairs(items) do
+        if item == ARGV[1] then
+            if ARGV[4] == 'first' then
+                return page + i - 1
+            end
+            count = count + 1
+        end
+    end
+end
+
+if ARGV[4] == 'first' then
+    return -1
+end
+return count
+"""
+
+# 一次移除并返回列表一端的最多 ARGV[2] 个元素，用于不支持 LPOP/RPOP 的 count 参数的服务器
+# KEYS[1]: 列表
+# ARGV[1]: 'left' 从左边弹出， 'right' 从右边弹出
+# 返回的元素按弹出的顺序排列
+POP_MANY_SCRIPT = """
+local n = tonumber(ARGV[2])
+if ARGV[1] == 'left' then
+    local items = redis.call('LRANGE', KEYS[1], 0, n - 1)
+    redis.call('LTRIM', KEYS[1], n, -1)
+    return items
+end
+
+local items = redis.call('LRANGE', KEYS[1], -n, -1)
+redis.call('LTRIM', KEYS[1], 0, -n - 1)
+local popped = {}
+for i = #items, 1, -1 do popped[#popped+1] = items[i] end
+return popped
+"""
+
+# 在服务器上将列表向右旋转 ARGV[1] 步，和 collections.deque.rotate 一样，
+# 负数表示向左旋转，实际只按较短的方向移动 min(k, N-k) 个元素
+# KEYS[1]: 列表
+ROTATE_SCRIPT = """
+local len = redis.call('LLEN', KEYS[1])
+if len == 0 then
+    return 0
+end
+
+local k = tonumber(ARGV[1]) % len
+if k <= len - k then
+    for i = 1, k do
+        redis.call('RPOPLPUSH', KEYS[1], KEYS[1])
+    end
+else
+    for i = 1, len - k do
+        redis.call('RPUSH', KEYS[1], redis.call('LPOP', KEYS[1]))
+    end
+end
+return 0
+"""
+
+# 从列表 KEYS[1] 的一端逐个弹出最多 ARGV[1] 个元素，并推入列表 KEYS[2] 的一端
+# ARGV[2]: 'left' 或 'right' ，弹出元素的一端
+# ARGV[3]: 'left' 或 'right' ，推入元素的一端
+# 返回被移动的元素数量
+MOVE_SCRIPT = """
+local pop = ARGV[2] == 'left' and 'LPOP' or 'RPOP'
+local push = ARGV[3] == 'left' and 'LPUSH' or 'RPUSH'
+
+local moved = 0
+for i = 1, tonumber(ARGV[1]) do
+    local item = redis.call(pop, KEYS[1])
+    if not item then
+        break
+    end
+    redis.call(push, KEYS[2], item)
+    moved = moved + 1
+end
+return moved
+"""
+
+# move_to 的 from_end 和 to_end 参数可以使用的值
+ENDS = ('left', 'right')
+
+def _block_pop(command, deques, timeout):
+    deques = list(deques)
+    if not deques:
+        raise ValueError('at least one deque is required')
+    names = [deque.name for deque in deques]
+
+    # 每个非空 BRPOP/BLPOP 的结果都是一个列表 [key, item]
+    client = deques[0]._client
+    reply = client.execute_command(command, *(names + [timeout]))
+    if reply is None:
+        return
+
+    # 服务器返回的 key 名是字节串，需要和编码之后的 key 名比较
+    name, redis_item = reply
+    deque = deques[map(encode_name, names).index(name)]
+    return deque, deque._decode(redis_item)
+
+@wrap_exception
+def block_pop_any(deques, timeout=0):
+    """
+    按给定的顺序检查多个队列，移除并返回第一个非空队列最右边的元素，
+    如果所有队列都为空，那么阻塞 timeout 秒，直到获取元素或超时为止。
+
+    所有队列都使用第一个队列的客户端，只需要一个 BRPOP 命令。
+
+    Args:
+        deques: 一个包含多个 Deque 对象的 iterable ，排在前面的队列优先。
+        timeout: 等待元素时的最大阻塞秒数，为 0 时一直阻塞。
+
+    Time:
+        O(1)
+
+    Returns:
+        None: 超时时返回
+        tuple: (deque, item) ，被弹出元素的队列对象以及被弹出的元素。
+
+    Raises:
+        TypeError: 当某个 key 不是 list 类型时抛出。
+        ValueError: deques 为空时抛出。
+    """
+    return _block_pop('BRPOP', deques, timeout)
+
+@wrap_exception
+def block_popleft_any(deques, timeout=0):
+    """
+    按给定的顺序检查多个队列，移除并返回第一个非空队列最左边的元素，
+    如果所有队列都为空，那么阻塞 timeout 秒，直到获取元素或超时为止。
+
+    所有队列都使用第一个队列的客户端，只需要一个 BLPOP 命令。
+
+    Args:
+        deques: 一个包含多个 Deque 对象的 iterable ，排在前面的队列优先。
+        timeout: 等待元素时的最大阻塞秒数，为 0 时一直阻塞。
+
+    Time:
+        O(1)
+
+    Returns:
+        None: 超时时返回
+        tuple: (deque, item) ，被弹出元素的队列对象以及被弹出的元素。
+
+    Raises:
+        TypeError: 当某个 key 不是 list 类型时抛出。
+        ValueError: deques 为空时抛出。
+    """
+    return _block_pop('BLPOP', deques, timeout)
+
+# 将同一个元素推入多个列表，并按各个列表的 maxlen 移除多出的元素
+# KEYS: 多个列表
+# ARGV[1]: 'left' 或 'right' ，推入元素的一端
+# ARGV[2]: 元素
+# ARGV[i+2]: KEYS[i] 的 maxlen ， 0 表示不限制长度
+FAN_OUT_SCRIPT = """
+local push = ARGV[1] == 'left' and 'LPUSH' or 'RPUSH'
+for i, key in ipairs(KEYS) do
+    redis.call(push, key, ARGV[2])
+    local maxlen = tonumber(ARGV[i + 2])
+    if maxlen > 0 then
+        if push == 'LPUSH' then
+            redis.call('LTRIM', key, 0, maxlen - 1)
+        else
+            redis.call('LTRIM', key, -maxlen, -1)
+        end
+    end
+end
+return #KEYS
+"""
+
+@wrap_exception
+def fan_out(deques, python_item, to_end='left', chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    将同一个元素推入多个队列，比如将一条新消息推入所有关注者的时间线。
+
+    元素只被编码一次，队列被分割为多个长度不超过 chunk_size 的组，
+    每组由一次 Lua 脚本调用完成推入，以及按每个队列的 maxlen 执行的 LTRIM 。
+
+    所有队列都使用第一个队列的客户端和 type_case 。
+    注意脚本出错(比如某个 key 不是 list 类型)时，同一组中已经推入的元素不会被撤销。
+
+    Args:
+        deques: 一个包含多个 Deque 对象的 iterable 。
+        item: 被推入的元素。
+        to_end: 'left' 或 'right' ，推入队列的哪一端，默认为 'left' 。
+        chunk_size: 每次脚本调用处理的队列数量。
+
+    Time:
+        O(M) ， M 为队列的数量。
+
+    Returns:
+        list: 每组一个字典，包含 'size' ，组中的队列数量，
+              以及 'seconds' ，这一组的脚本调用所花的秒数。
+
+    Raises:
+        TypeError: 当某个 key 不是 list 类型时抛出。
+        ValueError: to_end 不是 'left' 或 'right' 时抛出。
+    """
+    if to_end not in ENDS:
+        raise ValueError("to_end must be 'left' or 'right'")
+
+    client = redis_item = None
+    timings = []
+    for chunk in chunks(deques, chunk_size):
+        if redis_item is None:
+            client = chunk[0]._client
+            redis_item = chunk[0]._encode(python_item)
+
+        keys = [deque.name for deque in chunk]
+        maxlens = [deque.maxlen or 0 for deque in chunk]
+
+        started_at = time.time()
+        run_script(client, FAN_OUT_SCRIPT, keys=keys, args=[to_end, redis_item] + maxlens)
+        timings.append(dict(size=len(chunk), seconds=time.time() - started_at))
+
+    return timings
+
+def _slice_args(index):
+    """
+    将 slice 对象转换为 SLICE_SCRIPT 使用的 start 、 stop 和 step 参数。
+    """
+    return ['' if value is None else value
+            for value in (index.start, index.stop, index.step)]
+
 class Deque(BaseKey, CommonKeyPropertyMixin):
 
     """ 
     将 Redis 的 list 结构映射到双端队列对象。
     """
 
-    def append(self, python_item):
+    def __init__(self, name, client=None, type_case=GenericTypeCase,
+                 page_size=DEFAULT_PAGE_SIZE, maxlen=None):
+        """
+        初始化一个 Deque 类实例。
+
+        Args:
+            name: Redis key 的名字
+            client: 客户端，默认为全局客户端
+            type_case: 类型转换类
+            page_size: 遍历队列时，每次从 Redis 取出的元素数量
+            maxlen: 队列的最大长度，默认为 None ，表示不限制长度。
+                    和 collections.deque 一样，append 和 extend 会从左边移除多出的元素，
+                    appendleft 和 extendleft 会从右边移除多出的元素，
+                    其他修改队列的方法不会检查队列的长度。
+
+        Raises:
+            ValueError: maxlen 不是正整数时抛出。
+        """
+        if maxlen is not None and maxlen <= 0:
+            raise ValueError('maxlen must be a positive integer')
+
+        super(Deque, self).__init__(name=name, client=client, type_case=type_case)
+        self.page_size = page_size
+        self.maxlen = maxlen
+
+
+    def _push(self, pipe, command, redis_items, return_dropped):
+        """
+        将一个 RPUSH 或 LPUSH 命令放入 pipe 中，
+        如果队列设置了 maxlen ，那么同时放入从另一端移除多出元素的 LTRIM 命令，
+        return_dropped 为 True 时，在 LTRIM 之前放入取出这些元素的 LRANGE 命令。
+        """
+        pipe.execute_command(command, self.name, *redis_items)
+        if self.maxlen is None:
+            return
+
+        if command == 'RPUSH':
+            dropped_range, kept_range = (LEFTMOST, -(self.maxlen+1)), (-self.maxlen, RIGHTMOST)
+        else:
+            dropped_range, kept_range = (self.maxlen, RIGHTMOST), (LEFTMOST, self.maxlen-1)
+
+        if return_dropped:
+            pipe.lrange(self.name, *dropped_range)
+        pipe.ltrim(self.name, *kept_range)
+
+
+    def _dropped_items(self, results):
+        """
+        从 _push 放入的命令的执行结果中取出被移除的元素。
+        """
+        if self.maxlen is None:
+            return []
+        # 每次 _push 都会产生 push 、 LRANGE 和 LTRIM 三个结果
+        return [self._decode(redis_item)
+                for all_redis_item in results[1::3]
+                for redis_item in all_redis_item]
+
+
+    def _push_one(self, command, python_item, return_dropped):
+        # 有 maxlen 时使用事务，保证 push 和 LTRIM 之间不会插入其他命令
+        pipe = self._client.pipeline(transaction=self.maxlen is not None)
+        self._push(pipe, command, [self._encode(python_item)], return_dropped)
+        results = pipe.execute()
+        if return_dropped:
+            return self._dropped_items(results)
+
+
+    @wrap_exception
+    def append(self, python_item, return_dropped=False):
         """
         将元素 item 追加到队列的最右边。
 
+        如果队列设置了 maxlen ，那么追加元素和移除多出元素的命令在同一个事务中执行，
+        只需要一次往返。
+
         Args:
             item
+            return_dropped: 为 True 时返回因为超出 maxlen 而被移除的元素。
 
         Time:
             O(1)
 
         Returns:
-            None
+            None: return_dropped 为 False 时返回
+            list: return_dropped 为 True 时，返回被移除的元素，按它们在队列中的顺序排列。
 
         Raises:
             TypeError: 尝试对非 list 类型的 key 进行操作时抛出。
         """
-        redis_item = self._encode(python_item)
-        self._client.rpush(self.name, redis_item)
+        return self._push_one('RPUSH', python_item, return_dropped)
 
 
     @wrap_exception
-    def appendleft(self, python_item):
+    def appendleft(self, python_item, return_dropped=False):
         """
         将元素 item 追加到队列的最左边。
 
+        如果队列设置了 maxlen ，那么追加元素和移除多出元素的命令在同一个事务中执行，
+        只需要一次往返。
+
         Args:
             item
+            return_dropped: 为 True 时返回因为超出 maxlen 而被移除的元素。
 
         Time:
             O(1)
 
         Returns:
-            None
+            None: return_dropped 为 False 时返回
+            list: return_dropped 为 True 时，返回被移除的元素，按它们在队列中的顺序排列。
 
         Raises:
             TypeError: 尝试对非 list 类型的 key 进行操作时抛出。
         """
-        redis_item = self._encode(python_item)
-        self._client.lpush(self.name, redis_item)
+        return self._push_one('LPUSH', python_item, return_dropped)
+
+
+    def _push_many(self, command, python_iterable, chunk_size, progress, return_dropped):
+        """
+        将 iterable 惰性地分割成多个 RPUSH 或 LPUSH 命令，通过 pipeline 分批发送。
+        """
+        total = 0
+        dropped = []
+        # 有 maxlen 时使用事务，保证每个 push 和它的 LTRIM 之间不会插入其他命令
+        pipe = self._client.pipeline(transaction=self.maxlen is not None)
+
+        def flush():
+            results = pipe.execute()
+            if return_dropped:
+                dropped.extend(self._dropped_items(results))
+            if progress is not None:
+                progress(total)
+
+        pending = 0
+        for chunk in chunks(python_iterable, chunk_size):
+            self._push(pipe, command, map(self._encode, chunk), return_dropped)
+            total += len(chunk)
+            pending += 1
 
+            if pending == PIPELINE_CHUNKS:
+                flush()
+                pending = 0
 
-    def extend(self, python_iterable):
+        if pending > 0:
+            flush()
+
+        if return_dropped:
+            return dropped
+        return total
+
+
+    @wrap_exception
+    def extend(self, python_iterable, chunk_size=DEFAULT_CHUNK_SIZE, progress=None,
+               return_dropped=False):
         """
         将 iterable 内的所有元素追加到队列的最右边。
 
+        iterable 被惰性地读取，每 chunk_size 个元素组成一个 RPUSH 命令，
+        命令通过 pipeline 分批发送，所以无论 iterable 有多大，
+        内存中最多只保存 PIPELINE_CHUNKS*chunk_size 个元素，
+        服务器每次也只需要执行一个较小的命令。
+
+        注意元素是分多个命令添加的，其他客户端可能会看到只添加了一部分的队列。
+        如果队列设置了 maxlen ，那么每个 RPUSH 之后都会执行一次 LTRIM ，
+        它们和同一批的其他命令在同一个事务中执行。
+
         Args:
             iterable
+            chunk_size: 每个 RPUSH 命令携带的元素数量。
+            progress: 每批命令执行之后调用的函数，参数为目前已经添加的元素数量。
+            return_dropped: 为 True 时返回因为超出 maxlen 而被移除的元素。
 
         Time:
-            O(1)
+            O(M) ， M 为被添加的元素数量。
 
         Returns:
-            None
+            int: 被添加的元素数量。
+            list: return_dropped 为 True 时，返回被移除的元素，
+                  每批被移除的元素按它们在队列中的顺序排列。
 
         Raises:
             TypeError: 尝试对非 list 类型的 key 进行操作时抛出。
         """
-        redis_iterable = map(self._encode, python_iterable)
-        self._client.rpush(self.name, *redis_iterable)
+        return self._push_many('RPUSH', python_iterable, chunk_size, progress,
+                               return_dropped)
 
 
     @wrap_exception
-    def extendleft(self, python_iterable):
+    def extendleft(self, python_iterable, chunk_size=DEFAULT_CHUNK_SIZE, progress=None,
+                   return_dropped=False):
         """
         将 iterable 内的所有元素追加到队列的最左边。
 
@@ -87,11 +586,42 @@ class Deque(BaseKey, CommonKeyPropertyMixin):
         比如对一个空队列 d 执行 d.extendleft(range(3)) ，
         那么队列 d 将变成 [3, 2, 1] 。
 
+        iterable 的读取和发送方式参考 extend 。
+
         Args:
             iterable
+            chunk_size: 每个 LPUSH 命令携带的元素数量。
+            progress: 每批命令执行之后调用的函数，参数为目前已经添加的元素数量。
+            return_dropped: 为 True 时返回因为超出 maxlen 而被移除的元素。
 
         Time:
-            O(1)
+            O(M) ， M 为被添加的元素数量。
+
+        Returns:
+            int: 被添加的元素数量。
+            list: return_dropped 为 True 时，返回被移除的元素，
+                  每批被移除的元素按它们在队列中的顺序排列。
+
+        Raises:
+            TypeError: 尝试对非 list 类型的 key 进行操作时抛出。
+        """
+        return self._push_many('LPUSH', python_iterable, chunk_size, progress,
+                               return_dropped)
+
+
+    @wrap_exception
+    def rotate(self, n=1):
+        """
+        将队列向右旋转 n 步，n 为负数时向左旋转，和 collections.deque.rotate 一样。
+
+        旋转由一个 Lua 脚本在服务器上完成，元素不会被发送到客户端，
+        脚本只按较短的方向移动 min(k, N-k) 个元素，其中 k 为 n 对 N 取模的结果。
+
+        Args:
+            n: 旋转的步数，默认为 1 。
+
+        Time:
+            O(min(k, N-k)) ， N 为队列的长度。
 
         Returns:
             None
@@ -99,8 +629,42 @@ class Deque(BaseKey, CommonKeyPropertyMixin):
         Raises:
             TypeError: 尝试对非 list 类型的 key 进行操作时抛出。
         """
-        redis_iterable = map(self._encode, python_iterable)
-        self._client.lpush(self.name, *redis_iterable)
+        run_script(self._client, ROTATE_SCRIPT, keys=[self.name], args=[n])
+
+
+    @wrap_exception
+    def move_to(self, other, n=1, from_end='right', to_end='left'):
+        """
+        从队列的 from_end 端逐个弹出最多 n 个元素，并推入队列 other 的 to_end 端。
+
+        移动由一个 Lua 脚本在服务器上原子地完成，元素不会被发送到客户端，
+        元素的原始值被直接移动，不会经过 type_case 的转换。
+
+        比如默认参数下，对 d = [1, 2, 3] 执行 d.move_to(e, 2) ，
+        d 会变成 [1] ，而 3 和 2 会依次被推入 e 的左边，e 变成 [2, 3, ...] 。
+
+        Args:
+            other: 目标 Deque 对象，可以是队列自己。
+            n: 最多移动的元素数量，默认为 1 。
+            from_end: 'left' 或 'right' ，从哪一端弹出元素，默认为 'right' 。
+            to_end: 'left' 或 'right' ，推入 other 的哪一端，默认为 'left' 。
+
+        Time:
+            O(n)
+
+        Returns:
+            int: 被移动的元素数量。
+
+        Raises:
+            TypeError: 当某个 key 不是 list 类型时抛出。
+            ValueError: from_end 或 to_end 不是 'left' 或 'right' 时抛出。
+        """
+        if from_end not in ENDS or to_end not in ENDS:
+            raise ValueError("from_end and to_end must be 'left' or 'right'")
+
+        return run_script(self._client, MOVE_SCRIPT,
+                          keys=[self.name, other.name],
+                          args=[n, from_end, to_end])
 
 
     def clear(self):
@@ -119,10 +683,14 @@ class Deque(BaseKey, CommonKeyPropertyMixin):
         self.delete()
     
 
+    @wrap_exception
     def count(self, python_item):
         """
         计算队列中和 item 相等的元素的个数。
 
+        使用 Lua 脚本在服务器上扫描列表，只有计数结果会被传送到客户端，
+        而 LPOS 的 COUNT 0 选项会返回每个相等元素的下标，传送的数据量随着匹配数量增长。
+
         Args:
             item
 
@@ -135,7 +703,138 @@ class Deque(BaseKey, CommonKeyPropertyMixin):
         Raises:
             TypeError: 尝试对非 list 类型的 key 进行操作时抛出。
         """
-        return list(self).count(python_item)
+        return run_script(self._client, SCAN_SCRIPT,
+                          keys=[self.name],
+                          args=[self._encode(python_item), '', '', 'count'])
+
+
+    @wrap_exception
+    def index(self, python_item, start=None, stop=None):
+        """
+        返回队列中第一个和 item 相等的元素的下标。
+
+        start 和 stop 的意义和 list.index 一样，用于限制查找的范围。
+        没有给定范围时使用 LPOS 命令，否则(或者服务器不支持 LPOS 时)
+        改用 Lua 脚本在服务器上扫描列表。
+
+        Args:
+            item
+            start: 查找范围的起点，默认为列表的最左边。
+            stop: 查找范围的终点(不包含)，默认为列表的最右边。
+
+        Time:
+            O(N)
+
+        Returns:
+            index
+
+        Raises:
+            TypeError: 尝试对非 list 类型的 key 进行操作时抛出。
+            ValueError: 范围内没有和 item 相等的元素时抛出。
+        """
+        redis_item = self._encode(python_item)
+        if start is None and stop is None:
+            try:
+                position = self._client.execute_command('LPOS', self.name, redis_item)
+                if position is None:
+                    raise ValueError('item not in deque')
+                return position
+            except redis.exceptions.ResponseError as e:
+                if not is_unknown_command(e):
+                    raise
+
+        args = ['' if value is None else value for value in (start, stop)]
+        position = run_script(self._client, SCAN_SCRIPT,
+                              keys=[self.name],
+                              args=[redis_item] + args + ['first'])
+        if position == -1:
+            raise ValueError('item not in deque')
+        return position
+
+
+    @wrap_exception
+    def remove(self, python_item, count=1):
+        """
+        用 LREM 移除队列中和 item 相等的元素。
+
+        count 大于 0 时从左向右移除 count 个元素，
+        count 小于 0 时从右向左移除 -count 个元素，
+        count 等于 0 时移除所有相等的元素。
+
+        Args:
+            item
+            count: 移除的元素数量，默认只移除最左边的一个。
+
+        Time:
+            O(N)
+
+        Returns:
+            int: 被移除的元素数量。
+
+        Raises:
+            TypeError: 尝试对非 list 类型的 key 进行操作时抛出。
+            ValueError: 队列中没有和 item 相等的元素时抛出。
+        """
+        # 直接执行命令，避开不同版本 redis-py 的 lrem 参数顺序差异
+        removed = self._client.execute_command('LREM', self.name, count,
+                                               self._encode(python_item))
+        if removed == 0:
+            raise ValueError('item not in deque')
+        return removed
+
+
+    def _insert(self, where, pivot, python_item):
+        length = self._client.linsert(self.name, where,
+                                      self._encode(pivot),
+                                      self._encode(python_item))
+        # pivot 不存在时返回 -1 ，key 不存在时返回 0
+        if length <= 0:
+            raise ValueError('pivot not in deque')
+        return length
+
+
+    @wrap_exception
+    def insert_before(self, pivot, python_item):
+        """
+        用 LINSERT 将 item 插入到队列中第一个和 pivot 相等的元素之前。
+
+        Args:
+            pivot
+            item
+
+        Time:
+            O(N) ， N 为 pivot 之前的元素数量。
+
+        Returns:
+            int: 插入之后队列的长度。
+
+        Raises:
+            TypeError: 尝试对非 list 类型的 key 进行操作时抛出。
+            ValueError: 队列中没有和 pivot 相等的元素时抛出。
+        """
+        return self._insert('BEFORE', pivot, python_item)
+
+
+    @wrap_exception
+    def insert_after(self, pivot, python_item):
+        """
+        用 LINSERT 将 item 插入到队列中第一个和 pivot 相等的元素之后。
+
+        Args:
+            pivot
+            item
+
+        Time:
+            O(N) ， N 为 pivot 之前的元素数量。
+
+        Returns:
+            int: 插入之后队列的长度。
+
+        Raises:
+            TypeError: 尝试对非 list 类型的 key 进行操作时抛出。
+            ValueError: 队列中没有和 pivot 相等的元素时抛出。
+        """
+        return self._insert('AFTER', pivot, python_item)
 
 
     @wrap_exception
@@ -172,6 +871,8 @@ class Deque(BaseKey, CommonKeyPropertyMixin):
         移除并返回队列最右边的元素，
         如果队列中没有元素，那么阻塞 timeout 秒，直到获取元素或超时为止。
 
+        要同时等待多个队列，请使用 block_pop_any 。
+
         Args:
             timeout: 等待元素时的最大阻塞秒数
 
@@ -185,12 +886,75 @@ class Deque(BaseKey, CommonKeyPropertyMixin):
         Raises:
             TypeError: 尝试对非 list 类型的 key 进行操作时抛出。
         """
-        # 每个非空 brpop 的结果都是一个列表 ['list of the pop item', 'pop item']
-        redis_queue_name_and_item_list = self._client.brpop(self.name, timeout)
-        if redis_queue_name_and_item_list is not None:
-            redis_item = redis_queue_name_and_item_list[1]
-            python_item = self._decode(redis_item)
-            return python_item
+        result = block_pop_any([self], timeout)
+        if result is not None:
+            return result[1]
+
+
+    def _pop_many(self, command, direction, n):
+        if n < 0:
+            raise ValueError('n must not be negative')
+        if n == 0:
+            return []
+
+        try:
+            all_redis_item = self._client.execute_command(command, self.name, n)
+        except redis.exceptions.ResponseError as e:
+            if not is_unknown_command(e):
+                raise
+            all_redis_item = run_script(self._client, POP_MANY_SCRIPT,
+                                        keys=[self.name], args=[direction, n])
+
+        # key 不存在时返回 None
+        return map(self._decode, all_redis_item or [])
+
+
+    @wrap_exception
+    def pop_many(self, n):
+        """
+        移除并返回队列最右边的最多 n 个元素。
+
+        使用带 count 参数的 RPOP 命令，如果服务器不支持(Redis 6.2 之前的版本)，
+        那么改用 Lua 脚本，两种方式都只需要一次往返。
+
+        Args:
+            n: 最多弹出的元素数量。
+
+        Time:
+            O(n)
+
+        Returns:
+            list: 按弹出的顺序(从右向左)排列的元素，队列为空时返回空列表。
+
+        Raises:
+            TypeError: 尝试对非 list 类型的 key 进行操作时抛出。
+            ValueError: n 为负数时抛出。
+        """
+        return self._pop_many('RPOP', 'right', n)
+
+
+    @wrap_exception
+    def popleft_many(self, n):
+        """
+        移除并返回队列最左边的最多 n 个元素。
+
+        使用带 count 参数的 LPOP 命令，如果服务器不支持(Redis 6.2 之前的版本)，
+        那么改用 Lua 脚本，两种方式都只需要一次往返。
+
+        Args:
+            n: 最多弹出的元素数量。
+
+        Time:
+            O(n)
+
+        Returns:
+            list: 按弹出的顺序(从左向右)排列的元素，队列为空时返回空列表。
+
+        Raises:
+            TypeError: 尝试对非 list 类型的 key 进行操作时抛出。
+            ValueError: n 为负数时抛出。
+        """
+        return self._pop_many('LPOP', 'left', n)
 
 
     @wrap_exception
@@ -226,6 +990,8 @@ class Deque(BaseKey, CommonKeyPropertyMixin):
         移除并返回队列最左边的元素，
         如果队列中没有元素，那么阻塞 timeout 秒，直到获取元素或超时为止。
 
+        要同时等待多个队列，请使用 block_popleft_any 。
+
         Args:
             timeout: 等待元素时的最大阻塞秒数
 
@@ -239,12 +1005,9 @@ class Deque(BaseKey, CommonKeyPropertyMixin):
         Raises:
             TypeError: 尝试对非 list 类型的 key 进行操作时抛出。
         """
-        # 每个非空 blpop 的结果都是一个列表 ['list of the pop item', 'pop item']
-        redis_queue_name_and_item_list = self._client.blpop(self.name, timeout)
-        if redis_queue_name_and_item_list is not None:
-            redis_item = redis_queue_name_and_item_list[1]
-            python_item = self._decode(redis_item) 
-            return python_item
+        result = block_popleft_any([self], timeout)
+        if result is not None:
+            return result[1]
 
 
     def __repr__(self):
@@ -269,12 +1032,22 @@ class Deque(BaseKey, CommonKeyPropertyMixin):
         return self._client.llen(self.name)
 
 
-    def __iter__(self):
+    def iterate(self, reverse=False, page_size=None, snapshot=False):
         """
-        返回一个包含整个队列所有元素的迭代器。
+        以分页的方式遍历队列，每页只需要一次 LRANGE 调用，
+        元素按页解码，所以内存中最多只保存一页元素。
+
+        遍历期间如果队列被修改，那么元素可能会被跳过或者被重复返回。
+
+        Args:
+            reverse: 为 True 时从右向左遍历，默认从左向右。
+            page_size: 每页的元素数量，默认为 self.page_size 。
+            snapshot: 为 True 时在开始遍历前记录队列的长度 N ，
+                      只遍历下标在 [0, N) 之内的元素，
+                      遍历期间追加到队列右边的元素不会被返回。
 
         Time:
-            O(N)
+            O(S+M) ， S 为每页的起点到列表左端的距离，而 M 为每页的元素数量。
 
         Returns:
             iterator
@@ -282,102 +1055,211 @@ class Deque(BaseKey, CommonKeyPropertyMixin):
         Raises:
             TypeError: 尝试对非 list 类型的 key 进行操作时抛出。
         """
+        page_size = page_size or self.page_size
+
+        # 生成器在被迭代时才执行，所以这里不能用 wrap_exception
         try:
-            all_redis_item = self._client.lrange(self.name, 0, -1)
-            for redis_item in all_redis_item:
-                python_item = self._decode(redis_item)
-                yield python_item
+            if snapshot:
+                # 用非负下标表示 [0, length) 区间
+                length = self._client.llen(self.name)
+                start, stop = LEFTMOST, length
+            else:
+                # 用负数下标从右端开始计算，正数下标从左端开始计算，都不需要知道长度
+                start, stop = LEFTMOST, None
+
+            if reverse:
+                end = RIGHTMOST if stop is None else stop-1
+                while stop is None or end >= LEFTMOST:
+                    first = end-page_size+1
+                    if stop is not None:
+                        first = max(first, LEFTMOST)
+                    all_redis_item = self._client.lrange(self.name, first, end)
+                    for redis_item in reversed(all_redis_item):
+                        yield self._decode(redis_item)
+
+                    if len(all_redis_item) < page_size:
+                        break
+                    end -= page_size
+            else:
+                while stop is None or start < stop:
+                    last = start+page_size-1
+                    if stop is not None:
+                        last = min(last, stop-1)
+                    all_redis_item = self._client.lrange(self.name, start, last)
+                    for redis_item in all_redis_item:
+                        yield self._decode(redis_item)
+
+                    if len(all_redis_item) < page_size:
+                        break
+                    start += page_size
         except redis.exceptions.ResponseError:
             raise TypeError
 
-    
-    def __delitem__(self, index):
-        """
-        删除列表中给定 index 上的值。
 
-        Args:
-            index ：可以是单个 key ，也可以是一个表示范围的 slice 。
-            item
+    def __iter__(self):
+        """
+        从左向右分页遍历队列。
 
         Time:
             O(N)
 
         Returns:
-            None
+            iterator
 
         Raises:
             TypeError: 尝试对非 list 类型的 key 进行操作时抛出。
         """
-        # TODO: 这个实现带有竞争条件
-        all_python_item = list(self)
+        return self.iterate()
 
-        self.delete()
 
-        del all_python_item[index]
-        if all_python_item != []:
-            self.extend(all_python_item)
+    def __reversed__(self):
         """
-        # del self[index]
-        # ...
+        从右向左分页遍历队列。
 
-        # del self[:]
-        if key.start is None and key.stop is None:
-            self.delete()
+        Time:
+            O(N)
 
-        # del self[i:]
-        if key.start is not None and key.stop is None:
-            self._client.ltrim(self.name, 0, key.start-1)
+        Returns:
+            iterator
 
-        # del self[:j]
-        if key.start is None and key.stop is not None:
-            self._client.ltrim(self.name, key.stop, -1)
+        Raises:
+            TypeError: 尝试对非 list 类型的 key 进行操作时抛出。
+        """
+        return self.iterate(reverse=True)
 
-        # del self[i:j]
-        # ...
+    
+    @wrap_exception
+    def __delitem__(self, index):
         """
+        删除列表中给定 index 上的值。
 
+        del d[i:] 和 del d[:j] 直接用 LTRIM 执行，
+        其他情况由一个 Lua 脚本在服务器上原子地完成，不需要取回列表。
 
+        Args:
+            index ：可以是单个 key ，也可以是一个表示范围的 slice 。
+
+        Time:
+            O(N) ， N 为被删除的区间到列表较近一端的距离加上区间内的元素数量。
+
+        Returns:
+            None
+
+        Raises:
+            IndexError: index 下标超出范围时抛出。
+            TypeError: 尝试对非 list 类型的 key 进行操作时抛出。
+            ValueError: slice 的步长为 0 时抛出。
+        """
+        if not isinstance(index, slice):
+            result = run_script(self._client, SLICE_SCRIPT,
+                                keys=[self.name], args=['delindex', index])
+            if result == -1:
+                raise IndexError
+            return
+
+        if index.step == 0:
+            raise ValueError('slice step cannot be zero')
+
+        if index.step in (None, 1):
+            # del d[:]
+            if index.start is None and index.stop is None:
+                self.delete()
+                return
+            # del d[i:] ， i 为 0 时 LTRIM 0 -1 不会删除任何元素，所以交给脚本处理
+            if index.stop is None and index.start != 0:
+                self._client.ltrim(self.name, 0, index.start-1)
+                return
+            # del d[:j]
+            if index.start is None:
+                self._client.ltrim(self.name, index.stop, -1)
+                return
+
+        run_script(self._client, SLICE_SCRIPT,
+                   keys=[self.name], args=['del'] + _slice_args(index))
+
+
+    @wrap_exception
     def __getitem__(self, index):
         """
         返回列表中给定 index 上的值。
 
+        单个下标用 LINDEX 取出，slice 对象会被转换成一次 LRANGE 调用，
+        只取回 slice 覆盖的区间，如果 slice 带有步长，那么步长在取回的区间上执行。
+
         Args:
             index ：可以是单个 key ，也可以是一个表示范围的 slice 。
-            item
 
         Time:
-            O(N)
+            O(N) ，使用下标时 N 为 index 到列表较近一端的距离，
+            使用 slice 时 N 为 slice 起点到列表左端的距离加上区间内的元素数量。
 
         Returns:
-            None
+            item: 使用下标时，返回一个元素。
+            list: 使用 slice 对象时，返回一个列表。
 
         Raises:
+            IndexError: index 下标超出范围时抛出。
             TypeError: 尝试对非 list 类型的 key 进行操作时抛出。
+            ValueError: slice 的步长为 0 时抛出。
         """
-        return list(self)[index]
+        if isinstance(index, slice):
+            # 只有负数步长需要列表的长度，这时会多执行一次 LLEN
+            redis_range = slice_to_range(index, self.__len__)
+            if redis_range is None:
+                return []
+
+            start, end, step = redis_range
+            all_redis_item = self._client.lrange(self.name, start, end)
+            return map(self._decode, all_redis_item[::step])
+        else:
+            redis_item = self._client.lindex(self.name, index)
+            # Redis 列表中的元素不会是 None ，所以 None 表示下标超出范围
+            if redis_item is None:
+                raise IndexError
+            return self._decode(redis_item)
 
 
+    @wrap_exception
     def __setitem__(self, index, item):
         """
         将列表中给定 index 上的值设置为 item 。
 
+        单个下标用 LSET 设置，slice 由一个 Lua 脚本在服务器上原子地替换，
+        只有新元素需要发送到服务器。
+
         Args:
             index ：可以是单个 key ，也可以是一个表示范围的 slice 。
-            item
+            item: 使用 slice 时为一个包含新元素的 iterable 。
 
         Time:
-            O(N)
+            O(N) ，使用下标时 N 为 index 到列表较近一端的距离，
+            使用 slice 时 N 为被替换的区间到列表较近一端的距离加上新旧元素的数量。
 
         Returns:
             None
 
         Raises:
+            IndexError: index 下标超出范围时抛出。
             TypeError: 尝试对非 list 类型的 key 进行操作时抛出。
+            ValueError: slice 的步长为 0 ，或者新元素的数量和扩展 slice 的长度不一致时抛出。
         """
-        # TODO: 这个实现带有竞争条件
-        all_python_item = list(self)
-
-        all_python_item[index] = item
-
-        self.delete()
-        self.extend(all_python_item)
+        if not isinstance(index, slice):
+            try:
+                self._client.lset(self.name, index, self._encode(item))
+            except redis.exceptions.ResponseError as e:
+                # 下标超出范围时返回 'index out of range' ，key 不存在时返回 'no such key'
+                message = str(e).lower()
+                if 'out of range' in message or 'no such key' in message:
+                    raise IndexError
+                raise
+            return
+
+        if index.step == 0:
+            raise ValueError('slice step cannot be zero')
+
+        redis_items = map(self._encode, item)
+        result = run_script(self._client, SLICE_SCRIPT,
+                            keys=[self.name],
+                            args=['set'] + _slice_args(index) + redis_items)
+        if result == -1:
+            raise ValueError('attempt to assign sequence of wrong size to extended slice')
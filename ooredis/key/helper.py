@@ -3,10 +3,18 @@
 __all__ = [
     'format_key',
     'wrap_exception',
+    'slice_to_range',
+    'score_bound',
+    'chunks',
+    'is_unknown_command',
+    'run_script',
+    'pair_with_scores',
+    'encode_name',
 ]
 
 import redis
 from functools import wraps
+from itertools import islice
 
 def format_key(key, name, value):
     """ 
@@ -27,3 +35,98 @@ def wrap_exception(func):
         except redis.exceptions.ResponseError:
             raise TypeError
     return wrapper
+
+def slice_to_range(index, get_length):
+    """
+    将 Python 的 slice 对象转换为 Redis 列表和有序集的 range 参数。
+
+    返回值是一个三元组 (start, end, step) ，
+    其中 start 和 end 是 LRANGE/ZRANGE 等命令使用的闭区间下标，
+    而 step 是取回这个区间之后，还需要在 Python 里执行的步长，
+    比如 items[::step] ；结果必定为空时返回 None 。
+
+    只有步长为负数时才需要知道 key 的长度，
+    这时调用无参数函数 get_length 来获取。
+    """
+    step = 1 if index.step is None else index.step
+    if step == 0:
+        raise ValueError('slice step cannot be zero')
+
+    if step > 0:
+        # Redis 的 range 下标和 Python 的 slice 下标一样，
+        # 支持负数以及超出范围的下标，唯一的区别是 Redis 的区间是闭区间，
+        # 所以 stop 为 0 时 stop-1 会变成 -1 (最右边)，需要单独处理。
+        if index.stop == 0:
+            return None
+        start = 0 if index.start is None else index.start
+        end = -1 if index.stop is None else index.stop-1
+        return start, end, step
+
+    start, stop, step = index.indices(get_length())
+    if start <= stop:
+        return None
+    return stop+1, start, step
+
+def score_bound(score, inclusive=True):
+    """
+    将 score 值转换为 ZRANGEBYSCORE 和 ZCOUNT 等命令使用的区间边界，
+    inclusive 为 False 时，边界不包含 score 本身。
+    """
+    if inclusive:
+        return score
+
+    # 用 repr 而不是 str ，避免 Python 2 的 str 截断 float 的精度
+    if not isinstance(score, basestring):
+        score = repr(score)
+    return '(' + score
+
+def chunks(iterable, size):
+    """
+    将 iterable 惰性地分割为多个长度不超过 size 的列表，
+    iterable 不会被一次性地读入内存。
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def is_unknown_command(error):
+    """
+    检查 redis-py 抛出的 ResponseError 是否因为服务器不支持某个命令，
+    或者不支持命令的某种参数形式(比如带 count 参数的 LPOP)而引起，
+    这通常说明服务器的版本比较旧，调用者可以转而使用兼容的实现。
+    """
+    message = str(error).lower()
+    return 'unknown command' in message or 'wrong number of arguments' in message
+
+# 已经创建的 Lua 脚本对象，以脚本的源码为键
+_scripts = {}
+
+def run_script(client, source, keys=(), args=()):
+    """
+    执行 Lua 脚本 source ，client 可以是客户端也可以是 pipeline 。
+
+    脚本通过 EVALSHA 执行，只在服务器还没有缓存脚本时才发送脚本的源码。
+    """
+    script = _scripts.get(source)
+    if script is None:
+        script = _scripts[source] = client.register_script(source)
+    return script(keys=list(keys), args=list(args), client=client)
+
+def pair_with_scores(reply):
+    """
+    将 Lua 脚本等返回的 [member, score, member, score, ...] 形式的列表
+    转换为 [(member, score), ...] 形式的列表，其中 score 为 float 。
+    """
+    return [(reply[i], float(reply[i+1])) for i in range(0, len(reply), 2)]
+
+def encode_name(name):
+    """
+    将 key 名转换为 redis-py 发送给服务器的字节串， unicode 使用 utf-8 编码，
+    用于和 BRPOP 等命令返回的 key 名进行比较。
+    """
+    if isinstance(name, unicode):
+        return name.encode('utf-8')
+    return str(name)
@@ -0,0 +1,223 @@
+# coding: utf-8
+
+__all__ = ['Leaderboard']
+
+__metaclass__ = type
+
+from ooredis.type_case import GenericTypeCase
+from ooredis.const import (
+    DEFAULT_INCREMENT,
+    DEFAULT_PAGE_SIZE,
+    DEFAULT_CHUNK_SIZE,
+)
+
+from sorted_set import SortedSet, zadd_options
+from helper import wrap_exception, run_script, pair_with_scores
+
+# 取出 member 的逆序排名、排名前后 n 个元素以及排行榜的前 k 个元素
+# KEYS[1]: 排行榜
+# ARGV[1]: member
+# ARGV[2]: n
+# ARGV[3]: k
+AROUND_SCRIPT = """
+local rank = redis.call('ZREVRANK', KEYS[1], ARGV[1])
+if not rank then
+    return false
+end
+
+local n = tonumber(ARGV[2])
+local k = tonumber(ARGV[3])
+
+local start = rank - n
+if start < 0 then
+    start = 0
+end
+
+local around = redis.call('ZREVRANGE', KEYS[1], start, rank + n, 'WITHSCORES')
+local top = {}
+if k > 0 then
+    top = redis.call('ZREVRANGE', KEYS[1], 0, k - 1, 'WITHSCORES')
+end
+
+return {rank, around, top}
+"""
+
+class Leaderboard(SortedSet):
+
+    """
+    只保留 score 值最大的 capacity 个成员的排行榜，底层实现是 Redis 的有序集。
+
+    每次更新之后，排行榜都会用 ZREMRANGEBYRANK 移除多出的成员，
+    更新和移除在同一个事务里执行，只需要一次往返。
+    """
+
+    def __init__(self, name, capacity, client=None, type_case=GenericTypeCase,
+                 page_size=DEFAULT_PAGE_SIZE, item_type=dict, score_type_case=None):
+        """
+        初始化一个 Leaderboard 类实例。
+
+        Args:
+            name: Redis key 的名字
+            capacity: 排行榜最多保留的成员数量
+            client: 客户端，默认为全局客户端
+            type_case: 类型转换类
+            page_size: 遍历排行榜时，每次从 Redis 取出的元素数量
+            item_type: 返回元素时使用的类型，参考 SortedSet 。
+            score_type_case: score 值的类型转换类，参考 SortedSet 。
+
+        Raises:
+            ValueError: capacity 不是正整数，或者 item_type 不正确时抛出。
+        """
+        if capacity <= 0:
+            raise ValueError('capacity must be a positive integer')
+
+        super(Leaderboard, self).__init__(name=name, client=client,
+                                          type_case=type_case,
+                                          page_size=page_size,
+                                          item_type=item_type,
+                                          score_type_case=score_type_case)
+        self.capacity = capacity
+
+
+    def _trim(self, pipe):
+        """
+        将移除排名在 capacity 之后的成员的命令放入 pipe 中。
+        """
+        pipe.zremrangebyrank(self.name, 0, -(self.capacity+1))
+
+
+    @wrap_exception
+    def __setitem__(self, member, new_score):
+        """
+        将元素 member 的 score 值更新为 new_score ，并移除多出的成员。
+
+        Args:
+            member
+            new_score
+
+        Time:
+            O(log(N)+M) ， N 为排行榜的成员数量，而 M 为被移除的成员数量。
+
+        Returns:
+            None
+
+        Raises:
+            TypeError: 当 key 不是有序集类型时抛出。
+        """
+        pipe = self._client.pipeline()
+        pipe.zadd(self.name, self._encode(member), self._encode_score(new_score))
+        self._trim(pipe)
+        pipe.execute()
+
+
+    @wrap_exception
+    def update(self, mapping_or_pairs, nx=False, xx=False, gt=False, lt=False,
+               ch=False, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        将多个 member 和 score 批量加入到排行榜，并移除多出的成员。
+
+        参数和返回值参考 SortedSet.update ，
+        返回值计算的是 ZADD 的结果，被移除的成员不会从中扣除。
+
+        Time:
+            O(M*log(N)) ， N 为排行榜的成员数量，而 M 为被添加的元素数量。
+
+        Raises:
+            TypeError: 当 key 不是有序集类型时抛出。
+            ValueError: 同时给出互相冲突的选项，比如 nx 和 xx 时抛出。
+        """
+        options = zadd_options(nx, xx, gt, lt, ch)
+
+        pipe = self._client.pipeline()
+        self._zadd_many(pipe, mapping_or_pairs, options, chunk_size)
+        self._trim(pipe)
+        return sum(pipe.execute()[:-1])
+
+
+    @wrap_exception
+    def incr(self, member, increment=DEFAULT_INCREMENT):
+        """
+        将 member 的 score 值加上 increment ，并移除多出的成员。
+
+        Args:
+            member: 排行榜成员
+            increment: 增量，默认为1。
+
+        Time:
+            O(log(N)+M) ， N 为排行榜的成员数量，而 M 为被移除的成员数量。
+
+        Returns:
+            float: member 成员的新 score 值，
+                   注意 member 有可能因为排名不够高而被移除。
+
+        Raises:
+            TypeError: 当 key 不是有序集类型，或者设置了 score_type_case 时抛出。
+        """
+        self._check_incr()
+
+        pipe = self._client.pipeline()
+        pipe.zincrby(self.name, self._encode(member), increment)
+        self._trim(pipe)
+        return pipe.execute()[0]
+
+
+    @wrap_exception
+    def top(self, k):
+        """
+        返回排行榜中 score 值最大的 k 个元素。
+
+        Args:
+            k: 返回的元素数量，不大于 0 时返回空列表。
+
+        Time:
+            O(log(N)+k) ， N 为排行榜的成员数量。
+
+        Returns:
+            list: 按 score 值从大到小排列的元素列表，元素的类型由 item_type 指定。
+
+        Raises:
+            TypeError: 当 key 不是有序集类型时抛出。
+        """
+        # k 为 0 时 ZREVRANGE 0 -1 会取出整个排行榜，所以直接返回
+        if k <= 0:
+            return []
+
+        items = self._client.zrevrange(self.name, 0, k-1, withscores=True)
+        return self._decode_items(items)
+
+
+    @wrap_exception
+    def around(self, member, n=5, top=0):
+        """
+        在一次脚本调用中返回 member 的排名，以及排名在它前后的 n 个元素，
+        还可以同时返回排行榜中 score 值最大的 top 个元素。
+
+        Args:
+            member: 排行榜成员。
+            n: 返回排名在 member 之前以及之后的元素数量。
+            top: 同时返回的排行榜前几名的数量，默认不返回。
+
+        Time:
+            O(log(N)+n+top) ， N 为排行榜的成员数量。
+
+        Returns:
+            None: member 不是排行榜的成员时返回。
+            dict: 包含以下三个项：
+                  'rank' ， member 的逆序排名；
+                  'around' ，排名在 member 前后的元素，包括 member 本身，
+                             第一个元素的排名为 max(rank-n, 0) ；
+                  'top' ，排行榜的前 top 个元素。
+
+        Raises:
+            TypeError: 当 key 不是有序集类型时抛出。
+        """
+        reply = run_script(self._client, AROUND_SCRIPT,
+                           keys=[self.name],
+                           args=[self._encode(member), n, top])
+        if reply is None:
+            return
+
+        rank, around, top_items = reply
+        return dict(rank=rank,
+                    around=self._decode_items(pair_with_scores(around)),
+                    top=self._decode_items(pair_with_scores(top_items)))
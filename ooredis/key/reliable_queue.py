@@ -0,0 +1,386 @@
+# coding: utf-8
+
+__all__ = ['ReliableQueue', 'Reaper']
+
+__metaclass__ = type
+
+import os
+import time
+import redis
+import socket
+import logging
+import threading
+
+from ooredis.type_case import GenericTypeCase
+
+from deque import Deque
+from base_key import BaseKey
+from helper import format_key, wrap_exception, is_unknown_command, run_script
+from common_key_property_mixin import CommonKeyPropertyMixin
+
+# 默认的可见性超时秒数，消费者超过这个时间没有续约，它正在处理的任务就会被重新投递
+DEFAULT_VISIBILITY_TIMEOUT = 30
+
+# Reaper 线程默认的执行间隔秒数
+DEFAULT_REAP_INTERVAL = 5
+
+logger = logging.getLogger(__name__)
+
+# 如果消费者的租约已经过期，那么将它正在处理的任务全部放回队列，并删除它的租约
+# 放回的任务位于队列的出队端，会被最先重新投递
+# KEYS[1]: 保存租约的有序集
+# KEYS[2]: 队列
+# KEYS[3]: 消费者的 processing 列表
+# ARGV[1]: 消费者
+# ARGV[2]: 当前时间
+REAP_SCRIPT = """
+local deadline = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not deadline or tonumber(deadline) > tonumber(ARGV[2]) then
+    return 0
+end
+
+local items = redis.call('LRANGE', KEYS[3], 0, -1)
+for i = 1, #items, 1000 do
+    redis.call('RPUSH', KEYS[2], unpack(items, i, math.min(i + 999, #items)))
+end
+redis.call('DEL', KEYS[3])
+redis.call('ZREM', KEYS[1], ARGV[1])
+return #items
+"""
+
+def default_consumer():
+    """
+    返回以主机名和进程号组成的默认消费者名字。
+    """
+    return '{0}:{1}'.format(socket.gethostname(), os.getpid())
+
+class ReliableQueue(BaseKey, CommonKeyPropertyMixin):
+
+    """
+    至少投递一次(at-least-once)的可靠队列。
+
+    get 用 BLMOVE (旧版本服务器使用 BRPOPLPUSH)将任务从队列原子地移动到
+    消费者自己的 processing 列表，消费者处理完任务之后用 ack 将它移除。
+
+    每个消费者都在一个有序集中持有一个租约， get 在取得任务之后立即续约，
+    所以每个任务从被取出开始都有 visibility_timeout 秒的处理时间；
+    除此之外，距离上一次续约超过 visibility_timeout/2 秒时， get 和 ack 也会顺带续约。
+    消费者崩溃之后租约不再续约，reap 会将它 processing 列表中的任务放回队列，
+    这一步通常由 Reaper 线程定期执行。
+
+    处理单个任务的时间可能超过 visibility_timeout 时，应该定期调用 heartbeat ，
+    否则任务会被重新投递给其他消费者。
+    """
+
+    def __init__(self, name, consumer=None, client=None, type_case=GenericTypeCase,
+                 visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT):
+        """
+        初始化一个 ReliableQueue 类实例。
+
+        Args:
+            name: 队列的 key 名
+            consumer: 消费者的名字，同一个队列的消费者的名字不能重复，
+                      默认由主机名和进程号组成。
+            client: 客户端，默认为全局客户端
+            type_case: 类型转换类
+            visibility_timeout: 消费者的租约时长，以秒为单位。
+
+        Raises:
+            ValueError: visibility_timeout 不是正数时抛出。
+        """
+        if visibility_timeout <= 0:
+            raise ValueError('visibility_timeout must be positive')
+
+        super(ReliableQueue, self).__init__(name=name, client=client, type_case=type_case)
+
+        if consumer is None:
+            consumer = default_consumer()
+        self.consumer = consumer
+        self.visibility_timeout = visibility_timeout
+
+        self.queue = Deque(name, client=self._client, type_case=type_case)
+        self.processing = self._processing(consumer, type_case)
+        self.leases = name + ':leases'
+
+        # 上一次续约的本机时间， None 表示还没有续约
+        self._renewed_at = None
+        # 服务器是否支持 BLMOVE ，第一次调用失败之后直接使用 BRPOPLPUSH
+        self._has_blmove = True
+
+
+    def _processing(self, consumer, type_case=GenericTypeCase):
+        """
+        返回消费者 consumer 的 processing 列表。
+        """
+        return Deque('{0}:processing:{1}'.format(self.name, consumer),
+                     client=self._client, type_case=type_case)
+
+
+    def __repr__(self):
+        return format_key(self, self.name, list(self.queue))
+
+
+    def __len__(self):
+        """
+        返回还没有被取出的任务数量，不包括正在处理的任务。
+
+        Time:
+            O(1)
+
+        Returns:
+            int
+
+        Raises:
+            TypeError: 当 key 不是 list 类型时抛出。
+        """
+        return len(self.queue)
+
+
+    def put(self, item):
+        """
+        将任务加入队列。
+
+        Args:
+            item: 任务
+
+        Time:
+            O(1)
+
+        Returns:
+            None
+
+        Raises:
+            TypeError: 当 key 不是 list 类型时抛出。
+        """
+        # 任务从左边加入，从右边取出，这是 BRPOPLPUSH 唯一支持的方向
+        self.queue.appendleft(item)
+
+
+    def put_many(self, items):
+        """
+        将多个任务加入队列，先给出的任务先被取出。
+
+        Args:
+            items: 一个包含多个任务的 iterable 。
+
+        Time:
+            O(M) ， M 为被加入的任务数量。
+
+        Returns:
+            int: 被加入的任务数量。
+
+        Raises:
+            TypeError: 当 key 不是 list 类型时抛出。
+        """
+        return self.queue.extendleft(items)
+
+
+    @wrap_exception
+    def heartbeat(self, now=None):
+        """
+        续约当前消费者的租约，租约在 now + visibility_timeout 时到期。
+
+        Args:
+            now: 当前时间的 unix 时间戳，默认使用本机时间。
+
+        Time:
+            O(log(N)) ， N 为消费者的数量。
+
+        Returns:
+            None
+
+        Raises:
+            TypeError: 当保存租约的 key 不是有序集类型时抛出。
+        """
+        if now is None:
+            now = time.time()
+        self._client.zadd(self.leases, self.consumer, now + self.visibility_timeout)
+        self._renewed_at = now
+
+
+    def _renew_if_stale(self):
+        """
+        如果距离上一次续约已经超过 visibility_timeout/2 秒，那么续约。
+        """
+        now = time.time()
+        if self._renewed_at is None or now - self._renewed_at >= self.visibility_timeout / 2.0:
+            self.heartbeat(now)
+
+
+    @wrap_exception
+    def get(self, timeout=0):
+        """
+        取出一个任务并将它移动到当前消费者的 processing 列表，
+        如果队列为空，那么阻塞 timeout 秒，直到获取任务或超时为止。
+
+        取得任务之后会立即续约，所以任务在被 reap 放回队列之前
+        至少有 visibility_timeout 秒的处理时间。
+        任务在 ack 之前会一直保存在 processing 列表中。
+
+        Args:
+            timeout: 等待任务时的最大阻塞秒数，为 0 时一直阻塞。
+
+        Time:
+            O(log(N)) ， N 为消费者的数量。
+
+        Returns:
+            None: 超时时返回
+            item: 被取出的任务
+
+        Raises:
+            TypeError: 当 key 不是 list 类型时抛出。
+        """
+        self._renew_if_stale()
+
+        redis_item = None
+        if self._has_blmove:
+            try:
+                redis_item = self._client.execute_command('BLMOVE', self.queue.name,
+                                                          self.processing.name,
+                                                          'RIGHT', 'LEFT', timeout)
+            except redis.exceptions.ResponseError as e:
+                if not is_unknown_command(e):
+                    raise
+                self._has_blmove = False
+
+        if not self._has_blmove:
+            redis_item = self._client.brpoplpush(self.queue.name,
+                                                 self.processing.name, timeout)
+
+        if redis_item is None:
+            return
+
+        # 任务的处理时间从取出的这一刻开始计算，
+        # 并且阻塞期间租约可能已经过期并被 reap 删除，所以无论租约是否新鲜都要续约
+        self.heartbeat()
+        return self._decode(redis_item)
+
+
+    @wrap_exception
+    def ack(self, item):
+        """
+        确认任务已经处理完毕，将它从当前消费者的 processing 列表中移除。
+
+        Args:
+            item: get 返回的任务
+
+        Time:
+            O(N) ， N 为 processing 列表中位于 item 之前的任务数量，通常很小。
+
+        Returns:
+            bool: 任务被移除时返回 True ，
+                  任务不在 processing 列表中(比如已经被 reap 重新投递)时返回 False 。
+
+        Raises:
+            TypeError: 当 processing 列表不是 list 类型时抛出。
+        """
+        self._renew_if_stale()
+        removed = self._client.execute_command('LREM', self.processing.name, 1,
+                                               self._encode(item))
+        return removed == 1
+
+
+    @wrap_exception
+    def reap(self, now=None):
+        """
+        将所有租约已经过期的消费者正在处理的任务放回队列，并删除它们的租约。
+
+        每个消费者由一次 Lua 脚本调用处理，脚本会再次检查租约，
+        所以即使消费者在检查之后刚好续约，它的任务也不会被错误地放回。
+
+        Args:
+            now: 当前时间的 unix 时间戳，默认使用本机时间。
+
+        Time:
+            O(C*log(N)+M) ， N 为消费者的数量， C 为租约过期的消费者数量，
+            而 M 为被放回的任务数量。
+
+        Returns:
+            int: 被放回队列的任务数量。
+
+        Raises:
+            TypeError: 当 key 的类型不正确时抛出。
+        """
+        if now is None:
+            now = time.time()
+
+        expired = self._client.zrangebyscore(self.leases, '-inf', now)
+
+        pipe = self._client.pipeline(transaction=False)
+        for consumer in expired:
+            run_script(pipe, REAP_SCRIPT,
+                       keys=[self.leases, self.queue.name, self._processing(consumer).name],
+                       args=[consumer, now])
+        return sum(pipe.execute())
+
+
+    def clear(self):
+        """
+        删除队列、所有租约以及已知消费者的 processing 列表。
+
+        Time:
+            O(N)
+
+        Returns:
+            None
+
+        Raises:
+            None
+        """
+        consumers = set(self._client.zrange(self.leases, 0, -1))
+        consumers.add(self.consumer)
+
+        processing = [self._processing(consumer).name for consumer in consumers]
+        self._client.delete(self.queue.name, self.leases, *processing)
+        self._renewed_at = None
+
+class Reaper(threading.Thread):
+
+    """
+    定期对一个或多个 ReliableQueue 执行 reap 的后台线程。
+
+    某个队列的 reap 抛出异常(比如连接中断)时，异常会被记录到日志中，
+    线程继续处理其他队列，并在下一个间隔重试。
+
+    用法：
+
+        >>> reaper = Reaper([queue], interval=5)
+        >>> reaper.start()
+        ...
+        >>> reaper.stop()
+    """
+
+    def __init__(self, queues, interval=DEFAULT_REAP_INTERVAL):
+        """
+        Args:
+            queues: 一个包含 ReliableQueue 对象的列表。
+            interval: 两次 reap 之间的间隔秒数。
+        """
+        super(Reaper, self).__init__()
+        self.daemon = True
+        self.queues = list(queues)
+        self.interval = interval
+        # 被放回队列的任务总数
+        self.reaped = 0
+        # reap 抛出异常的次数
+        self.errors = 0
+        self._stopped = threading.Event()
+
+
+    def run(self):
+        while not self._stopped.is_set():
+            for queue in self.queues:
+                try:
+                    self.reaped += queue.reap()
+                except Exception:
+                    self.errors += 1
+                    logger.exception('failed to reap %s', queue.name)
+            self._stopped.wait(self.interval)
+
+
+    def stop(self, timeout=None):
+        """
+        停止线程，并等待最多 timeout 秒直到线程退出。
+        """
+        self._stopped.set()
+        self.join(timeout)
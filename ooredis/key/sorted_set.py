@@ -1,19 +1,42 @@
 # coding: utf-8
 
-__all__ = ['SortedSet']
+__all__ = [
+    'SortedSet', 'ScoredMember',
+    'block_pop_min_any', 'block_pop_max_any',
+]
 
 __metaclass__ = type
 
-from functools import partial
+import redis
+import uuid
+
+from ooredis.type_case import GenericTypeCase
 from ooredis.const import (
     LEFTMOST,
     RIGHTMOST,
     DEFAULT_INCREMENT,
     DEFAULT_DECREMENT,
+    DEFAULT_PAGE_SIZE,
+    DEFAULT_CHUNK_SIZE,
+    MIN_SCORE,
+    MAX_SCORE,
+    MIN_LEX,
+    MAX_LEX,
+    TEMPORARY_KEY_TTL,
 )
 
 from base_key import BaseKey
-from helper import format_key, wrap_exception
+from helper import (
+    format_key,
+    wrap_exception,
+    slice_to_range,
+    score_bound,
+    chunks,
+    is_unknown_command,
+    pair_with_scores,
+    run_script,
+    encode_name,
+)
 from common_key_property_mixin import CommonKeyPropertyMixin
 
 # redis command execute status code
@@ -21,15 +44,298 @@ MEMBER_NOT_IN_SET_AND_REMOVE_FALSE = 0
 MEMBER_NOT_IN_SET_AND_DELETE_FALSE = 0
 MEMBER_NOT_IN_SET_AND_GET_SCORE_FALSE = None
 
+# 对于 ARGV 中的每个分位数 q ，取出排名为 round(q*(N-1)) 的元素，
+# 返回 [member, score, member, score, ...] ，有序集为空时返回空列表
+# KEYS[1]: 有序集
+QUANTILE_SCRIPT = """
+local n = redis.call('ZCARD', KEYS[1])
+local result = {}
+if n == 0 then
+    return result
+end
+
+for i = 1, #ARGV do
+    local rank = math.floor(tonumber(ARGV[i]) * (n - 1) + 0.5)
+    local item = redis.call('ZRANGE', KEYS[1], rank, rank, 'WITHSCORES')
+    result[#result+1] = item[1]
+    result[#result+1] = item[2]
+end
+return result
+"""
+
+class ScoredMember:
+
+    """ 
+    有序集元素的紧凑表示，
+    用 __slots__ 保存 member 和 score ，比每个元素一个字典更节约内存。
+    """
+
+    __slots__ = ('member', 'score')
+
+    def __init__(self, member, score):
+        self.member = member
+        self.score = score
+
+    def __iter__(self):
+        """ 
+        支持 member, score = item 形式的解包。
+        """
+        yield self.member
+        yield self.score
+
+    def __eq__(self, other):
+        return isinstance(other, ScoredMember) and \
+               self.member == other.member and self.score == other.score
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'ScoredMember(member={0!r}, score={1!r})'.format(self.member, self.score)
+
+# SortedSet 返回的元素可以使用的类型
+ITEM_TYPES = (dict, tuple, ScoredMember)
+
+# ZUNIONSTORE 和 ZINTERSTORE 可以使用的聚合方式
+AGGREGATES = ('SUM', 'MIN', 'MAX')
+
+def zadd_options(nx=False, xx=False, gt=False, lt=False, ch=False):
+    """ 
+    检查并生成 ZADD 命令的选项。
+    """
+    if nx and (xx or gt or lt):
+        raise ValueError('nx can not be used together with xx, gt or lt')
+    if gt and lt:
+        raise ValueError('gt can not be used together with lt')
+
+    return [name for name, enabled in (('NX', nx), ('XX', xx),
+                                       ('GT', gt), ('LT', lt),
+                                       ('CH', ch)) if enabled]
+
+def _block_pop(command, sorted_sets, timeout):
+    sorted_sets = list(sorted_sets)
+    if not sorted_sets:
+        raise ValueError('at least one sorted set is required')
+    names = [sorted_set.name for sorted_set in sorted_sets]
+
+    # 每个非空 BZPOPMIN/BZPOPMAX 的结果都是一个列表 [key, member, score]
+    client = sorted_sets[0]._client
+    reply = client.execute_command(command, *(names + [timeout]))
+    if reply is None:
+        return
+
+    # 服务器返回的 key 名是字节串，需要和编码之后的 key 名比较
+    name, redis_member, score = reply
+    sorted_set = sorted_sets[map(encode_name, names).index(name)]
+    python_item = sorted_set._decode_items([(redis_member, float(score))])[0]
+    return sorted_set, python_item
+
+@wrap_exception
+def block_pop_min_any(sorted_sets, timeout=0):
+    """ 
+    按给定的顺序检查多个有序集，移除并返回第一个非空有序集中 score 值最小的元素，
+    如果所有有序集都为空，那么阻塞 timeout 秒，直到获取元素或超时为止。
+
+    所有有序集都使用第一个有序集的客户端，只需要一个 BZPOPMIN 命令。
+
+    Args:
+        sorted_sets: 一个包含多个 SortedSet 对象的 iterable 。
+        timeout: 等待元素时的最大阻塞秒数，为 0 时一直阻塞。
+
+    Time:
+        O(log(N)) ， N 为被弹出元素的有序集的基数。
+
+    Returns:
+        None: 超时时返回
+        tuple: (sorted_set, item) ，被弹出元素的有序集对象以及被弹出的元素。
+
+    Raises:
+        TypeError: 当某个 key 不是有序集类型时抛出。
+        ValueError: sorted_sets 为空时抛出。
+    """
+    return _block_pop('BZPOPMIN', sorted_sets, timeout)
+
+@wrap_exception
+def block_pop_max_any(sorted_sets, timeout=0):
+    """ 
+    按给定的顺序检查多个有序集，移除并返回第一个非空有序集中 score 值最大的元素，
+    如果所有有序集都为空，那么阻塞 timeout 秒，直到获取元素或超时为止。
+
+    所有有序集都使用第一个有序集的客户端，只需要一个 BZPOPMAX 命令。
+
+    Args:
+        sorted_sets: 一个包含多个 SortedSet 对象的 iterable 。
+        timeout: 等待元素时的最大阻塞秒数，为 0 时一直阻塞。
+
+    Time:
+        O(log(N)) ， N 为被弹出元素的有序集的基数。
+
+    Returns:
+        None: 超时时返回
+        tuple: (sorted_set, item) ，被弹出元素的有序集对象以及被弹出的元素。
+
+    Raises:
+        TypeError: 当某个 key 不是有序集类型时抛出。
+        ValueError: sorted_sets 为空时抛出。
+    """
+    return _block_pop('BZPOPMAX', sorted_sets, timeout)
+
 class SortedSet(BaseKey, CommonKeyPropertyMixin):
 
     """ 
     将 Redis 的 sorted set 结构映射为有序集对象。
     """
 
+    def __init__(self, name, client=None, type_case=GenericTypeCase,
+                 page_size=DEFAULT_PAGE_SIZE, item_type=dict, score_type_case=None):
+        """ 
+        初始化一个 SortedSet 类实例。
+
+        Args:
+            name: Redis key 的名字
+            client: 客户端，默认为全局客户端
+            type_case: 类型转换类
+            page_size: 遍历有序集时，每次从 Redis 取出的元素数量
+            item_type: 返回元素时使用的类型，可以是以下三种之一：
+                       dict ，包含 member 和 score 两个键的字典(默认)；
+                       tuple ， (member, score) 二元组；
+                       ScoredMember ，带有 member 和 score 属性的对象。
+            score_type_case: score 值的类型转换类，比如 CompositeScoreTypeCase 的实例，
+                             默认为 None ， score 值以 float 的形式读取和写入。
+                             注意 range_by_score 等方法的区间参数不会被转换。
+                             打包后的 score 值不能直接相加，
+                             所以设置了 score_type_case 的有序集不能使用 incr 和 decr 。
+
+        Raises:
+            ValueError: item_type 不是以上三种类型之一时抛出。
+        """
+        if item_type not in ITEM_TYPES:
+            raise ValueError('item_type must be one of dict, tuple or ScoredMember')
+
+        super(SortedSet, self).__init__(name=name, client=client, type_case=type_case)
+        self.page_size = page_size
+        self.item_type = item_type
+        self._score_type_case = score_type_case
+
+
     def __repr__(self):
         return format_key(self, self.name, list(self))
-  
+
+
+    def _decode_items(self, items):
+        """ 
+        将 ZRANGE 等命令返回的 (member, score) 列表一次过解码，
+        每个元素都被转换成 self.item_type 指定的类型。
+        """
+        if self._score_type_case is not None:
+            decode_score = self._score_type_case.decode
+            items = [(member, decode_score(score)) for member, score in items]
+
+        decode = self._decode
+        if self.item_type is tuple:
+            return [(decode(member), score) for member, score in items]
+        elif self.item_type is ScoredMember:
+            return [ScoredMember(decode(member), score) for member, score in items]
+        else:
+            return [dict(member=decode(member), score=score) for member, score in items]
+
+
+    def _encode_score(self, score):
+        """ 
+        用 score_type_case 转换将要写入的 score 值。
+        """
+        if self._score_type_case is None:
+            return score
+        return self._score_type_case.encode(score)
+
+
+    def _decode_score(self, score):
+        """ 
+        用 score_type_case 转换从 Redis 读取的 score 值。
+        """
+        if self._score_type_case is None or score is None:
+            return score
+        return self._score_type_case.decode(score)
+
+
+    def _check_incr(self):
+        """ 
+        打包后的 score 值相加会让低位的列进位到高位的列，
+        得到的结果没有意义，所以设置了 score_type_case 时不允许 incr 。
+        """
+        if self._score_type_case is not None:
+            raise TypeError('incr and decr are not supported when score_type_case is set')
+
+
+    def iterate(self, reverse=False, page_size=None):
+        """ 
+        以分页的方式遍历有序集，每页只需要一次 ZRANGE 或 ZREVRANGE 调用。
+
+        遍历期间如果有序集被修改，那么元素可能会被跳过或者被重复返回。
+
+        Args:
+            reverse: 为 True 时按 score 值从大到小遍历，默认从小到大。
+            page_size: 每页的元素数量，默认为 self.page_size 。
+
+        Time:
+            O(log(N)+M) ， N 为有序集的基数，而 M 为每页的元素数量。
+
+        Returns:
+            iterator: 迭代器的每个项都是一个元素，元素的类型由 item_type 指定。
+
+        Raises:
+            TypeError: 当 key 不是有序集类型时抛出。
+        """
+        page_size = page_size or self.page_size
+        zrange = self._client.zrevrange if reverse else self._client.zrange
+
+        start = LEFTMOST
+        while True:
+            # 生成器在被迭代时才执行，所以这里不能用 wrap_exception
+            try:
+                items = zrange(self.name, start, start+page_size-1, withscores=True)
+            except redis.exceptions.ResponseError:
+                raise TypeError
+
+            for item in self._decode_items(items):
+                yield item
+
+            if len(items) < page_size:
+                break
+            start += page_size
+
+
+    def __iter__(self):
+        """ 
+        按 score 值从小到大的顺序分页遍历有序集。
+
+        Time:
+            O(log(N)+M) ， N 为有序集的基数，而 M 为每页的元素数量。
+
+        Returns:
+            iterator
+
+        Raises:
+            TypeError: 当 key 不是有序集类型时抛出。
+        """
+        return self.iterate()
+
+
+    def __reversed__(self):
+        """ 
+        按 score 值从大到小的顺序分页遍历有序集。
+
+        Time:
+            O(log(N)+M) ， N 为有序集的基数，而 M 为每页的元素数量。
+
+        Returns:
+            iterator
+
+        Raises:
+            TypeError: 当 key 不是有序集类型时抛出。
+        """
+        return self.iterate(reverse=True)
+
 
     @wrap_exception
     def __len__(self):
@@ -99,7 +405,59 @@ class SortedSet(BaseKey, CommonKeyPropertyMixin):
             TypeError: 当key不是有序集类型时抛出。
         """
         redis_memeber = self._encode(member)
-        self._client.zadd(self.name, redis_memeber, new_score)
+        self._client.zadd(self.name, redis_memeber, self._encode_score(new_score))
+
+
+    @wrap_exception
+    def update(self, mapping_or_pairs, nx=False, xx=False, gt=False, lt=False,
+               ch=False, chunk_size=DEFAULT_CHUNK_SIZE):
+        """ 
+        将多个 member 和 score 批量加入到有序集，
+        元素被分割为多个可变参数的 ZADD 命令，并通过同一个 pipeline 发送。
+
+        Args:
+            mapping_or_pairs: 一个以 member 为键、 score 为值的字典，
+                              或者一个包含 (member, score) 二元组的 iterable 。
+            nx: 为 True 时只添加新成员，不更新已有成员的 score 值。
+            xx: 为 True 时只更新已有成员的 score 值，不添加新成员。
+            gt: 为 True 时只在新 score 值比原来的大时才更新。
+            lt: 为 True 时只在新 score 值比原来的小时才更新。
+            ch: 为 True 时返回值包括 score 值被更新的成员。
+            chunk_size: 每个 ZADD 命令携带的元素数量。
+
+        Time:
+            O(M*log(N)) ， N 为有序集的基数，而 M 为被添加的元素数量。
+
+        Returns:
+            int: 被添加的新成员数量，
+                 ch 为 True 时是被添加以及 score 值被更新的成员数量。
+
+        Raises:
+            TypeError: 当 key 不是有序集类型时抛出。
+            ValueError: 同时给出互相冲突的选项，比如 nx 和 xx 时抛出。
+        """
+        options = zadd_options(nx, xx, gt, lt, ch)
+
+        pipe = self._client.pipeline(transaction=False)
+        self._zadd_many(pipe, mapping_or_pairs, options, chunk_size)
+        return sum(pipe.execute())
+
+
+    def _zadd_many(self, pipe, mapping_or_pairs, options, chunk_size):
+        """ 
+        将 mapping_or_pairs 分割成多个可变参数的 ZADD 命令，并放入 pipe 中。
+        """
+        if hasattr(mapping_or_pairs, 'items'):
+            mapping_or_pairs = mapping_or_pairs.items()
+
+        for chunk in chunks(mapping_or_pairs, chunk_size):
+            redis_members = map(self._encode, [member for member, score in chunk])
+
+            args = list(options)
+            for redis_member, (member, score) in zip(redis_members, chunk):
+                args.extend((self._encode_score(score), redis_member))
+
+            pipe.execute_command('ZADD', self.name, *args)
 
 
     @wrap_exception
@@ -107,33 +465,36 @@ class SortedSet(BaseKey, CommonKeyPropertyMixin):
         """ 
         返回有序集指定下标内的元素。
 
+        slice 对象会被转换成一次 ZRANGE 调用，只取回 slice 覆盖的区间，
+        如果 slice 带有步长，那么步长在取回的区间上执行。
+
         Args:
             index: 一个下标或一个 slice 对象。
 
         Returns:
-            dict： 使用下标时，返回一个字典，包含 member 和 score 。
-            list：使用 slice 对象时，返回一个列表， 列表中每个项都是一个字典。
+            item： 使用下标时，返回一个元素，元素的类型由 item_type 指定。
+            list：使用 slice 对象时，返回一个列表， 列表中每个项都是一个元素。
 
         Time:
-            O(log(N)+M) ， N 为有序集的基数，而 M 为结果集的基数。
+            O(log(N)+M) ， N 为有序集的基数，而 M 为 slice 覆盖的区间的元素数量。
 
         Raises:
             KeyError: index 下标超出范围时抛出。
             TypeError: 当 key 不是有序集类型时抛出。
+            ValueError: slice 的步长为 0 时抛出。
         """
-        item_to_dict_list = \
-            partial(map,
-                    lambda item: dict(
-                        member=self._decode(item[0]), 
-                        score=item[1]
-                    ))
-
         if isinstance(index, slice):
-            items = self._client.zrange(self.name, LEFTMOST, RIGHTMOST, withscores=True)
-            return item_to_dict_list(items[index])
+            # 只有负数步长需要有序集的基数，这时会多执行一次 ZCARD
+            redis_range = slice_to_range(index, self.__len__)
+            if redis_range is None:
+                return []
+
+            start, end, step = redis_range
+            items = self._client.zrange(self.name, start, end, withscores=True)
+            return self._decode_items(items[::step])
         else:
             items = self._client.zrange(self.name, index, index, withscores=True)
-            return item_to_dict_list(items)[0]
+            return self._decode_items(items)[0]
 
 
     @wrap_exception
@@ -243,13 +604,80 @@ class SortedSet(BaseKey, CommonKeyPropertyMixin):
 
         Returns:
             None: 当 member 不是有序集的成员时返回
-            float: 以浮点值表示的 score 值。
+            float: 以浮点值表示的 score 值，设置了 score_type_case 时为转换之后的值。
 
         Raises:
             TypeError: 当 key 不是有序集类型时抛出，由 in 语句抛出。
         """
         redis_member = self._encode(member)
-        return self._client.zscore(self.name, redis_member)
+        score = self._client.zscore(self.name, redis_member)
+        return self._decode_score(score)
+
+
+    @wrap_exception
+    def score_many(self, members):
+        """ 
+        按给定的顺序返回多个成员的 score 值。
+
+        使用 ZMSCORE 命令，如果服务器不支持 ZMSCORE (Redis 6.2 之前的版本)，
+        那么用 pipeline 发送多个 ZSCORE 命令，两种方式都只需要一次往返。
+
+        Args:
+            members: 一个包含多个成员的 iterable 。
+
+        Time:
+            O(M) ， M 为给定成员的数量。
+
+        Returns:
+            list: 和 members 顺序一致的 score 值列表，
+                  不是有序集成员的 member 对应的值为 None 。
+
+        Raises:
+            TypeError: 当 key 不是有序集类型时抛出。
+        """
+        redis_members = [self._encode(member) for member in members]
+        if not redis_members:
+            return []
+
+        try:
+            scores = self._client.execute_command('ZMSCORE', self.name, *redis_members)
+        except redis.exceptions.ResponseError as e:
+            if not is_unknown_command(e):
+                raise
+
+            pipe = self._client.pipeline(transaction=False)
+            for redis_member in redis_members:
+                pipe.zscore(self.name, redis_member)
+            scores = pipe.execute()
+
+        return [None if score is None else self._decode_score(float(score))
+                for score in scores]
+
+
+    @wrap_exception
+    def rank_many(self, members, reverse=False):
+        """ 
+        按给定的顺序返回多个成员的排名，所有 ZRANK 命令通过一个 pipeline 发送。
+
+        Args:
+            members: 一个包含多个成员的 iterable 。
+            reverse: 为 True 时返回按 score 值从大到小的排名(逆序)。
+
+        Time:
+            O(M*log(N)) ， N 为有序集的基数，而 M 为给定成员的数量。
+
+        Returns:
+            list: 和 members 顺序一致的排名列表，
+                  不是有序集成员的 member 对应的值为 None 。
+
+        Raises:
+            TypeError: 当 key 不是有序集类型时抛出。
+        """
+        pipe = self._client.pipeline(transaction=False)
+        zrank = pipe.zrevrank if reverse else pipe.zrank
+        for member in members:
+            zrank(self.name, self._encode(member))
+        return pipe.execute()
 
 
     @wrap_exception
@@ -271,8 +699,10 @@ class SortedSet(BaseKey, CommonKeyPropertyMixin):
             float: member 成员的新 score 值。
 
         Raises:
-            TypeError: 当 key 不是有序集类型时抛出。
+            TypeError: 当 key 不是有序集类型，或者设置了 score_type_case 时抛出。
         """
+        self._check_incr()
+
         redis_member = self._encode(member)
         return self._client.zincrby(self.name, redis_member, increment)
 
@@ -295,6 +725,611 @@ class SortedSet(BaseKey, CommonKeyPropertyMixin):
             float: member 成员的新 score 值。
 
         Raises:
-            TypeError: 当 key 不是有序集类型时抛出。
+            TypeError: 当 key 不是有序集类型，或者设置了 score_type_case 时抛出。
         """
         return self.incr(member, 0-decrement)
+
+
+    def _range_by_score(self, low, high, start=None, num=None, reverse=False):
+        """ 
+        按 score 区间取出有序集元素，low 和 high 都是已经转换好的区间边界。
+        """
+        if reverse:
+            return self._client.zrevrangebyscore(self.name, high, low,
+                                                 start=start, num=num,
+                                                 withscores=True)
+        else:
+            return self._client.zrangebyscore(self.name, low, high,
+                                              start=start, num=num,
+                                              withscores=True)
+
+
+    @wrap_exception
+    def range_by_score(self, min=MIN_SCORE, max=MAX_SCORE, offset=None, limit=None,
+                       reverse=False, min_inclusive=True, max_inclusive=True):
+        """ 
+        返回有序集中 score 值介于 min 和 max 之间的元素。
+
+        Args:
+            min: score 区间的下限，默认为负无穷。
+            max: score 区间的上限，默认为正无穷。
+            offset: 跳过结果中的前 offset 个元素。
+            limit: 最多返回 limit 个元素，默认返回所有元素。
+            reverse: 为 True 时按 score 值从大到小排列结果，默认从小到大。
+            min_inclusive: 为 False 时结果不包含 score 值等于 min 的元素。
+            max_inclusive: 为 False 时结果不包含 score 值等于 max 的元素。
+
+        Time:
+            O(log(N)+M) ， N 为有序集的基数，而 M 为结果集的基数。
+
+        Returns:
+            list: 列表中的每个项都是一个元素，元素的类型由 item_type 指定。
+
+        Raises:
+            TypeError: 当 key 不是有序集类型时抛出。
+        """
+        # ZRANGEBYSCORE 的 LIMIT 选项必须同时给出 offset 和 count ，
+        # count 为负数时返回 offset 之后的所有元素
+        if offset is None and limit is None:
+            start = num = None
+        else:
+            start = offset or 0
+            num = -1 if limit is None else limit
+
+        items = self._range_by_score(score_bound(min, min_inclusive),
+                                     score_bound(max, max_inclusive),
+                                     start, num, reverse)
+        return self._decode_items(items)
+
+
+    def iter_by_score(self, min=MIN_SCORE, max=MAX_SCORE, reverse=False,
+                      page_size=None, min_inclusive=True, max_inclusive=True):
+        """ 
+        以分页的方式遍历有序集中 score 值介于 min 和 max 之间的元素，
+        无论区间有多大，内存中最多只保存一页元素。
+
+        Args:
+            min: score 区间的下限，默认为负无穷。
+            max: score 区间的上限，默认为正无穷。
+            reverse: 为 True 时按 score 值从大到小遍历，默认从小到大。
+            page_size: 每页的元素数量，默认为 self.page_size 。
+            min_inclusive: 为 False 时不包含 score 值等于 min 的元素。
+            max_inclusive: 为 False 时不包含 score 值等于 max 的元素。
+
+        Time:
+            O(log(N)+M) ， N 为有序集的基数，而 M 为每页的元素数量。
+
+        Returns:
+            iterator: 迭代器的每个项都是一个元素，元素的类型由 item_type 指定。
+
+        Raises:
+            TypeError: 当 key 不是有序集类型时抛出。
+        """
+        page_size = page_size or self.page_size
+        low = score_bound(min, min_inclusive)
+        high = score_bound(max, max_inclusive)
+
+        # 每一页都从上一页最后一个元素的 score 值开始，
+        # 而不是使用越来越大的 offset ，这样每页的复杂度都不会随着遍历而增长，
+        # skip 记录了已经返回过的、score 值等于这个起点的元素数量。
+        cursor = None
+        skip = 0
+        while True:
+            try:
+                items = self._range_by_score(low, high, skip, page_size, reverse)
+            except redis.exceptions.ResponseError:
+                raise TypeError
+
+            for item in self._decode_items(items):
+                yield item
+
+            if len(items) < page_size:
+                break
+
+            last_score = items[-1][1]
+            tied = 0
+            for member, score in reversed(items):
+                if score != last_score:
+                    break
+                tied += 1
+
+            if last_score == cursor:
+                skip += tied
+            else:
+                cursor = last_score
+                skip = tied
+                if reverse:
+                    high = last_score
+                else:
+                    low = last_score
+
+
+    @wrap_exception
+    def count_by_score(self, min=MIN_SCORE, max=MAX_SCORE,
+                       min_inclusive=True, max_inclusive=True):
+        """ 
+        返回有序集中 score 值介于 min 和 max 之间的元素数量。
+
+        Args:
+            min: score 区间的下限，默认为负无穷。
+            max: score 区间的上限，默认为正无穷。
+            min_inclusive: 为 False 时不计算 score 值等于 min 的元素。
+            max_inclusive: 为 False 时不计算 score 值等于 max 的元素。
+
+        Time:
+            O(log(N)) ， N 为有序集的基数。
+
+        Returns:
+            int
+
+        Raises:
+            TypeError: 当 key 不是有序集类型时抛出。
+        """
+        return self._client.zcount(self.name,
+                                   score_bound(min, min_inclusive),
+                                   score_bound(max, max_inclusive))
+
+
+    @wrap_exception
+    def histogram(self, edges):
+        """ 
+        按 edges 给出的边界将 score 值分桶，返回每个桶中的元素数量。
+
+        除了最后一个桶是闭区间 [edges[-2], edges[-1]] 之外，
+        每个桶都是左闭右开的区间 [edges[i], edges[i+1]) 。
+        所有 ZCOUNT 命令在同一个事务中执行，只需要一次往返，也不必取出任何元素。
+
+        Args:
+            edges: 从小到大排列的桶边界，最少要有两个值。
+
+        Time:
+            O(M*log(N)) ， N 为有序集的基数，而 M 为桶的数量。
+
+        Returns:
+            list: 长度为 len(edges)-1 的列表，第 i 项为第 i 个桶中的元素数量。
+
+        Raises:
+            TypeError: 当 key 不是有序集类型时抛出。
+            ValueError: edges 少于两个值，或者没有从小到大排列时抛出。
+        """
+        edges = list(edges)
+        if len(edges) < 2 or any(low >= high for low, high in zip(edges, edges[1:])):
+            raise ValueError('edges must be at least two strictly increasing values')
+
+        last = len(edges) - 2
+
+        pipe = self._client.pipeline()
+        for i, (low, high) in enumerate(zip(edges, edges[1:])):
+            pipe.zcount(self.name, score_bound(low), score_bound(high, i == last))
+        return pipe.execute()
+
+
+    @wrap_exception
+    def quantiles(self, qs):
+        """ 
+        返回有序集中位于各个分位数上的元素，
+        分位数 q 对应排名为 round(q*(N-1)) 的元素。
+
+        ZCARD 和按排名进行的 ZRANGE 在同一个 Lua 脚本中执行，
+        只需要一次往返，并且只传送被选中的元素。
+
+        Args:
+            qs: 由 0 至 1 之间(包含)的分位数组成的列表，比如 [0.5, 0.99] 。
+
+        Time:
+            O(M*log(N)) ， N 为有序集的基数，而 M 为分位数的数量。
+
+        Returns:
+            list: 和 qs 一一对应的元素列表，有序集为空时每一项都为 None 。
+
+        Raises:
+            TypeError: 当 key 不是有序集类型时抛出。
+            ValueError: 分位数不在 0 至 1 之间时抛出。
+        """
+        qs = list(qs)
+        if not all(0 <= q <= 1 for q in qs):
+            raise ValueError('quantile must be between 0 and 1')
+
+        reply = run_script(self._client, QUANTILE_SCRIPT,
+                           keys=[self.name],
+                           args=[repr(float(q)) for q in qs])
+        if not reply:
+            return [None] * len(qs)
+        return self._decode_items(pair_with_scores(reply))
+
+
+    def quantile(self, q):
+        """ 
+        返回有序集中位于分位数 q 上的元素，
+        比如 quantile(0.5) 返回中位数， quantile(0.99) 返回 p99 。
+
+        Args:
+            q: 0 至 1 之间(包含)的分位数。
+
+        Time:
+            O(log(N)) ， N 为有序集的基数。
+
+        Returns:
+            None: 有序集为空时返回
+            item: 位于分位数 q 上的元素
+
+        Raises:
+            TypeError: 当 key 不是有序集类型时抛出。
+            ValueError: 分位数不在 0 至 1 之间时抛出。
+        """
+        return self.quantiles([q])[0]
+
+
+    def range_by_lex(self, min=MIN_LEX, max=MAX_LEX, offset=0, limit=None,
+                     page_size=None):
+        """ 
+        按字典序遍历有序集中介于 min 和 max 之间的成员，
+        这个方法只对所有成员的 score 值都相同的有序集有意义。
+
+        成员以分页的方式用 ZRANGEBYLEX 取出，每页的起点都是上一页的最后一个成员，
+        所以无论区间有多大，内存中最多只保存一页成员。
+
+        Args:
+            min: 区间的下限，使用 Redis 的格式，比如 '[a' 、 '(a' 或 '-' 。
+            max: 区间的上限，使用 Redis 的格式，比如 '[z' 、 '(z' 或 '+' 。
+            offset: 跳过区间中的前 offset 个成员。
+            limit: 最多返回 limit 个成员，默认返回所有成员。
+            page_size: 每页的成员数量，默认为 self.page_size 。
+
+        Time:
+            O(log(N)+M) ， N 为有序集的基数，而 M 为每页的成员数量。
+
+        Returns:
+            iterator: 迭代器的每个项都是一个成员(不包含 score)。
+
+        Raises:
+            TypeError: 当 key 不是有序集类型时抛出。
+        """
+        page_size = page_size or self.page_size
+        low = min
+        remaining = limit
+
+        while remaining is None or remaining > 0:
+            count = page_size if remaining is None or remaining > page_size else remaining
+
+            try:
+                redis_members = self._client.zrangebylex(self.name, low, max,
+                                                         start=offset, num=count)
+            except redis.exceptions.ResponseError:
+                raise TypeError
+
+            for redis_member in redis_members:
+                yield self._decode(redis_member)
+
+            if len(redis_members) < count:
+                break
+
+            if remaining is not None:
+                remaining -= len(redis_members)
+            # 成员是唯一的，所以下一页可以从上一页最后一个成员之后开始
+            low = '(' + redis_members[-1]
+            offset = 0
+
+
+    def prefix(self, prefix, limit=None, page_size=None):
+        """ 
+        按字典序遍历有序集中以 prefix 开头的成员，用于实现自动补全。
+
+        注意前缀匹配的对象是成员被 type case 转换之后，保存在 Redis 中的值。
+
+        Args:
+            prefix: 成员的前缀。
+            limit: 最多返回 limit 个成员，默认返回所有成员。
+            page_size: 每页的成员数量，默认为 self.page_size 。
+
+        Time:
+            O(log(N)+M) ， N 为有序集的基数，而 M 为每页的成员数量。
+
+        Returns:
+            iterator: 迭代器的每个项都是一个成员(不包含 score)。
+
+        Raises:
+            TypeError: 当 key 不是有序集类型时抛出。
+        """
+        if isinstance(prefix, unicode):
+            prefix = prefix.encode('utf-8')
+
+        return self.range_by_lex('[' + prefix, '[' + prefix + '\xff',
+                                 limit=limit, page_size=page_size)
+
+
+    @wrap_exception
+    def count_by_lex(self, min=MIN_LEX, max=MAX_LEX):
+        """ 
+        返回有序集中按字典序介于 min 和 max 之间的成员数量。
+
+        Args:
+            min: 区间的下限，使用 Redis 的格式，比如 '[a' 、 '(a' 或 '-' 。
+            max: 区间的上限，使用 Redis 的格式，比如 '[z' 、 '(z' 或 '+' 。
+
+        Time:
+            O(log(N)) ， N 为有序集的基数。
+
+        Returns:
+            int
+
+        Raises:
+            TypeError: 当 key 不是有序集类型时抛出。
+        """
+        return self._client.zlexcount(self.name, min, max)
+
+
+    def _combine_args(self, keys, weights, aggregate):
+        """ 
+        生成 ZUNIONSTORE 和 ZINTERSTORE 的参数，
+        参与计算的有序集是 self 加上 keys 中的所有有序集。
+        """
+        names = [self.name] + [key.name for key in keys]
+        args = [len(names)] + names
+
+        if weights is not None:
+            weights = list(weights)
+            if len(weights) != len(names):
+                raise ValueError('weights must match self plus keys one by one')
+            args.append('WEIGHTS')
+            args.extend(weights)
+
+        if aggregate is not None:
+            aggregate = aggregate.upper()
+            if aggregate not in AGGREGATES:
+                raise ValueError('aggregate must be one of SUM, MIN or MAX')
+            args.extend(('AGGREGATE', aggregate))
+
+        return args
+
+
+    def _combine_store(self, command, dest, keys, weights, aggregate):
+        args = self._combine_args(keys, weights, aggregate)
+        return self._client.execute_command(command, dest.name, *args)
+
+
+    def _combine_top(self, command, keys, n, weights, aggregate, reverse, ttl):
+        # n 为 0 时 ZRANGE 0 -1 会取出整个结果集，所以直接返回
+        if n <= 0:
+            return []
+
+        # 结果先保存到一个临时 key ，然后只取出前 n 个元素并删除临时 key ，
+        # 所有命令在同一个事务中执行，只需要一次往返；
+        # EXPIRE 只是一个后备措施，保证事务中途失败时临时 key 也会被回收
+        args = self._combine_args(keys, weights, aggregate)
+        temporary_key = '{0}:{1}:{2}'.format(self.name, command.lower(), uuid.uuid4().hex)
+
+        pipe = self._client.pipeline()
+        pipe.execute_command(command, temporary_key, *args)
+        pipe.expire(temporary_key, ttl)
+        if reverse:
+            pipe.zrevrange(temporary_key, 0, n-1, withscores=True)
+        else:
+            pipe.zrange(temporary_key, 0, n-1, withscores=True)
+        pipe.delete(temporary_key)
+
+        items = pipe.execute()[-2]
+        return self._decode_items(items)
+
+
+    @wrap_exception
+    def union_store(self, dest, keys, weights=None, aggregate=None):
+        """ 
+        在服务器上计算 self 和 keys 中所有有序集的并集，并将结果保存到 dest 。
+
+        Args:
+            dest: 保存结果的有序集 key 对象，已有的内容会被覆盖。
+            keys: 一个包含多个有序集 key 对象的 iterable 。
+            weights: 每个有序集的权重，依次对应 self 和 keys 中的有序集。
+            aggregate: 成员 score 值的聚合方式，可以是 'SUM' (默认)、 'MIN' 或 'MAX' 。
+
+        Time:
+            O(N)+O(M*log(M)) ， N 为所有输入有序集的基数之和，而 M 为结果集的基数。
+
+        Returns:
+            int: 结果集的基数。
+
+        Raises:
+            TypeError: 当参与计算的 key 不是有序集类型时抛出。
+            ValueError: weights 的数量和有序集的数量不一致，
+                        或者 aggregate 不是以上三种方式之一时抛出。
+        """
+        return self._combine_store('ZUNIONSTORE', dest, keys, weights, aggregate)
+
+
+    @wrap_exception
+    def inter_store(self, dest, keys, weights=None, aggregate=None):
+        """ 
+        在服务器上计算 self 和 keys 中所有有序集的交集，并将结果保存到 dest 。
+
+        Args:
+            dest: 保存结果的有序集 key 对象，已有的内容会被覆盖。
+            keys: 一个包含多个有序集 key 对象的 iterable 。
+            weights: 每个有序集的权重，依次对应 self 和 keys 中的有序集。
+            aggregate: 成员 score 值的聚合方式，可以是 'SUM' (默认)、 'MIN' 或 'MAX' 。
+
+        Time:
+            O(N*K)+O(M*log(M)) ， N 为最小的输入有序集的基数，
+            K 为输入有序集的数量，而 M 为结果集的基数。
+
+        Returns:
+            int: 结果集的基数。
+
+        Raises:
+            TypeError: 当参与计算的 key 不是有序集类型时抛出。
+            ValueError: weights 的数量和有序集的数量不一致，
+                        或者 aggregate 不是以上三种方式之一时抛出。
+        """
+        return self._combine_store('ZINTERSTORE', dest, keys, weights, aggregate)
+
+
+    @wrap_exception
+    def union_top(self, keys, n, weights=None, aggregate=None, reverse=True,
+                  ttl=TEMPORARY_KEY_TTL):
+        """ 
+        计算 self 和 keys 中所有有序集的并集，并返回结果中 score 值最大的 n 个元素。
+
+        并集被保存在一个临时 key 中，计算、取出结果和删除临时 key 在同一个事务里执行，
+        临时 key 同时设置了 ttl 秒的生存时间，作为删除失败时的后备措施。
+
+        Args:
+            keys: 一个包含多个有序集 key 对象的 iterable 。
+            n: 返回的元素数量，不大于 0 时返回空列表。
+            weights: 每个有序集的权重，依次对应 self 和 keys 中的有序集。
+            aggregate: 成员 score 值的聚合方式，可以是 'SUM' (默认)、 'MIN' 或 'MAX' 。
+            reverse: 为 False 时返回 score 值最小的 n 个元素。
+            ttl: 临时 key 的后备生存时间，以秒为单位。
+
+        Time:
+            O(N)+O(M*log(M)) ， N 为所有输入有序集的基数之和，而 M 为结果集的基数。
+
+        Returns:
+            list: 列表中的每个项都是一个元素，元素的类型由 item_type 指定。
+
+        Raises:
+            TypeError: 当参与计算的 key 不是有序集类型时抛出。
+            ValueError: weights 的数量和有序集的数量不一致，
+                        或者 aggregate 不是以上三种方式之一时抛出。
+        """
+        return self._combine_top('ZUNIONSTORE', keys, n, weights, aggregate, reverse, ttl)
+
+
+    @wrap_exception
+    def inter_top(self, keys, n, weights=None, aggregate=None, reverse=True,
+                  ttl=TEMPORARY_KEY_TTL):
+        """ 
+        计算 self 和 keys 中所有有序集的交集，并返回结果中 score 值最大的 n 个元素。
+
+        交集被保存在一个临时 key 中，计算、取出结果和删除临时 key 在同一个事务里执行，
+        临时 key 同时设置了 ttl 秒的生存时间，作为删除失败时的后备措施。
+
+        Args:
+            keys: 一个包含多个有序集 key 对象的 iterable 。
+            n: 返回的元素数量，不大于 0 时返回空列表。
+            weights: 每个有序集的权重，依次对应 self 和 keys 中的有序集。
+            aggregate: 成员 score 值的聚合方式，可以是 'SUM' (默认)、 'MIN' 或 'MAX' 。
+            reverse: 为 False 时返回 score 值最小的 n 个元素。
+            ttl: 临时 key 的后备生存时间，以秒为单位。
+
+        Time:
+            O(N*K)+O(M*log(M)) ， N 为最小的输入有序集的基数，
+            K 为输入有序集的数量，而 M 为结果集的基数。
+
+        Returns:
+            list: 列表中的每个项都是一个元素，元素的类型由 item_type 指定。
+
+        Raises:
+            TypeError: 当参与计算的 key 不是有序集类型时抛出。
+            ValueError: weights 的数量和有序集的数量不一致，
+                        或者 aggregate 不是以上三种方式之一时抛出。
+        """
+        return self._combine_top('ZINTERSTORE', keys, n, weights, aggregate, reverse, ttl)
+
+
+    def _pop(self, command, count):
+        if count is None:
+            reply = self._client.execute_command(command, self.name)
+            if not reply:
+                raise IndexError
+            return self._decode_items(pair_with_scores(reply))[0]
+
+        reply = self._client.execute_command(command, self.name, count)
+        return self._decode_items(pair_with_scores(reply))
+
+
+    @wrap_exception
+    def pop_min(self, count=None):
+        """ 
+        移除并返回有序集中 score 值最小的元素。
+
+        Args:
+            count: 为 None 时移除并返回一个元素，
+                   否则移除并返回最多 count 个元素组成的列表。
+
+        Time:
+            O(log(N)*M) ， N 为有序集的基数，而 M 为被移除的元素数量。
+
+        Returns:
+            item: count 为 None 时返回被移除的元素。
+            list: 给定 count 时返回按 score 值从小到大排列的元素列表，
+                  有序集为空时返回空列表。
+
+        Raises:
+            IndexError: count 为 None 并且有序集为空时抛出。
+            TypeError: 当 key 不是有序集类型时抛出。
+        """
+        return self._pop('ZPOPMIN', count)
+
+
+    @wrap_exception
+    def pop_max(self, count=None):
+        """ 
+        移除并返回有序集中 score 值最大的元素。
+
+        Args:
+            count: 为 None 时移除并返回一个元素，
+                   否则移除并返回最多 count 个元素组成的列表。
+
+        Time:
+            O(log(N)*M) ， N 为有序集的基数，而 M 为被移除的元素数量。
+
+        Returns:
+            item: count 为 None 时返回被移除的元素。
+            list: 给定 count 时返回按 score 值从大到小排列的元素列表，
+                  有序集为空时返回空列表。
+
+        Raises:
+            IndexError: count 为 None 并且有序集为空时抛出。
+            TypeError: 当 key 不是有序集类型时抛出。
+        """
+        return self._pop('ZPOPMAX', count)
+
+
+    def block_pop_min(self, timeout=0):
+        """ 
+        移除并返回有序集中 score 值最小的元素，
+        如果有序集为空，那么阻塞 timeout 秒，直到获取元素或超时为止。
+
+        要同时等待多个有序集，请使用 block_pop_min_any 。
+
+        Args:
+            timeout: 等待元素时的最大阻塞秒数，为 0 时一直阻塞。
+
+        Time:
+            O(log(N))
+
+        Returns:
+            None: 超时时返回
+            pop_item: 被弹出的元素
+
+        Raises:
+            TypeError: 当 key 不是有序集类型时抛出。
+        """
+        result = block_pop_min_any([self], timeout)
+        if result is not None:
+            return result[1]
+
+
+    def block_pop_max(self, timeout=0):
+        """ 
+        移除并返回有序集中 score 值最大的元素，
+        如果有序集为空，那么阻塞 timeout 秒，直到获取元素或超时为止。
+
+        要同时等待多个有序集，请使用 block_pop_max_any 。
+
+        Args:
+            timeout: 等待元素时的最大阻塞秒数，为 0 时一直阻塞。
+
+        Time:
+            O(log(N))
+
+        Returns:
+            None: 超时时返回
+            pop_item: 被弹出的元素
+
+        Raises:
+            TypeError: 当 key 不是有序集类型时抛出。
+        """
+        result = block_pop_max_any([self], timeout)
+        if result is not None:
+            return result[1]
@@ -0,0 +1,484 @@
+# coding: utf-8
+
+__all__ = ['TimeSeries']
+
+__metaclass__ = type
+
+import math
+
+from ooredis.const import (
+    MIN_SCORE,
+    MAX_SCORE,
+    DEFAULT_PAGE_SIZE,
+    DEFAULT_CHUNK_SIZE,
+)
+
+from sorted_set import SortedSet
+from helper import wrap_exception, run_script, score_bound, chunks
+
+# aggregate 方法可以使用的聚合函数
+AGGREGATE_FUNCTIONS = ('min', 'max', 'sum', 'avg', 'count')
+
+# 添加样本，并更新每个 rollup 中样本所属的时间段的统计信息。
+# 每个成员都会加上 ':序号' 后缀，序号由计数器分配，
+# 所以完全相同的样本也会作为不同的成员被保存和统计。
+# KEYS[1]: 保存样本的有序集
+# KEYS[2*i], KEYS[2*i+1]: 第 i 个 rollup 的索引有序集和统计信息哈希表
+# KEYS[#KEYS]: 分配序号的计数器
+# ARGV[1..r]: 每个 rollup 的时间段长度， r 为 rollup 的数量
+# ARGV[r+1..]: 每三个参数为一个样本的 timestamp 、 value 和 member
+APPEND_SCRIPT = """
+local rollups = (#KEYS - 2) / 2
+local added = (#ARGV - rollups) / 3
+local seq = redis.call('INCRBY', KEYS[#KEYS], added) - added
+
+for i = rollups + 1, #ARGV, 3 do
+    local timestamp = tonumber(ARGV[i])
+    local value = ARGV[i + 1]
+
+    seq = seq + 1
+    redis.call('ZADD', KEYS[1], ARGV[i], ARGV[i + 2] .. ':' .. seq)
+
+    for r = 1, rollups do
+        local width = tonumber(ARGV[r])
+        local bucket = string.format('%.17g', math.floor(timestamp / width) * width)
+        local index, stats = KEYS[2 * r], KEYS[2 * r + 1]
+
+        redis.call('ZADD', index, bucket, bucket)
+        redis.call('HINCRBY', stats, bucket .. ':count', 1)
+        redis.call('HINCRBYFLOAT', stats, bucket .. ':sum', value)
+
+        local low = redis.call('HGET', stats, bucket .. ':min')
+        if not low or tonumber(value) < tonumber(low) then
+            redis.call('HSET', stats, bucket .. ':min', value)
+        end
+
+        local high = redis.call('HGET', stats, bucket .. ':max')
+        if not high or tonumber(value) > tonumber(high) then
+            redis.call('HSET', stats, bucket .. ':max', value)
+        end
+    end
+end
+
+return added
+"""
+
+# 移除 rollup 中开始时间早于 ARGV[1] 的时间段
+# KEYS[1]: rollup 的索引有序集
+# KEYS[2]: rollup 的统计信息哈希表
+TRIM_ROLLUP_SCRIPT = """
+local buckets = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', '(' .. ARGV[1])
+for _, bucket in ipairs(buckets) do
+    redis.call('HDEL', KEYS[2], bucket .. ':count', bucket .. ':sum',
+                                bucket .. ':min', bucket .. ':max')
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', '(' .. ARGV[1])
+return #buckets
+"""
+
+# 按长度为 ARGV[3] 的时间段统计 [ARGV[1], ARGV[2]) 之间的原始样本，
+# 样本按排名分页取出，每页 ARGV[4] 个，
+# 每个时间段返回 start, count, sum, min, max 五个值。
+# KEYS[1]: 保存样本的有序集
+AGGREGATE_SAMPLES_SCRIPT = """
+local width = tonumber(ARGV[3])
+local page = tonumber(ARGV[4])
+local result = {}
+local current, count, sum, low, high
+
+local function flush()
+    if current then
+        table.insert(result, string.format('%.17g', current))
+        table.insert(result, string.format('%.17g', count))
+        table.insert(result, string.format('%.17g', sum))
+        table.insert(result, string.format('%.17g', low))
+        table.insert(result, string.format('%.17g', high))
+    end
+end
+
+local first = redis.call('ZCOUNT', KEYS[1], '-inf', '(' .. ARGV[1])
+local total = redis.call('ZCOUNT', KEYS[1], ARGV[1], '(' .. ARGV[2])
+
+for offset = 0, total - 1, page do
+    local last = math.min(offset + page, total) - 1
+    local members = redis.call('ZRANGE', KEYS[1], first + offset, first + last)
+
+    for _, member in ipairs(members) do
+        local separator = string.find(member, ':', 1, true)
+        local suffix = string.find(member, ':', separator + 1, true) or 0
+        local timestamp = tonumber(string.sub(member, 1, separator - 1))
+        local value = tonumber(string.sub(member, separator + 1, suffix - 1))
+        local bucket = math.floor(timestamp / width) * width
+
+        if bucket ~= current then
+            flush()
+            current, count, sum, low, high = bucket, 0, 0, value, value
+        end
+
+        count = count + 1
+        sum = sum + value
+        if value < low then low = value end
+        if value > high then high = value end
+    end
+end
+
+flush()
+return result
+"""
+
+# 和 AGGREGATE_SAMPLES_SCRIPT 一样，但是合并 rollup 中已经统计好的时间段，
+# 而不是读取原始样本。
+# KEYS[1]: rollup 的索引有序集
+# KEYS[2]: rollup 的统计信息哈希表
+AGGREGATE_ROLLUP_SCRIPT = """
+local width = tonumber(ARGV[3])
+local result = {}
+local current, count, sum, low, high
+
+local function flush()
+    if current then
+        table.insert(result, string.format('%.17g', current))
+        table.insert(result, string.format('%.17g', count))
+        table.insert(result, string.format('%.17g', sum))
+        table.insert(result, string.format('%.17g', low))
+        table.insert(result, string.format('%.17g', high))
+    end
+end
+
+local buckets = redis.call('ZRANGEBYSCORE', KEYS[1], ARGV[1], '(' .. ARGV[2])
+for _, bucket in ipairs(buckets) do
+    local stats = redis.call('HMGET', KEYS[2], bucket .. ':count', bucket .. ':sum',
+                                               bucket .. ':min', bucket .. ':max')
+    local target = math.floor(tonumber(bucket) / width) * width
+
+    if target ~= current then
+        flush()
+        current, count, sum = target, 0, 0
+        low, high = tonumber(stats[3]), tonumber(stats[4])
+    end
+
+    count = count + tonumber(stats[1])
+    sum = sum + tonumber(stats[2])
+    if tonumber(stats[3]) < low then low = tonumber(stats[3]) end
+    if tonumber(stats[4]) > high then high = tonumber(stats[4]) end
+end
+
+flush()
+return result
+"""
+
+def _to_redis_number(value):
+    """
+    将数值转换为不损失精度的字符串， '-inf' 和 '+inf' 等字符串保持不变。
+    """
+    if isinstance(value, basestring):
+        return value
+    return repr(float(value))
+
+class SampleTypeCase:
+
+    """
+    将 (timestamp, value) 样本转换为 'timestamp:value' 形式的有序集成员。
+
+    APPEND_SCRIPT 在保存时会为成员加上 ':序号' 后缀，解码时忽略这个后缀。
+    """
+
+    @staticmethod
+    def encode(sample):
+        timestamp, value = sample
+        return '{0}:{1}'.format(_to_redis_number(timestamp), _to_redis_number(value))
+
+    @staticmethod
+    def decode(member):
+        if member is None:
+            return
+
+        timestamp, value = member.split(':')[:2]
+        return float(timestamp), float(value)
+
+class TimeSeries(SortedSet):
+
+    """
+    时间序列，每个 (timestamp, value) 样本都是有序集的一个成员，
+    成员的 score 就是样本的 timestamp 。
+
+    遍历、下标以及 range_by_score 等 SortedSet 的读取方法返回的都是
+    (timestamp, value) 样本；添加样本请使用 append 和 extend 方法，
+    直接使用 SortedSet 的写入方法会绕过 retention 和 rollup 。
+
+    rollups 中的每个时间段长度都对应一个 rollup ，
+    rollup 在添加样本时增量地统计每个时间段的 count 、 sum 、 min 和 max ，
+    aggregate 合并区间中和 rollup 对齐的部分，只读取两端少量的原始样本。
+
+    完全相同的样本(timestamp 和 value 都相同)会被分别保存和统计，
+    因为每个成员都带有一个唯一的序号后缀，
+    所以 remove 和 in 等直接使用 (timestamp, value) 的 SortedSet 方法无法找到样本。
+    """
+
+    def __init__(self, name, retention=None, rollups=(), rollup_retention=None,
+                 client=None, page_size=DEFAULT_PAGE_SIZE):
+        """
+        初始化一个 TimeSeries 类实例。
+
+        Args:
+            name: Redis key 的名字
+            retention: 原始样本的保存时长，早于最新样本 retention 秒的样本会被移除，
+                       默认为 None ，不移除任何样本。
+            rollups: rollup 的时间段长度，以秒为单位，比如 (60, 3600) 。
+            rollup_retention: rollup 时间段的保存时长，默认为 None ，不移除任何时间段。
+                              不能小于 retention ，否则使用 rollup 的 aggregate
+                              会比读取原始样本的 aggregate 少统计一部分样本。
+                              只有所有样本都早于最新样本 rollup_retention 秒的时间段才会被移除。
+            client: 客户端，默认为全局客户端
+            page_size: 遍历样本时，每次从 Redis 取出的样本数量
+
+        Raises:
+            ValueError: rollup_retention 小于 retention ，或者 retention 为 None
+                        而 rollup_retention 不为 None 时抛出。
+        """
+        if rollup_retention is not None and (retention is None or rollup_retention < retention):
+            raise ValueError('rollup_retention must not be shorter than retention')
+
+        super(TimeSeries, self).__init__(name=name, client=client,
+                                         type_case=SampleTypeCase,
+                                         page_size=page_size,
+                                         item_type=tuple)
+        self.retention = retention
+        self.rollups = sorted(rollups)
+        self.rollup_retention = rollup_retention
+
+
+    def _decode_items(self, items):
+        """
+        样本的 score 就是它的 timestamp ，所以只需要解码成员。
+        """
+        decode = self._decode
+        return [decode(member) for member, score in items]
+
+
+    def _rollup_keys(self, width):
+        """
+        返回时间段长度为 width 的 rollup 的索引有序集和统计信息哈希表的 key 名。
+        """
+        index = '{0}:rollup:{1}'.format(self.name, width)
+        return [index, index + ':stats']
+
+
+    def _seq_key(self):
+        """
+        返回为样本成员分配序号的计数器的 key 名。
+        """
+        return self.name + ':seq'
+
+
+    def append(self, timestamp, value):
+        """
+        添加一个样本。
+
+        Args:
+            timestamp: 样本的 unix 时间戳。
+            value: 样本的值。
+
+        Time:
+            O(log(N)+R) ， N 为样本的数量，而 R 为 rollup 的数量。
+
+        Returns:
+            int: 被添加的样本数量，总是为 1 。
+
+        Raises:
+            TypeError: 当 key 的类型不正确时抛出。
+        """
+        return self.extend([(timestamp, value)])
+
+
+    @wrap_exception
+    def extend(self, samples, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        批量添加样本，同时更新 rollup 并按 retention 移除过期的样本。
+
+        每 chunk_size 个样本由一次脚本调用添加，
+        所有脚本调用和移除过期样本的命令都通过同一个 pipeline 发送。
+
+        Args:
+            samples: 一个包含 (timestamp, value) 样本的 iterable 。
+            chunk_size: 每次脚本调用添加的样本数量。
+
+        Time:
+            O(M*(log(N)+R)) ， N 为样本的数量， M 为被添加的样本数量，而 R 为 rollup 的数量。
+
+        Returns:
+            int: 被添加的样本数量，完全相同的样本也会被分别计算。
+
+        Raises:
+            TypeError: 当 key 的类型不正确时抛出。
+        """
+        keys = [self.name]
+        for width in self.rollups:
+            keys.extend(self._rollup_keys(width))
+        keys.append(self._seq_key())
+
+        pipe = self._client.pipeline(transaction=False)
+
+        newest = None
+        for chunk in chunks(samples, chunk_size):
+            args = list(self.rollups)
+            for timestamp, value in chunk:
+                if newest is None or timestamp > newest:
+                    newest = timestamp
+                args.extend((_to_redis_number(timestamp), _to_redis_number(value),
+                             self._encode((timestamp, value))))
+
+            run_script(pipe, APPEND_SCRIPT, keys=keys, args=args)
+        added_replies = len(pipe)
+
+        if newest is not None:
+            self._trim(pipe, newest)
+
+        return sum(pipe.execute()[:added_replies])
+
+
+    def _trim(self, pipe, newest):
+        """
+        将按 retention 和 rollup_retention 移除过期数据的命令放入 pipe 中。
+        """
+        if self.retention is not None:
+            cutoff = score_bound(float(newest - self.retention), inclusive=False)
+            pipe.zremrangebyscore(self.name, MIN_SCORE, cutoff)
+
+        if self.rollup_retention is not None:
+            cutoff = newest - self.rollup_retention
+            for width in self.rollups:
+                # 保留包含 cutoff 的时间段，这样 rollup 总是覆盖所有未过期的原始样本
+                bucket = _to_redis_number(math.floor(cutoff / float(width)) * width)
+                run_script(pipe, TRIM_ROLLUP_SCRIPT,
+                           keys=self._rollup_keys(width), args=[bucket])
+
+
+    def _plan(self, start, end, bucket):
+        """
+        将 [start, end) 区间分割为一个或多个脚本调用，返回 (script, keys, args) 列表。
+
+        选择 bucket 可以整除的最长的 rollup ，区间中和 rollup 对齐的中间部分用 rollup 统计，
+        只有两端不足一个 rollup 时间段的部分才读取原始样本，无穷大的边界视为已经对齐。
+        没有可用的 rollup 时，整个区间都读取原始样本。
+        """
+        def samples(low, high):
+            args = [_to_redis_number(low), _to_redis_number(high),
+                    _to_redis_number(bucket), self.page_size]
+            return AGGREGATE_SAMPLES_SCRIPT, [self.name], args
+
+        width = None
+        for candidate in reversed(self.rollups):
+            if bucket % candidate == 0:
+                width = candidate
+                break
+        if width is None:
+            return [samples(start, end)]
+
+        low, high = float(start), float(end)
+        aligned_start = low if math.isinf(low) else math.ceil(low / width) * width
+        aligned_end = high if math.isinf(high) else math.floor(high / width) * width
+        if not math.isinf(low) and not math.isinf(high) and aligned_start >= aligned_end:
+            return [samples(start, end)]
+
+        plan = []
+        if not math.isinf(low) and low < aligned_start:
+            plan.append(samples(start, aligned_start))
+        plan.append((AGGREGATE_ROLLUP_SCRIPT, self._rollup_keys(width),
+                     [_to_redis_number(aligned_start), _to_redis_number(aligned_end),
+                      _to_redis_number(bucket)]))
+        if not math.isinf(high) and aligned_end < high:
+            plan.append(samples(aligned_end, end))
+        return plan
+
+
+    @wrap_exception
+    def aggregate(self, start=MIN_SCORE, end=MAX_SCORE, bucket=60, func='avg'):
+        """
+        在服务器上按长度为 bucket 的时间段统计 [start, end) 之间的样本。
+
+        如果 bucket 是某个 rollup 时间段长度的整数倍，那么区间中和 rollup 对齐的部分
+        直接合并 rollup 中的统计信息，只有区间两端不足一个 rollup 时间段的部分
+        才在服务器上遍历原始样本，无穷大的边界视为已经对齐；
+        没有可用的 rollup 时遍历区间内的所有原始样本。
+        所有脚本调用在同一个事务中执行，并且只有统计结果会被传送到客户端。
+
+        Args:
+            start: 区间的开始时间(包含)，默认为负无穷。
+            end: 区间的结束时间(不包含)，默认为正无穷。
+            bucket: 时间段的长度，以秒为单位，时间段的开始时间是 bucket 的整数倍。
+            func: 聚合函数，可以是 'min' 、 'max' 、 'sum' 、 'avg' 或 'count' 。
+
+        Time:
+            使用 rollup 时为 O(log(B)+log(N)+M+W) ， B 为 rollup 的时间段数量，
+            N 为样本的数量， M 为区间内的 rollup 时间段数量，
+            而 W 为区间两端不足一个 rollup 时间段的部分中的样本数量；
+            否则为 O(log(N)+M) ， M 为区间内的样本数量。
+
+        Returns:
+            list: 包含 (bucket_start, value) 二元组的列表，没有样本的时间段不会出现。
+
+        Raises:
+            TypeError: 当 key 的类型不正确时抛出。
+            ValueError: func 不是以上聚合函数之一，或者 start 和 end 不是数值、
+                        '-inf' 或 '+inf' 时抛出。
+        """
+        if func not in AGGREGATE_FUNCTIONS:
+            raise ValueError('func must be one of min, max, sum, avg or count')
+        for bound in (start, end):
+            try:
+                float(bound)
+            except (TypeError, ValueError):
+                raise ValueError('start and end must be numbers, -inf or +inf')
+
+        # 所有脚本调用在同一个事务中执行，只需要一次往返，并且看到的是同一时刻的数据
+        pipe = self._client.pipeline()
+        for script, keys, args in self._plan(start, end, bucket):
+            run_script(pipe, script, keys=keys, args=args)
+
+        # 区间两端的原始样本和 rollup 可能属于同一个时间段，需要合并
+        stats = {}
+        for reply in pipe.execute():
+            for i in range(0, len(reply), 5):
+                bucket_start, count, total, low, high = map(float, reply[i:i+5])
+                if bucket_start in stats:
+                    old_count, old_total, old_low, old_high = stats[bucket_start]
+                    stats[bucket_start] = (old_count + count, old_total + total,
+                                           min(old_low, low), max(old_high, high))
+                else:
+                    stats[bucket_start] = (count, total, low, high)
+
+        result = []
+        for bucket_start in sorted(stats):
+            count, total, low, high = stats[bucket_start]
+            if func == 'min':
+                value = low
+            elif func == 'max':
+                value = high
+            elif func == 'sum':
+                value = total
+            elif func == 'avg':
+                value = total / count
+            else:
+                value = int(count)
+            result.append((bucket_start, value))
+        return result
+
+
+    def delete(self):
+        """
+        删除所有样本、所有 rollup 以及序号计数器。
+
+        Time:
+            O(N)
+
+        Returns:
+            None
+
+        Raises:
+            None
+        """
+        keys = [self.name, self._seq_key()]
+        for width in self.rollups:
+            keys.extend(self._rollup_keys(width))
+        self._client.delete(*keys)
@@ -4,3 +4,4 @@ from float_type_case import FloatTypeCase
 from string_type_case import StringTypeCase
 from generic_type_case import GenericTypeCase
 from serialize_type_case import SerializeTypeCase
+from composite_score_type_case import CompositeScoreTypeCase
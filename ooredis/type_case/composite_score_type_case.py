@@ -0,0 +1,94 @@
+# coding: utf-8
+
+from numbers import Integral
+
+# double 的尾数能精确表示的整数位数
+MANTISSA_BITS = 53
+
+class CompositeScoreTypeCase:
+
+    """
+    将多个有界的整数或浮点数列打包成一个有序集 score 值。
+
+    每一列都被量化成一个非负整数，然后按列的顺序拼接到 double 的 53 位尾数里面，
+    所以 score 的大小顺序和元组的字典序一致，排序可以完全在服务器上完成。
+
+    用法：
+
+        >>> priority_and_time = CompositeScoreTypeCase((0, 9), (0, 2**32-1))
+        >>> jobs = SortedSet('jobs', score_type_case=priority_and_time)
+        >>> jobs['job-1'] = (1, 1330000000)
+        >>> jobs.range_by_score(*priority_and_time.leading_range(0, 1))
+    """
+
+    def __init__(self, *columns):
+        """
+        每一列都用一个 (low, high) 或者 (low, high, step) 元组来描述，
+        low 和 high 是这一列的取值范围(包含)， step 是量化的精度，默认为 1 。
+
+        如果所有列需要的位数加起来超过 53 位，抛出 ValueError 。
+        """
+        self._columns = []
+
+        total_bits = 0
+        for column in columns:
+            low, high = column[0], column[1]
+            step = column[2] if len(column) > 2 else 1
+            if high < low or step <= 0:
+                raise ValueError('column must have low <= high and step > 0')
+
+            slots = int(round((high - low) / float(step))) + 1
+            bits = max((slots - 1).bit_length(), 1)
+            is_int = isinstance(low, Integral) and isinstance(step, Integral)
+
+            self._columns.append((low, step, slots, bits, is_int))
+            total_bits += bits
+
+        if not self._columns:
+            raise ValueError('at least one column is required')
+        if total_bits > MANTISSA_BITS:
+            raise ValueError('columns need {0} bits, more than {1}'.format(total_bits, MANTISSA_BITS))
+
+    def encode(self, values):
+        """
+        将一个元组打包成 float 类型的 score 值，
+        元组的长度和列数不一致，或者某个值超出了列的范围时，抛出 TypeError 。
+        """
+        if len(values) != len(self._columns):
+            raise TypeError
+
+        packed = 0
+        for value, (low, step, slots, bits, is_int) in zip(values, self._columns):
+            slot = int(round((value - low) / float(step)))
+            if not 0 <= slot < slots:
+                raise TypeError
+            packed = (packed << bits) | slot
+
+        return float(packed)
+
+    def decode(self, score):
+        """
+        将 score 值解包成元组，整数列(low 和 step 都是整数)解包为 int ，其他列为 float 。
+        """
+        if score is None:
+            return
+
+        packed = int(score)
+
+        values = []
+        for low, step, slots, bits, is_int in reversed(self._columns):
+            slot = packed & ((1 << bits) - 1)
+            packed >>= bits
+            values.append(low + slot * step if is_int else low + slot * float(step))
+
+        return tuple(reversed(values))
+
+    def leading_range(self, low, high):
+        """
+        返回第一列介于 low 和 high 之间(包含)的所有元组对应的 score 区间，
+        结果可以直接传给 SortedSet.range_by_score 和 SortedSet.count_by_score 。
+        """
+        rest_low = tuple(column[0] for column in self._columns[1:])
+        rest_high = tuple(column[0] + (column[2] - 1) * column[1]
+                          for column in self._columns[1:])
+        return self.encode((low,) + rest_low), self.encode((high,) + rest_high)
@@ -0,0 +1,260 @@
+# coding: utf-8
+
+__all__ = ['WorkerPool', 'WorkerStats']
+
+__metaclass__ = type
+
+import time
+import Queue
+import logging
+import threading
+import multiprocessing
+
+# 默认的并发 worker 数量
+DEFAULT_CONCURRENCY = 4
+
+# 每次从队列批量取出的元素数量
+DEFAULT_BATCH_SIZE = 100
+
+# 队列为空时，每次阻塞等待元素的秒数，也是 stop 最长需要等待 fetcher 的时间
+DEFAULT_POLL_TIMEOUT = 1
+
+# 从队列取出元素失败时，第一次重试之前等待的秒数，之后每次失败等待时间加倍
+FETCH_RETRY_DELAY = 0.1
+
+# 重试等待时间的上限
+MAX_FETCH_RETRY_DELAY = 10
+
+# 通知 worker 线程退出的标记
+_STOP = object()
+
+logger = logging.getLogger(__name__)
+
+class WorkerStats:
+
+    """
+    单个 worker 的统计数据，只由 worker 自己的线程更新。
+    """
+
+    __slots__ = ('name', 'processed', 'failed', 'busy', 'started_at')
+
+    def __init__(self, name):
+        self.name = name
+        # 处理成功和失败的元素数量
+        self.processed = 0
+        self.failed = 0
+        # 执行 handler 花费的总秒数
+        self.busy = 0.0
+        self.started_at = time.time()
+
+    def as_dict(self, now=None):
+        """
+        返回包含以下项的字典：
+        name 、 processed 、 failed 、 busy ，
+        latency ，每个元素的平均处理秒数；
+        throughput ，从启动到现在平均每秒处理的元素数量。
+        """
+        if now is None:
+            now = time.time()
+
+        total = self.processed + self.failed
+        elapsed = now - self.started_at
+        return dict(name=self.name,
+                    processed=self.processed,
+                    failed=self.failed,
+                    busy=self.busy,
+                    latency=self.busy / total if total else 0.0,
+                    throughput=total / elapsed if elapsed > 0 else 0.0)
+
+class WorkerPool:
+
+    """
+    从一个 Deque 中取出元素，并交给多个 worker 并发处理的消费者运行时。
+
+    一个 fetcher 线程用 popleft_many 从队列左边批量取出元素，
+    队列为空时改用 block_popleft 阻塞等待，取出的元素放入一个长度为 prefetch 的本地缓冲区，
+    concurrency 个 worker 线程从缓冲区取出元素并调用 handler 。
+    缓冲区满时 fetcher 停止取出元素，所以离开了 Redis 但还没有处理完的元素最多为
+    prefetch+batch_size+concurrency 个：缓冲区中的元素、 fetcher 正在放入缓冲区的一批元素，
+    以及每个 worker 正在处理的一个元素。
+
+    on_error 本身抛出的异常会被记录到日志中，不会影响 worker 继续处理其他元素。
+
+    use_processes 为 True 时， worker 线程将 handler 交给一个有 concurrency 个进程的
+    multiprocessing.Pool 执行，这时 handler 和元素都必须可以被 pickle 。
+
+    从队列取出元素失败(比如连接中断)时， fetcher 会记录异常并按指数退避重试，
+    而不是停止整个 pool ，失败次数和最后一次异常保存在 fetch_errors 和 last_fetch_error 中。
+
+    注意元素在被处理之前就已经从 Redis 中移除，进程崩溃时缓冲区中的元素会丢失，
+    需要至少投递一次的语义时请使用 ReliableQueue 。
+
+    用法：
+
+        >>> pool = WorkerPool(Deque('jobs'), handle_job, concurrency=8)
+        >>> pool.start()
+        ...
+        >>> pool.stop()
+        >>> pool.stats()
+    """
+
+    def __init__(self, deque, handler, concurrency=DEFAULT_CONCURRENCY,
+                 batch_size=DEFAULT_BATCH_SIZE, prefetch=None,
+                 poll_timeout=DEFAULT_POLL_TIMEOUT, use_processes=False, on_error=None):
+        """
+        初始化一个 WorkerPool 类实例。
+
+        Args:
+            deque: 被消费的 Deque 对象。
+            handler: 处理元素的函数，以元素为唯一参数。
+            concurrency: 并发 worker 的数量。
+            batch_size: 每次从队列批量取出的最大元素数量。
+            prefetch: 本地缓冲区的长度，默认为 concurrency*batch_size 。
+            poll_timeout: 队列为空时，每次阻塞等待元素的秒数。
+            use_processes: 为 True 时用进程池执行 handler ，默认在 worker 线程中执行。
+            on_error: handler 抛出异常时调用的函数，参数为元素和异常对象，默认忽略异常。
+
+        Raises:
+            ValueError: concurrency 、 batch_size 或 prefetch 不是正整数时抛出。
+        """
+        if prefetch is None:
+            prefetch = concurrency * batch_size
+        if concurrency <= 0 or batch_size <= 0 or prefetch <= 0:
+            raise ValueError('concurrency, batch_size and prefetch must be positive integers')
+
+        self.deque = deque
+        self.handler = handler
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.prefetch = prefetch
+        self.poll_timeout = poll_timeout
+        self.use_processes = use_processes
+        self.on_error = on_error
+
+        # 从队列取出的元素总数
+        self.fetched = 0
+        # 从队列取出元素失败的次数，以及最后一次失败的异常
+        self.fetch_errors = 0
+        self.last_fetch_error = None
+
+        self._buffer = Queue.Queue(maxsize=prefetch)
+        self._stopping = threading.Event()
+        self._stats = [WorkerStats('worker-{0}'.format(i)) for i in range(concurrency)]
+        self._threads = []
+        self._process_pool = None
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+    def start(self):
+        """
+        启动 fetcher 线程和 worker 线程。
+
+        Raises:
+            RuntimeError: 重复启动时抛出。
+        """
+        if self._threads:
+            raise RuntimeError('worker pool already started')
+
+        if self.use_processes:
+            self._process_pool = multiprocessing.Pool(self.concurrency)
+
+        self._threads.append(threading.Thread(target=self._fetch, name='fetcher'))
+        for stats in self._stats:
+            stats.started_at = time.time()
+            self._threads.append(threading.Thread(target=self._work, args=(stats,),
+                                                  name=stats.name))
+
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+
+
+    def _fetch(self):
+        delay = FETCH_RETRY_DELAY
+        try:
+            while not self._stopping.is_set():
+                # 只取出缓冲区放得下的元素，缓冲区满时 put 会阻塞，形成背压
+                n = max(1, min(self.batch_size, self.prefetch - self._buffer.qsize()))
+                try:
+                    items = self.deque.popleft_many(n)
+                    if not items:
+                        item = self.deque.block_popleft(self.poll_timeout)
+                        items = [] if item is None else [item]
+                except Exception as e:
+                    self.fetch_errors += 1
+                    self.last_fetch_error = e
+                    logger.exception('failed to fetch from %s, retry in %s seconds',
+                                     self.deque.name, delay)
+                    # stop 被调用时立即结束等待
+                    self._stopping.wait(delay)
+                    delay = min(delay * 2, MAX_FETCH_RETRY_DELAY)
+                    continue
+                delay = FETCH_RETRY_DELAY
+
+                self.fetched += len(items)
+                for item in items:
+                    self._buffer.put(item)
+        finally:
+            # 缓冲区中已经取出的元素会先被处理完，然后 worker 才会读到退出标记
+            for i in range(self.concurrency):
+                self._buffer.put(_STOP)
+
+
+    def _work(self, stats):
+        while True:
+            item = self._buffer.get()
+            if item is _STOP:
+                return
+
+            started_at = time.time()
+            try:
+                if self._process_pool is not None:
+                    self._process_pool.apply(self.handler, (item,))
+                else:
+                    self.handler(item)
+                stats.processed += 1
+            except Exception as e:
+                stats.failed += 1
+                if self.on_error is not None:
+                    try:
+                        self.on_error(item, e)
+                    except Exception:
+                        logger.exception('on_error failed to handle %r', item)
+            finally:
+                stats.busy += time.time() - started_at
+
+
+    def stop(self, timeout=None):
+        """
+        优雅地停止：不再从队列取出新元素，等待缓冲区中已经取出的元素处理完毕。
+
+        Args:
+            timeout: 等待每个线程退出的最大秒数，默认一直等待。
+        """
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+        if self._process_pool is not None:
+            self._process_pool.close()
+            self._process_pool.join()
+            self._process_pool = None
+
+
+    def stats(self):
+        """
+        返回每个 worker 的统计数据。
+
+        Returns:
+            list: 每个项都是一个字典，参考 WorkerStats.as_dict 。
+        """
+        now = time.time()
+        return [stats.as_dict(now) for stats in self._stats]
@@ -0,0 +1,173 @@
+#! /usr/bin/env python2.7
+# coding: utf-8
+
+import time
+import redis
+import unittest
+import threading
+
+from ooredis.client import connect
+from ooredis.key.deque import Deque
+from ooredis.key.helper import format_key
+from ooredis.type_case import JsonTypeCase
+from ooredis.key.delayed_queue import DelayedQueue
+
+class TestDelayedQueue(unittest.TestCase):
+
+    def setUp(self):
+        connect()
+
+        self.redispy = redis.Redis()
+        self.redispy.flushdb()
+
+        self.q = DelayedQueue('delayed', type_case=JsonTypeCase)
+
+        self.job = {'id': 10086}
+        self.now = 1000000
+
+    def tearDown(self):
+        self.redispy.flushdb()
+
+    def set_wrong_type(self):
+        self.redispy.set(self.q.name, 'string')
+
+
+    # __repr__
+
+    def test__repr__(self):
+        self.assertEqual(
+            repr(self.q),
+            format_key(self.q, self.q.name, list(self.q.schedule))
+        )
+
+
+    # put and __len__
+
+    def test_put(self):
+        self.q.put(self.job, self.now)
+
+        self.assertEqual(len(self.q), 1)
+        self.assertEqual(self.q.schedule.score(self.job), self.now)
+
+    def test_put_after(self):
+        self.q.put_after(self.job, 60)
+
+        self.assertTrue(self.q.schedule.score(self.job) > time.time())
+
+    def test_put_many(self):
+        self.assertEqual(
+            self.q.put_many([({'id': i}, self.now + i) for i in range(5)]),
+            5
+        )
+        self.assertEqual(len(self.q), 5)
+
+    def test_put_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type()
+            self.q.put(self.job, self.now)
+
+
+    # cancel
+
+    def test_cancel(self):
+        self.q.put(self.job, self.now)
+
+        self.q.cancel(self.job)
+        self.assertEqual(len(self.q), 0)
+
+
+    # poll
+
+    def test_poll_MOVE_DUE_JOB_ONLY(self):
+        self.q.put_many([({'id': i}, self.now + i) for i in range(5)])
+
+        self.assertEqual(self.q.poll(now=self.now + 2), 3)
+
+        self.assertEqual(len(self.q), 2)
+        self.assertEqual(list(self.q.ready), [{'id': 0}, {'id': 1}, {'id': 2}])
+
+    def test_poll_with_BATCH_SIZE(self):
+        self.q.put_many([({'id': i}, self.now + i) for i in range(5)])
+
+        self.assertEqual(self.q.poll(now=self.now + 10, batch_size=2), 2)
+        self.assertEqual(self.q.poll(now=self.now + 10, batch_size=2), 2)
+        self.assertEqual(self.q.poll(now=self.now + 10, batch_size=2), 1)
+        self.assertEqual(self.q.poll(now=self.now + 10, batch_size=2), 0)
+
+        self.assertEqual(list(self.q.ready), [{'id': i} for i in range(5)])
+
+    def test_poll_RAISE_when_BATCH_SIZE_NOT_POSITIVE(self):
+        self.q.put_many([({'id': i}, self.now) for i in range(5)])
+
+        with self.assertRaises(ValueError):
+            self.q.poll(now=self.now, batch_size=0)
+        with self.assertRaises(ValueError):
+            self.q.poll(now=self.now, batch_size=-1)
+        self.assertEqual(len(self.q.ready), 0)
+
+    def test_poll_with_LARGE_BATCH_SIZE(self):
+        self.q.put_many((i, self.now) for i in range(10000))
+
+        self.assertEqual(self.q.poll(now=self.now, batch_size=10000), 10000)
+        self.assertEqual(len(self.q), 0)
+        self.assertEqual(len(self.q.ready), 10000)
+
+    def test_poll_CONCURRENTLY_WITHOUT_DUPLICATE(self):
+        self.q.put_many([({'id': i}, self.now) for i in range(500)])
+
+        def poller():
+            while self.q.poll(now=self.now, batch_size=7):
+                pass
+
+        threads = [threading.Thread(target=poller) for i in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        ready = list(self.q.ready)
+        self.assertEqual(len(ready), 500)
+        self.assertEqual(sorted(job['id'] for job in ready), range(500))
+
+    def test_poll_with_CUSTOM_READY_DEQUE(self):
+        ready = Deque('work', type_case=JsonTypeCase)
+        q = DelayedQueue('delayed', type_case=JsonTypeCase, ready=ready)
+        q.put(self.job, self.now)
+
+        q.poll(now=self.now)
+        self.assertEqual(list(ready), [self.job])
+
+    def test_poll_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type()
+            self.q.poll()
+
+
+    # get
+
+    def test_get(self):
+        self.q.put(self.job, self.now)
+        self.q.poll(now=self.now)
+
+        self.assertEqual(self.q.get(1), self.job)
+
+    def test_get_RETURN_NONE_when_TIMEOUT(self):
+        self.q.put(self.job, self.now)
+
+        self.assertIsNone(self.q.get(1))
+
+
+    # clear
+
+    def test_clear(self):
+        self.q.put_many({'a': self.now, 'b': self.now + 10})
+        self.q.poll(now=self.now)
+
+        self.q.clear()
+
+        self.assertEqual(len(self.q), 0)
+        self.assertEqual(len(self.q.ready), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
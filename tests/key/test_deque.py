@@ -1,12 +1,30 @@
 # coding: utf-8
 
+import redis
+import collections
 from redis import Redis
 from ooredis import Deque
+from ooredis.key.deque import block_pop_any, block_popleft_any, fan_out
 from unittest import TestCase
 
 from ooredis.key.helper import format_key
 from ooredis.type_case import JsonTypeCase
 
+class OldRedis(redis.Redis):
+
+    """ 
+    模拟不支持 LPOS 命令，以及不支持带 count 参数的 LPOP/RPOP 的旧版本服务器。
+    """
+
+    def execute_command(self, *args, **options):
+        if args[0] == 'LPOS':
+            raise redis.exceptions.ResponseError("unknown command 'LPOS'")
+        if args[0] in ('LPOP', 'RPOP') and len(args) > 2:
+            raise redis.exceptions.ResponseError(
+                "wrong number of arguments for '{0}' command".format(args[0].lower())
+            )
+        return super(OldRedis, self).execute_command(*args, **options)
+
 class TestDeque(TestCase):
 
     def setUp(self):
@@ -66,6 +84,52 @@ class TestDeque(TestCase):
             self.set_wrong_type(self.d)
             self.d.append(self.item)
 
+    # maxlen
+
+    def test_init_RAISE_when_MAXLEN_NOT_POSITIVE(self):
+        with self.assertRaises(ValueError):
+            Deque('deque', maxlen=0)
+
+    def test_append_with_MAXLEN(self):
+        d = Deque('deque', type_case=JsonTypeCase, maxlen=3)
+        for i in range(5):
+            d.append(i)
+
+        assert list(d) == [2, 3, 4]
+        assert d.append(5, return_dropped=True) == [2]
+        assert list(d) == [3, 4, 5]
+
+    def test_appendleft_with_MAXLEN(self):
+        d = Deque('deque', type_case=JsonTypeCase, maxlen=3)
+        for i in range(5):
+            d.appendleft(i)
+
+        assert list(d) == [4, 3, 2]
+        assert d.appendleft(5, return_dropped=True) == [2]
+        assert list(d) == [5, 4, 3]
+
+    def test_append_RETURN_EMPTY_LIST_when_NOTHING_DROPPED(self):
+        d = Deque('deque', type_case=JsonTypeCase, maxlen=3)
+        assert d.append(1, return_dropped=True) == []
+        assert self.d.append(1, return_dropped=True) == []
+
+    def test_extend_with_MAXLEN(self):
+        d = Deque('deque', type_case=JsonTypeCase, maxlen=4)
+        d.extend([0, 1])
+
+        assert d.extend(range(2, 10), chunk_size=3) == 8
+        assert list(d) == [6, 7, 8, 9]
+
+        assert d.extend([10, 11], return_dropped=True) == [6, 7]
+        assert list(d) == [8, 9, 10, 11]
+
+    def test_extendleft_with_MAXLEN(self):
+        d = Deque('deque', type_case=JsonTypeCase, maxlen=4)
+        d.extendleft(range(6), chunk_size=4)
+
+        assert list(d) == [5, 4, 3, 2]
+        assert d.extendleft([6], return_dropped=True) == [2]
+
     # extend
 
     def test_extend_when_EMPTY(self):
@@ -87,6 +151,20 @@ class TestDeque(TestCase):
             self.set_wrong_type(self.d)
             self.d.extend(self.multi_item)
 
+    def test_extend_with_GENERATOR_and_CHUNK_SIZE(self):
+        reports = []
+        count = self.d.extend((i for i in xrange(100)), chunk_size=3,
+                              progress=reports.append)
+
+        assert count == 100
+        assert list(self.d) == range(100)
+        assert reports[-1] == 100
+        assert reports == sorted(reports)
+
+    def test_extend_with_EMPTY_ITERABLE(self):
+        assert self.d.extend([]) == 0
+        assert list(self.d) == []
+
     # extendleft
 
     def test_extendleft_when_EMPTY(self):
@@ -128,6 +206,12 @@ class TestDeque(TestCase):
             self.set_wrong_type(self.d)
             self.d.appendleft(self.item)
 
+    def test_extendleft_with_GENERATOR_and_CHUNK_SIZE(self):
+        count = self.d.extendleft((i for i in xrange(10)), chunk_size=3)
+
+        assert count == 10
+        assert list(self.d) == range(9, -1, -1)
+
     # __iter__
 
     def test__iter__when_EMPTY(self):
@@ -142,6 +226,50 @@ class TestDeque(TestCase):
             self.set_wrong_type(self.d)
             list(self.d)
 
+    def test__iter__use_PAGES(self):
+        d = Deque('deque', type_case=JsonTypeCase, page_size=3)
+        d.extend(range(10))
+
+        assert list(d) == range(10)
+
+        d.extend(range(10, 12))
+        assert list(d) == range(12)
+
+    # __reversed__
+
+    def test__reversed__(self):
+        d = Deque('deque', type_case=JsonTypeCase, page_size=3)
+        assert list(reversed(d)) == []
+
+        d.extend(range(10))
+        assert list(reversed(d)) == range(9, -1, -1)
+
+    def test__reversed__RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type(self.d)
+            list(reversed(self.d))
+
+    # iterate
+
+    def test_iterate_with_PAGE_SIZE(self):
+        self.d.extend(range(7))
+
+        for page_size in [1, 2, 7, 100]:
+            assert list(self.d.iterate(page_size=page_size)) == range(7)
+            assert list(self.d.iterate(reverse=True, page_size=page_size)) == range(6, -1, -1)
+
+    def test_iterate_with_SNAPSHOT(self):
+        self.d.extend(range(5))
+
+        for reverse in [False, True]:
+            items = []
+            for item in self.d.iterate(reverse=reverse, page_size=2, snapshot=True):
+                # 遍历期间追加的元素不会被返回
+                self.d.append(item)
+                items.append(item)
+            assert sorted(items) == range(5)
+            self.d[:] = range(5)
+
     # clear
 
     def test_clear_when_EMPTY(self):
@@ -181,6 +309,100 @@ class TestDeque(TestCase):
             self.set_wrong_type(self.d)
             self.d.count(self.item)
 
+    def test_count_with_MANY_MATCHES(self):
+        self.d.extend([self.item] * 2500 + [self.another_item])
+
+        assert self.d.count(self.item) == 2500
+        assert self.d.count(self.another_item) == 1
+
+    def test_count_with_OLD_REDIS(self):
+        d = Deque(self.d.name, client=OldRedis(), type_case=JsonTypeCase)
+        d.extend([self.item, self.another_item, self.item])
+
+        assert d.count(self.item) == 2
+        assert d.count('not exists') == 0
+
+    # index
+
+    def test_index(self):
+        self.d.extend([self.another_item, self.item, self.another_item, self.item])
+
+        assert self.d.index(self.item) == 1
+        assert self.d.index(self.item, 2) == 3
+        assert self.d.index(self.another_item, -2) == 2
+
+    def test_index_RAISE_when_ITEM_NOT_FOUND(self):
+        with self.assertRaises(ValueError):
+            self.d.index(self.item)
+
+        self.d.extend([self.item, self.another_item])
+        with self.assertRaises(ValueError):
+            self.d.index(self.item, 1)
+        with self.assertRaises(ValueError):
+            self.d.index(self.another_item, 0, 1)
+
+    def test_index_FALLBACK_when_LPOS_NOT_SUPPORTED(self):
+        d = Deque(self.d.name, client=OldRedis(), type_case=JsonTypeCase)
+        d.extend([self.another_item, self.item])
+
+        assert d.index(self.item) == 1
+        with self.assertRaises(ValueError):
+            d.index('not exists')
+
+    def test_index_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type(self.d)
+            self.d.index(self.item)
+
+    # remove
+
+    def test_remove(self):
+        self.d.extend([self.item, self.another_item, self.item, self.item])
+
+        assert self.d.remove(self.item) == 1
+        assert list(self.d) == [self.another_item, self.item, self.item]
+
+        assert self.d.remove(self.item, count=0) == 2
+        assert list(self.d) == [self.another_item]
+
+    def test_remove_FROM_RIGHT(self):
+        self.d.extend([self.item, self.another_item, self.item])
+
+        self.d.remove(self.item, count=-1)
+        assert list(self.d) == [self.item, self.another_item]
+
+    def test_remove_RAISE_when_ITEM_NOT_FOUND(self):
+        with self.assertRaises(ValueError):
+            self.d.remove(self.item)
+
+    def test_remove_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type(self.d)
+            self.d.remove(self.item)
+
+    # insert_before & insert_after
+
+    def test_insert_before_and_insert_after(self):
+        self.d.extend(self.multi_item)
+
+        assert self.d.insert_before(self.multi_item[1], self.item) == 4
+        assert self.d.insert_after(self.multi_item[1], self.another_item) == 5
+        assert list(self.d) == [self.multi_item[0], self.item, self.multi_item[1],
+                                self.another_item, self.multi_item[2]]
+
+    def test_insert_RAISE_when_PIVOT_NOT_FOUND(self):
+        with self.assertRaises(ValueError):
+            self.d.insert_before(self.item, self.another_item)
+
+        self.d.append(self.item)
+        with self.assertRaises(ValueError):
+            self.d.insert_after(self.another_item, self.item)
+
+    def test_insert_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type(self.d)
+            self.d.insert_before(self.item, self.another_item)
+
     # pop
 
     def test_pop_RAISE_when_EMPTY(self):
@@ -240,12 +462,166 @@ class TestDeque(TestCase):
             1
         )
 
+    def test_block_pop_with_UNICODE_NAME(self):
+        d = Deque(u'队列', type_case=JsonTypeCase)
+        d.extend([self.item, self.another_item])
+
+        assert d.block_pop(1) == self.another_item
+        assert d.block_popleft(1) == self.item
+        assert len(d) == 0
+
     def test_pop_RAISE_when_WRONG_TYPE(self):
         with self.assertRaises(TypeError):
             self.set_wrong_type(self.d)
             self.d.block_pop()
 
 
+    # rotate
+
+    def test_rotate(self):
+        self.d.extend(range(5))
+
+        for n in [1, 2, 4, 7, -1, -3, 0, 12]:
+            items = list(self.d)
+            self.d.rotate(n)
+
+            expected = collections.deque(items)
+            expected.rotate(n)
+            assert list(self.d) == list(expected)
+
+    def test_rotate_when_EMPTY(self):
+        self.d.rotate(3)
+        assert list(self.d) == []
+
+    def test_rotate_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type(self.d)
+            self.d.rotate()
+
+    # move_to
+
+    def test_move_to(self):
+        another = Deque('another', type_case=JsonTypeCase)
+        self.d.extend([1, 2, 3])
+        another.extend([4])
+
+        assert self.d.move_to(another, 2) == 2
+        assert list(self.d) == [1]
+        assert list(another) == [2, 3, 4]
+
+        assert another.move_to(self.d, 5, from_end='left', to_end='right') == 3
+        assert list(self.d) == [1, 2, 3, 4]
+        assert list(another) == []
+
+    def test_move_to_RAISE_when_WRONG_END(self):
+        with self.assertRaises(ValueError):
+            self.d.move_to(self.d, from_end='middle')
+
+    def test_move_to_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.d.append(self.item)
+            self.redispy.set('another', 'string')
+            self.d.move_to(Deque('another'))
+
+    # fan_out
+
+    def test_fan_out(self):
+        deques = [Deque('timeline:{0}'.format(i), type_case=JsonTypeCase, maxlen=2)
+                  for i in range(5)]
+        deques[0].extend([1, 2])
+
+        timings = fan_out(deques, self.item, chunk_size=2)
+
+        assert [timing['size'] for timing in timings] == [2, 2, 1]
+        assert all(timing['seconds'] >= 0 for timing in timings)
+        assert list(deques[0]) == [self.item, 1]
+        assert all(list(deque) == [self.item] for deque in deques[1:])
+
+    def test_fan_out_to_RIGHT_without_MAXLEN(self):
+        self.d.extend(self.multi_item)
+
+        fan_out([self.d], self.item, to_end='right')
+        assert list(self.d) == self.multi_item + [self.item]
+
+    def test_fan_out_with_NO_DEQUES(self):
+        assert fan_out([], self.item) == []
+
+    def test_fan_out_RAISE_when_WRONG_END(self):
+        with self.assertRaises(ValueError):
+            fan_out([self.d], self.item, to_end='middle')
+
+    def test_fan_out_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type(self.d)
+            fan_out([self.d], self.item)
+
+    # pop_many & popleft_many
+
+    def test_pop_many(self):
+        self.d.extend(range(5))
+
+        assert self.d.pop_many(2) == [4, 3]
+        assert self.d.popleft_many(2) == [0, 1]
+        assert self.d.pop_many(10) == [2]
+        assert self.d.pop_many(1) == []
+        assert self.d.popleft_many(0) == []
+
+    def test_pop_many_RAISE_when_NEGATIVE_COUNT(self):
+        with self.assertRaises(ValueError):
+            self.d.pop_many(-1)
+
+    def test_pop_many_FALLBACK_when_COUNT_NOT_SUPPORTED(self):
+        d = Deque(self.d.name, client=OldRedis(), type_case=JsonTypeCase)
+        d.extend(range(5))
+
+        assert d.pop_many(2) == [4, 3]
+        assert d.popleft_many(2) == [0, 1]
+        assert d.popleft_many(10) == [2]
+        assert d.pop_many(1) == []
+
+    def test_pop_many_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type(self.d)
+            self.d.pop_many(2)
+
+    # block_pop_any & block_popleft_any
+
+    def test_block_pop_any_RETURN_FIRST_NOT_EMPTY_DEQUE(self):
+        another = Deque('another', type_case=JsonTypeCase)
+        another.extend(self.multi_item)
+
+        deque, item = block_pop_any([self.d, another], 1)
+        assert deque == another
+        assert item == self.multi_item[-1]
+
+        self.d.append(self.item)
+        deque, item = block_popleft_any([another, self.d], 1)
+        assert deque == another
+        assert item == self.multi_item[0]
+
+    def test_block_pop_any_with_UNICODE_NAME(self):
+        another = Deque(u'队列', type_case=JsonTypeCase)
+        another.extend(self.multi_item)
+
+        deque, item = block_pop_any([self.d, another], 1)
+        assert deque is another
+        assert item == self.multi_item[-1]
+
+        deque, item = block_popleft_any([self.d, another], 1)
+        assert deque is another
+        assert item == self.multi_item[0]
+
+    def test_block_pop_any_RETURN_NONE_when_ALL_EMPTY(self):
+        another = Deque('another', type_case=JsonTypeCase)
+        assert block_pop_any([self.d, another], 1) is None
+        assert block_popleft_any([self.d, another], 1) is None
+
+    def test_block_pop_any_RAISE_when_NO_DEQUES(self):
+        with self.assertRaises(ValueError):
+            block_pop_any([], 1)
+        with self.assertRaises(ValueError):
+            block_popleft_any(iter([]), 1)
+
     # popleft
 
     def test_popleft_RAISE_when_EMPTY(self):
@@ -329,6 +705,21 @@ class TestDeque(TestCase):
     def test__getitem__RETURN_EMPTY_LIST_when_OUT_OF_RANGE(self):
         assert self.d[123:10086] == [] 
     
+    def test__getitem__use_NEGATIVE_INDEX(self):
+        self.d.extend(range(5))
+        assert self.d[-1] == 4
+        assert self.d[-5] == 0
+        with self.assertRaises(IndexError):
+            self.d[-6]
+
+    def test__getitem__use_SLICE_with_STEP(self):
+        self.d.extend(range(10))
+        items = range(10)
+
+        for index in [slice(-3, None), slice(2, 8, 3), slice(None, None, -1),
+                      slice(8, 2, -2), slice(2, 8, -1), slice(None, 0)]:
+            assert self.d[index] == items[index]
+
     def test__getitem__RAISE_when_WRONG_TYPE(self):
         with self.assertRaises(TypeError):
             self.set_wrong_type(self.d)
@@ -421,6 +812,32 @@ class TestDeque(TestCase):
             []
         )
 
+    def test__delitem__by_MIDDLE_SLICE(self):
+        self.d.extend(range(10))
+        items = range(10)
+
+        del self.d[3:6]
+        del items[3:6]
+        self.assertEqual(list(self.d), items)
+
+    def test__delitem__by_SLICE_with_STEP(self):
+        self.d.extend(range(10))
+        items = range(10)
+
+        del self.d[1:8:3]
+        del items[1:8:3]
+        self.assertEqual(list(self.d), items)
+
+        del self.d[::-2]
+        del items[::-2]
+        self.assertEqual(list(self.d), items)
+
+    def test__delitem__by_NEGATIVE_INDEX(self):
+        self.d.extend(self.multi_item)
+
+        del self.d[-1]
+        self.assertEqual(list(self.d), self.multi_item[:-1])
+
 
     # __setitem__
 
@@ -446,6 +863,33 @@ class TestDeque(TestCase):
             self.multi_item[:1]
         )
 
+    def test__setitem__by_SINGLE_INDEX_RAISE_when_OUT_OF_INDEX(self):
+        with self.assertRaises(IndexError):
+            self.d[0] = self.item
+
+        self.d.append(self.item)
+        with self.assertRaises(IndexError):
+            self.d[1] = self.item
+
+    def test__setitem__by_SLICE_with_DIFFERENT_LENGTH(self):
+        self.d.extend(range(5))
+        items = range(5)
+
+        self.d[1:2] = ['a', 'b', 'c']
+        items[1:2] = ['a', 'b', 'c']
+        self.assertEqual(list(self.d), items)
+
+    def test__setitem__by_SLICE_with_STEP(self):
+        self.d.extend(range(6))
+        items = range(6)
+
+        self.d[::2] = ['a', 'b', 'c']
+        items[::2] = ['a', 'b', 'c']
+        self.assertEqual(list(self.d), items)
+
+        with self.assertRaises(ValueError):
+            self.d[::2] = ['a']
+
     # wrong type
 
     def test__setitem__RAISE_when_WRONG_TYPE(self):
@@ -4,7 +4,16 @@ import redis
 import unittest
 
 from ooredis.key.base_key import BaseKey
-from ooredis.key.helper import format_key, wrap_exception
+from ooredis.key.helper import (
+    format_key,
+    wrap_exception,
+    slice_to_range,
+    score_bound,
+    chunks,
+    is_unknown_command,
+    pair_with_scores,
+    encode_name,
+)
 
 class TestHelper(unittest.TestCase):
 
@@ -44,5 +53,71 @@ class TestHelper(unittest.TestCase):
         )
 
 
+    # slice_to_range
+
+    def test_slice_to_range_with_POSITIVE_STEP(self):
+        self.assertEqual(slice_to_range(slice(None, None), None), (0, -1, 1))
+        self.assertEqual(slice_to_range(slice(2, -1, 2), None), (2, -2, 2))
+
+    def test_slice_to_range_RETURN_NONE_when_STOP_IS_ZERO(self):
+        self.assertIsNone(slice_to_range(slice(3, 0), None))
+
+    def test_slice_to_range_with_NEGATIVE_STEP(self):
+        get_length = lambda: 10
+        self.assertEqual(slice_to_range(slice(None, None, -1), get_length), (0, 9, -1))
+        self.assertEqual(slice_to_range(slice(8, 2, -2), get_length), (3, 8, -2))
+        self.assertIsNone(slice_to_range(slice(2, 8, -1), get_length))
+
+    def test_slice_to_range_RAISE_when_STEP_IS_ZERO(self):
+        with self.assertRaises(ValueError):
+            slice_to_range(slice(None, None, 0), None)
+
+
+    # score_bound
+
+    def test_score_bound(self):
+        self.assertEqual(score_bound(1.5), 1.5)
+        self.assertEqual(score_bound(1.5, inclusive=False), '(1.5')
+        self.assertEqual(score_bound('+inf', inclusive=False), '(+inf')
+
+
+    # chunks
+
+    def test_chunks(self):
+        self.assertEqual(list(chunks(iter(range(5)), 2)), [[0, 1], [2, 3], [4]])
+        self.assertEqual(list(chunks([], 2)), [])
+
+
+    # is_unknown_command
+
+    def test_is_unknown_command(self):
+        self.assertTrue(is_unknown_command(
+            redis.exceptions.ResponseError("unknown command 'ZMSCORE'")
+        ))
+        self.assertTrue(is_unknown_command(
+            redis.exceptions.ResponseError("wrong number of arguments for 'lpop' command")
+        ))
+        self.assertFalse(is_unknown_command(
+            redis.exceptions.ResponseError("WRONGTYPE Operation against a key")
+        ))
+
+
+    # pair_with_scores
+
+    def test_pair_with_scores(self):
+        self.assertEqual(
+            pair_with_scores(['a', '1', 'b', '2.5']),
+            [('a', 1.0), ('b', 2.5)]
+        )
+        self.assertEqual(pair_with_scores([]), [])
+
+
+    # encode_name
+
+    def test_encode_name(self):
+        self.assertEqual(encode_name('name'), 'name')
+        self.assertEqual(encode_name(u'队列'), u'队列'.encode('utf-8'))
+
+
 if __name__ == "__main__":
     unittest.main()
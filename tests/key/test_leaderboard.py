@@ -0,0 +1,142 @@
+#! /usr/bin/env python2.7
+# coding: utf-8
+
+import redis
+import unittest
+
+from ooredis.client import connect
+from ooredis.key.leaderboard import Leaderboard
+from ooredis.type_case import CompositeScoreTypeCase
+
+class TestLeaderboard(unittest.TestCase):
+
+    def setUp(self):
+        connect()
+
+        self.redispy = redis.Redis()
+        self.redispy.flushdb()
+
+        self.board = Leaderboard('leaderboard', capacity=3)
+
+    def tearDown(self):
+        self.redispy.flushdb()
+
+    def set_wrong_type(self):
+        self.redispy.set(self.board.name, 'string')
+
+
+    # __init__
+
+    def test_init_RAISE_when_CAPACITY_NOT_POSITIVE(self):
+        with self.assertRaises(ValueError):
+            Leaderboard('leaderboard', capacity=0)
+
+
+    # __setitem__
+
+    def test_setitem_TRIM_LOWEST_MEMBER(self):
+        for i in range(5):
+            self.board['player-{0}'.format(i)] = i
+
+        self.assertEqual(len(self.board), 3)
+        self.assertEqual(
+            [item['member'] for item in reversed(self.board)],
+            ['player-4', 'player-3', 'player-2']
+        )
+
+    def test_setitem_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type()
+            self.board['player'] = 1
+
+
+    # update
+
+    def test_update_TRIM_LOWEST_MEMBER(self):
+        self.assertEqual(
+            self.board.update(('player-{0}'.format(i), i) for i in range(5)),
+            5
+        )
+
+        self.assertEqual(len(self.board), 3)
+        self.assertIsNone(self.board.score('player-1'))
+
+
+    # incr
+
+    def test_incr_TRIM_LOWEST_MEMBER(self):
+        self.board.update({'a': 1, 'b': 2, 'c': 3})
+
+        self.assertEqual(self.board.incr('d', 10), 10)
+        self.assertEqual(len(self.board), 3)
+        self.assertIsNone(self.board.score('a'))
+
+    def test_incr_RAISE_when_SCORE_TYPE_CASE(self):
+        board = Leaderboard('leaderboard', capacity=3,
+                            score_type_case=CompositeScoreTypeCase((0, 9), (0, 1000)))
+
+        with self.assertRaises(TypeError):
+            board.incr('a', 1)
+        self.assertEqual(len(board), 0)
+
+
+    # top
+
+    def test_top(self):
+        self.board.update({'a': 1, 'b': 2, 'c': 3})
+
+        self.assertEqual(
+            self.board.top(2),
+            [{'member': 'c', 'score': 3}, {'member': 'b', 'score': 2}]
+        )
+
+    def test_top_RETURN_EMPTY_LIST_when_K_NOT_POSITIVE(self):
+        self.board.update({'a': 1, 'b': 2})
+
+        self.assertEqual(self.board.top(0), [])
+        self.assertEqual(self.board.top(-1), [])
+
+    def test_top_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type()
+            self.board.top(1)
+
+
+    # around
+
+    def test_around(self):
+        board = Leaderboard('leaderboard', capacity=100)
+        board.update(('player-{0}'.format(i), i) for i in range(10))
+
+        result = board.around('player-5', n=2, top=1)
+
+        self.assertEqual(result['rank'], 4)
+        self.assertEqual(
+            [item['member'] for item in result['around']],
+            ['player-7', 'player-6', 'player-5', 'player-4', 'player-3']
+        )
+        self.assertEqual(result['top'], [{'member': 'player-9', 'score': 9}])
+
+    def test_around_at_TOP(self):
+        self.board.update({'a': 1, 'b': 2, 'c': 3})
+
+        result = self.board.around('c', n=1)
+
+        self.assertEqual(result['rank'], 0)
+        self.assertEqual(
+            result['around'],
+            [{'member': 'c', 'score': 3}, {'member': 'b', 'score': 2}]
+        )
+        self.assertEqual(result['top'], [])
+
+    def test_around_RETURN_NONE_when_MEMBER_NOT_EXISTS(self):
+        self.assertIsNone(self.board.around('nobody'))
+
+    def test_around_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type()
+            self.board.around('player')
+
+
+if __name__ == "__main__":
+    unittest.main()
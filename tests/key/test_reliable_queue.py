@@ -0,0 +1,221 @@
+#! /usr/bin/env python2.7
+# coding: utf-8
+
+import time
+import redis
+import unittest
+
+from ooredis.client import connect
+from ooredis.key.helper import format_key
+from ooredis.type_case import JsonTypeCase
+from ooredis.key.reliable_queue import ReliableQueue, Reaper
+
+class OldRedis(redis.Redis):
+
+    """ 
+    模拟不支持 BLMOVE 命令的旧版本服务器，并记录 BLMOVE 的调用次数。
+    """
+
+    blmove_calls = 0
+
+    def execute_command(self, *args, **options):
+        if args[0] == 'BLMOVE':
+            self.blmove_calls += 1
+            raise redis.exceptions.ResponseError("unknown command 'BLMOVE'")
+        return super(OldRedis, self).execute_command(*args, **options)
+
+class TestReliableQueue(unittest.TestCase):
+
+    def setUp(self):
+        connect()
+
+        self.redispy = redis.Redis()
+        self.redispy.flushdb()
+
+        self.q = ReliableQueue('jobs', consumer='worker-1', type_case=JsonTypeCase)
+
+        self.job = {'id': 10086}
+        self.another_job = {'id': 10000}
+
+    def tearDown(self):
+        self.redispy.flushdb()
+
+    def set_wrong_type(self):
+        self.redispy.set(self.q.name, 'string')
+
+
+    # __init__
+
+    def test_init_RAISE_when_VISIBILITY_TIMEOUT_NOT_POSITIVE(self):
+        with self.assertRaises(ValueError):
+            ReliableQueue('jobs', visibility_timeout=0)
+
+    def test_init_with_DEFAULT_CONSUMER(self):
+        self.assertIsNotNone(ReliableQueue('jobs').consumer)
+
+
+    # __repr__
+
+    def test__repr__(self):
+        self.q.put(self.job)
+        self.assertEqual(
+            repr(self.q),
+            format_key(self.q, self.q.name, list(self.q.queue))
+        )
+
+
+    # put & put_many & __len__
+
+    def test_put_and_get_in_FIFO_ORDER(self):
+        self.q.put(self.job)
+        self.q.put(self.another_job)
+
+        self.assertEqual(len(self.q), 2)
+        self.assertEqual(self.q.get(), self.job)
+        self.assertEqual(self.q.get(), self.another_job)
+
+    def test_put_many(self):
+        self.assertEqual(self.q.put_many([1, 2, 3]), 3)
+        self.assertEqual([self.q.get() for i in range(3)], [1, 2, 3])
+
+
+    # get
+
+    def test_get_MOVE_ITEM_TO_PROCESSING(self):
+        self.q.put(self.job)
+
+        self.assertEqual(self.q.get(), self.job)
+        self.assertEqual(len(self.q), 0)
+        self.assertEqual(list(self.q.processing), [self.job])
+
+    def test_get_RENEW_LEASE(self):
+        self.q.put(self.job)
+        self.q.get()
+
+        self.assertIsNotNone(self.redispy.zscore(self.q.leases, self.q.consumer))
+
+    def test_get_ALWAYS_RENEW_LEASE_when_ITEM_RECEIVED(self):
+        # 租约还不需要续约，但是新取出的任务仍然应该得到完整的 visibility_timeout
+        self.q.heartbeat(now=time.time() - self.q.visibility_timeout / 4.0)
+        self.q.put(self.job)
+
+        before = time.time()
+        self.q.get()
+
+        self.assertGreaterEqual(self.redispy.zscore(self.q.leases, self.q.consumer),
+                                before + self.q.visibility_timeout)
+
+    def test_get_RETURN_NONE_when_TIMEOUT(self):
+        self.assertIsNone(self.q.get(timeout=1))
+
+    def test_get_FALLBACK_when_BLMOVE_NOT_SUPPORTED(self):
+        q = ReliableQueue('jobs', consumer='worker-1', client=OldRedis(),
+                          type_case=JsonTypeCase)
+        q.put(self.job)
+
+        self.assertEqual(q.get(), self.job)
+        self.assertEqual(list(q.processing), [self.job])
+
+    def test_get_PROBE_BLMOVE_ONLY_ONCE(self):
+        client = OldRedis()
+        q = ReliableQueue('jobs', consumer='worker-1', client=client,
+                          type_case=JsonTypeCase)
+        q.put_many([1, 2, 3])
+
+        self.assertEqual([q.get() for i in range(3)], [1, 2, 3])
+        self.assertEqual(client.blmove_calls, 1)
+
+    def test_get_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type()
+            self.q.get(timeout=1)
+
+
+    # ack
+
+    def test_ack(self):
+        self.q.put(self.job)
+        job = self.q.get()
+
+        self.assertTrue(self.q.ack(job))
+        self.assertEqual(list(self.q.processing), [])
+        self.assertFalse(self.q.ack(job))
+
+
+    # heartbeat & reap
+
+    def test_reap_REQUEUE_ITEMS_of_EXPIRED_CONSUMER(self):
+        self.q.put_many([1, 2, 3])
+        self.q.get()
+        self.q.get()
+
+        other = ReliableQueue('jobs', consumer='worker-2', type_case=JsonTypeCase)
+        self.assertEqual(other.reap(now=time.time() + 1), 0)
+        self.assertEqual(other.reap(now=time.time() + self.q.visibility_timeout + 1), 2)
+
+        self.assertEqual(list(self.q.processing), [])
+        self.assertIsNone(self.redispy.zscore(self.q.leases, self.q.consumer))
+        # 被放回的任务按原来的顺序最先被重新投递
+        self.assertEqual([other.get() for i in range(3)], [1, 2, 3])
+
+    def test_reap_SKIP_RENEWED_CONSUMER(self):
+        self.q.put(self.job)
+        self.q.get()
+
+        self.q.heartbeat(now=time.time() + 100)
+
+        self.assertEqual(self.q.reap(now=time.time() + self.q.visibility_timeout + 1), 0)
+        self.assertEqual(list(self.q.processing), [self.job])
+
+
+    # clear
+
+    def test_clear(self):
+        self.q.put_many([1, 2])
+        self.q.get()
+
+        self.q.clear()
+
+        self.assertEqual(self.redispy.keys('jobs*'), [])
+
+
+    # Reaper
+
+    def test_reaper(self):
+        q = ReliableQueue('jobs', consumer='worker-1', type_case=JsonTypeCase,
+                          visibility_timeout=0.1)
+        q.put(self.job)
+        q.get()
+
+        reaper = Reaper([q], interval=0.05)
+        reaper.start()
+        time.sleep(0.5)
+        reaper.stop()
+
+        self.assertFalse(reaper.is_alive())
+        self.assertEqual(reaper.reaped, 1)
+        self.assertEqual(len(q), 1)
+
+    def test_reaper_KEEP_RUNNING_when_REAP_RAISE(self):
+        broken = ReliableQueue('broken', consumer='worker-1')
+        self.redispy.set(broken.leases, 'string')
+
+        q = ReliableQueue('jobs', consumer='worker-1', type_case=JsonTypeCase,
+                          visibility_timeout=0.1)
+        q.put(self.job)
+        q.get()
+
+        reaper = Reaper([broken, q], interval=0.05)
+        reaper.start()
+        time.sleep(0.5)
+
+        self.assertTrue(reaper.is_alive())
+        reaper.stop()
+
+        self.assertGreater(reaper.errors, 1)
+        self.assertEqual(reaper.reaped, 1)
+        self.assertEqual(len(q), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
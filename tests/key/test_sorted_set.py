@@ -6,8 +6,9 @@ import unittest
 
 from ooredis.client import connect
 from ooredis.key.helper import format_key
-from ooredis.type_case import JsonTypeCase
-from ooredis.key.sorted_set import SortedSet
+from ooredis.type_case import JsonTypeCase, CompositeScoreTypeCase
+from ooredis.key.sorted_set import SortedSet, ScoredMember
+from ooredis.key.sorted_set import block_pop_min_any, block_pop_max_any
     
 class TestSortedSet(unittest.TestCase):
 
@@ -39,6 +40,62 @@ class TestSortedSet(unittest.TestCase):
         )
 
 
+    # item_type
+
+    def test_item_type_TUPLE(self):
+        s = SortedSet('sorted_set', type_case=JsonTypeCase, item_type=tuple)
+        s[self.element] = self.score
+
+        self.assertEqual(s[0], (self.element, self.score))
+        self.assertEqual(list(s), [(self.element, self.score)])
+        self.assertEqual(s.range_by_score(), [(self.element, self.score)])
+
+    def test_item_type_SCORED_MEMBER(self):
+        s = SortedSet('sorted_set', type_case=JsonTypeCase, item_type=ScoredMember)
+        s[self.element] = self.score
+
+        item = s[0]
+        self.assertEqual(item.member, self.element)
+        self.assertEqual(item.score, self.score)
+        self.assertEqual(tuple(item), (self.element, self.score))
+        self.assertEqual(s[:], [ScoredMember(self.element, self.score)])
+
+    def test_item_type_RAISE_when_UNKNOWN_TYPE(self):
+        with self.assertRaises(ValueError):
+            SortedSet('sorted_set', item_type=list)
+
+
+    # score_type_case
+
+    def test_score_type_case(self):
+        composite = CompositeScoreTypeCase((0, 9), (0, 1000))
+        s = SortedSet('sorted_set', type_case=JsonTypeCase,
+                      item_type=tuple, score_type_case=composite)
+
+        s['a'] = (2, 10)
+        s.update({'b': (1, 500), 'c': (2, 5)})
+
+        self.assertEqual(list(s), [('b', (1, 500)), ('c', (2, 5)), ('a', (2, 10))])
+        self.assertEqual(s.score('a'), (2, 10))
+        self.assertEqual(s.score_many(['c', 'x']), [(2, 5), None])
+        self.assertEqual(
+            s.range_by_score(*composite.leading_range(2, 2)),
+            [('c', (2, 5)), ('a', (2, 10))]
+        )
+
+    def test_score_type_case_RAISE_when_INCR(self):
+        composite = CompositeScoreTypeCase((0, 9), (0, 1000))
+        s = SortedSet('sorted_set', score_type_case=composite)
+        s['a'] = (2, 10)
+
+        with self.assertRaises(TypeError):
+            s.incr('a', 1)
+        with self.assertRaises(TypeError):
+            s.decr('a', 1)
+
+        self.assertEqual(s.score('a'), (2, 10))
+
+
     # __len__
 
     def test_len_RETURN_0_when_SET_EMPTY(self):
@@ -117,6 +174,64 @@ class TestSortedSet(unittest.TestCase):
             self.s[self.element] = self.score
 
 
+    # update
+
+    def test_update_with_DICT(self):
+        self.assertEqual(
+            self.s.update({'one': 1, 'two': 2}),
+            2
+        )
+        self.assertEqual(
+            self.s[:],
+            [{'member': 'one', 'score': 1}, {'member': 'two', 'score': 2}]
+        )
+
+    def test_update_with_PAIRS_in_MULTI_CHUNK(self):
+        pairs = ((i, i) for i in range(10))
+
+        self.assertEqual(self.s.update(pairs, chunk_size=3), 10)
+        self.assertEqual(
+            list(self.s),
+            [{'member': i, 'score': i} for i in range(10)]
+        )
+
+    def test_update_with_EMPTY_PAIRS(self):
+        self.assertEqual(self.s.update([]), 0)
+        self.assertEqual(len(self.s), 0)
+
+    def test_update_with_NX_and_XX(self):
+        self.s['one'] = 1
+
+        self.assertEqual(self.s.update({'one': 10, 'two': 2}, nx=True), 1)
+        self.assertEqual(self.s.score('one'), 1)
+
+        self.assertEqual(self.s.update({'one': 10, 'three': 3}, xx=True, ch=True), 1)
+        self.assertEqual(self.s.score('one'), 10)
+        self.assertNotIn('three', self.s)
+
+    def test_update_with_GT_and_LT(self):
+        self.s.update({'one': 1, 'two': 2})
+
+        self.assertEqual(self.s.update({'one': 0, 'two': 3}, gt=True, ch=True), 1)
+        self.assertEqual(self.s.score('one'), 1)
+        self.assertEqual(self.s.score('two'), 3)
+
+        self.assertEqual(self.s.update({'one': 0, 'two': 4}, lt=True, ch=True), 1)
+        self.assertEqual(self.s.score('one'), 0)
+        self.assertEqual(self.s.score('two'), 3)
+
+    def test_update_RAISE_when_CONFLICT_OPTION(self):
+        with self.assertRaises(ValueError):
+            self.s.update({'one': 1}, nx=True, xx=True)
+        with self.assertRaises(ValueError):
+            self.s.update({'one': 1}, gt=True, lt=True)
+
+    def test_update_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type()
+            self.s.update({'one': 1})
+
+
     # __getitem__
 
     def test_getitem_with_INDEX(self):
@@ -163,12 +278,80 @@ class TestSortedSet(unittest.TestCase):
         self.assertEqual(self.s[10086:],
                          [])
 
+    def test_getitem_with_NEGATIVE_RANGE_and_STEP(self):
+        for i in range(7):
+            self.s[i] = i
+        items = [{'member': i, 'score': i} for i in range(7)]
+
+        for start in (None, -10, -3, -1, 0, 2, 6, 10):
+            for stop in (None, -10, -3, -1, 0, 2, 6, 10):
+                for step in (None, 1, 2, 3, -1, -2):
+                    self.assertEqual(
+                        self.s[start:stop:step],
+                        items[start:stop:step]
+                    )
+
+    def test_getitem_RAISE_when_STEP_IS_ZERO(self):
+        with self.assertRaises(ValueError):
+            self.s[::0]
+
     def test_getitem_with_wrong_type(self):
         with self.assertRaises(TypeError):
             self.set_wrong_type()
             self.s[:]
 
 
+    # __iter__
+
+    def test_iter_with_EMPTY_SET(self):
+        self.assertEqual(list(self.s), [])
+
+    def test_iter_in_MULTI_PAGE(self):
+        s = SortedSet('paged', type_case=JsonTypeCase, page_size=2)
+        for i in range(5):
+            s[i] = i
+
+        self.assertEqual(
+            list(s),
+            [{'member': i, 'score': i} for i in range(5)]
+        )
+
+    def test_iter_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type()
+            list(self.s)
+
+
+    # __reversed__
+
+    def test_reversed_with_EMPTY_SET(self):
+        self.assertEqual(list(reversed(self.s)), [])
+
+    def test_reversed_in_MULTI_PAGE(self):
+        s = SortedSet('paged', type_case=JsonTypeCase, page_size=2)
+        for i in range(5):
+            s[i] = i
+
+        self.assertEqual(
+            list(reversed(s)),
+            [{'member': i, 'score': i} for i in reversed(range(5))]
+        )
+
+    def test_iterate_with_GIVEN_PAGE_SIZE(self):
+        for i in range(5):
+            self.s[i] = i
+
+        self.assertEqual(
+            list(self.s.iterate(reverse=True, page_size=3)),
+            list(reversed(self.s))
+        )
+
+    def test_reversed_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type()
+            list(reversed(self.s))
+
+
     # __delitem__
 
     def test__delitem__(self):
@@ -393,6 +576,60 @@ class TestSortedSet(unittest.TestCase):
             self.s.score(self.element)
 
 
+    # score_many
+
+    def test_score_many(self):
+        self.s.update({'one': 1, 'two': 2})
+
+        self.assertEqual(
+            self.s.score_many(['two', 'three', 'one']),
+            [2, None, 1]
+        )
+
+    def test_score_many_with_EMPTY_MEMBERS(self):
+        self.assertEqual(self.s.score_many([]), [])
+
+    def test_score_many_FALLBACK_when_ZMSCORE_NOT_SUPPORTED(self):
+        class OldRedis(redis.Redis):
+            def execute_command(self, *args, **options):
+                if args[0] == 'ZMSCORE':
+                    raise redis.exceptions.ResponseError("unknown command 'ZMSCORE'")
+                return super(OldRedis, self).execute_command(*args, **options)
+
+        s = SortedSet(self.s.name, client=OldRedis(), type_case=JsonTypeCase)
+        s.update({'one': 1, 'two': 2})
+
+        self.assertEqual(
+            s.score_many(['two', 'three', 'one']),
+            [2, None, 1]
+        )
+
+    def test_score_many_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type()
+            self.s.score_many([self.element])
+
+
+    # rank_many
+
+    def test_rank_many(self):
+        self.s.update({'one': 1, 'two': 2})
+
+        self.assertEqual(
+            self.s.rank_many(['two', 'three', 'one']),
+            [1, None, 0]
+        )
+        self.assertEqual(
+            self.s.rank_many(['two', 'three', 'one'], reverse=True),
+            [0, None, 1]
+        )
+
+    def test_rank_many_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type()
+            self.s.rank_many([self.element])
+
+
     # incr
 
     def test_incr_RETURN_FALOT_TYPE(self):
@@ -489,5 +726,401 @@ class TestSortedSet(unittest.TestCase):
             self.s.decr(self.element)
 
 
+
+    # range_by_score
+
+    def test_range_by_score(self):
+        for i in range(5):
+            self.s[i] = i
+
+        self.assertEqual(
+            self.s.range_by_score(1, 3),
+            [{'member': i, 'score': i} for i in (1, 2, 3)]
+        )
+
+    def test_range_by_score_with_EXCLUSIVE_BOUND(self):
+        for i in range(5):
+            self.s[i] = i
+
+        self.assertEqual(
+            self.s.range_by_score(1, 3, min_inclusive=False, max_inclusive=False),
+            [{'member': 2, 'score': 2}]
+        )
+
+    def test_range_by_score_with_OFFSET_and_LIMIT(self):
+        for i in range(5):
+            self.s[i] = i
+
+        self.assertEqual(
+            self.s.range_by_score(offset=1, limit=2),
+            [{'member': i, 'score': i} for i in (1, 2)]
+        )
+        self.assertEqual(
+            self.s.range_by_score(offset=3),
+            [{'member': i, 'score': i} for i in (3, 4)]
+        )
+
+    def test_range_by_score_with_REVERSE(self):
+        for i in range(5):
+            self.s[i] = i
+
+        self.assertEqual(
+            self.s.range_by_score(1, 3, limit=2, reverse=True),
+            [{'member': i, 'score': i} for i in (3, 2)]
+        )
+
+    def test_range_by_score_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type()
+            self.s.range_by_score()
+
+
+    # iter_by_score
+
+    def test_iter_by_score_with_TIED_SCORE(self):
+        for i in range(10):
+            self.s[i] = i // 3
+
+        self.assertEqual(
+            list(self.s.iter_by_score(page_size=2)),
+            self.s.range_by_score()
+        )
+        self.assertEqual(
+            list(self.s.iter_by_score(1, 2, reverse=True, page_size=2)),
+            self.s.range_by_score(1, 2, reverse=True)
+        )
+
+    def test_iter_by_score_with_EXCLUSIVE_BOUND(self):
+        for i in range(10):
+            self.s[i] = i
+
+        self.assertEqual(
+            list(self.s.iter_by_score(2, 8, page_size=3, min_inclusive=False)),
+            self.s.range_by_score(2, 8, min_inclusive=False)
+        )
+
+    def test_iter_by_score_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type()
+            list(self.s.iter_by_score())
+
+
+    # count_by_score
+
+    def test_count_by_score(self):
+        for i in range(5):
+            self.s[i] = i
+
+        self.assertEqual(self.s.count_by_score(), 5)
+        self.assertEqual(self.s.count_by_score(1, 3), 3)
+        self.assertEqual(self.s.count_by_score(1, 3, max_inclusive=False), 2)
+
+    def test_count_by_score_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type()
+            self.s.count_by_score()
+
+
+    # histogram
+
+    def test_histogram(self):
+        self.s.update((i, i) for i in range(10))
+
+        self.assertEqual(self.s.histogram([0, 3, 6, 9]), [3, 3, 4])
+        self.assertEqual(self.s.histogram([-10, 0, 100]), [0, 10])
+
+    def test_histogram_RAISE_when_WRONG_EDGES(self):
+        with self.assertRaises(ValueError):
+            self.s.histogram([1])
+        with self.assertRaises(ValueError):
+            self.s.histogram([3, 1, 2])
+
+    def test_histogram_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type()
+            self.s.histogram([0, 1])
+
+
+    # quantile & quantiles
+
+    def test_quantile(self):
+        self.s.update(('m{0}'.format(i), i) for i in range(101))
+
+        self.assertEqual(self.s.quantile(0), {'member': 'm0', 'score': 0})
+        self.assertEqual(self.s.quantile(0.5), {'member': 'm50', 'score': 50})
+        self.assertEqual(self.s.quantile(1), {'member': 'm100', 'score': 100})
+
+    def test_quantile_RETURN_NONE_when_EMPTY(self):
+        self.assertIsNone(self.s.quantile(0.5))
+
+    def test_quantile_RAISE_when_OUT_OF_RANGE(self):
+        with self.assertRaises(ValueError):
+            self.s.quantile(1.5)
+
+    def test_quantiles(self):
+        self.s.update(('m{0}'.format(i), i) for i in range(101))
+
+        self.assertEqual(
+            [item['score'] for item in self.s.quantiles([0.5, 0.9, 0.99])],
+            [50, 90, 99]
+        )
+        self.assertEqual(SortedSet('empty').quantiles([0.5, 0.99]), [None, None])
+
+    def test_quantiles_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type()
+            self.s.quantiles([0.5])
+
+
+    # range_by_lex
+
+    def test_range_by_lex(self):
+        s = SortedSet('lex')
+        s.update((word, 0) for word in ['apple', 'banana', 'cherry', 'date'])
+
+        self.assertEqual(
+            list(s.range_by_lex('[b', '(d', page_size=1)),
+            ['banana', 'cherry']
+        )
+        self.assertEqual(
+            list(s.range_by_lex(offset=1, limit=2, page_size=1)),
+            ['banana', 'cherry']
+        )
+
+    def test_range_by_lex_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type()
+            list(self.s.range_by_lex())
+
+
+    # prefix
+
+    def test_prefix(self):
+        s = SortedSet('lex')
+        s.update((word, 0) for word in ['car', 'card', 'care', 'cat', 'dog'])
+
+        self.assertEqual(
+            list(s.prefix('car', page_size=2)),
+            ['car', 'card', 'care']
+        )
+        self.assertEqual(
+            list(s.prefix(u'ca', limit=2)),
+            ['car', 'card']
+        )
+        self.assertEqual(list(s.prefix('x')), [])
+
+
+    # count_by_lex
+
+    def test_count_by_lex(self):
+        s = SortedSet('lex')
+        s.update((word, 0) for word in ['car', 'card', 'care', 'cat', 'dog'])
+
+        self.assertEqual(s.count_by_lex(), 5)
+        self.assertEqual(s.count_by_lex('[car', '(cat'), 3)
+
+    def test_count_by_lex_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type()
+            self.s.count_by_lex()
+
+
+    # union_store
+
+    def test_union_store(self):
+        dest = SortedSet('dest', type_case=JsonTypeCase)
+        self.s.update({'a': 1, 'b': 2})
+        self.another.update({'b': 3, 'c': 4})
+
+        self.assertEqual(self.s.union_store(dest, [self.another]), 3)
+        self.assertEqual(
+            dest[:],
+            [{'member': 'a', 'score': 1},
+             {'member': 'c', 'score': 4},
+             {'member': 'b', 'score': 5}]
+        )
+
+    def test_union_store_with_WEIGHTS_and_AGGREGATE(self):
+        dest = SortedSet('dest', type_case=JsonTypeCase)
+        self.s.update({'a': 1, 'b': 2})
+        self.another.update({'b': 3, 'c': 4})
+
+        self.s.union_store(dest, [self.another], weights=[10, 1], aggregate='max')
+        self.assertEqual(
+            dest[:],
+            [{'member': 'c', 'score': 4},
+             {'member': 'a', 'score': 10},
+             {'member': 'b', 'score': 20}]
+        )
+
+    def test_union_store_RAISE_when_WRONG_WEIGHTS_OR_AGGREGATE(self):
+        dest = SortedSet('dest')
+        with self.assertRaises(ValueError):
+            self.s.union_store(dest, [self.another], weights=[1])
+        with self.assertRaises(ValueError):
+            self.s.union_store(dest, [self.another], aggregate='avg')
+
+    def test_union_store_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type()
+            self.s.union_store(SortedSet('dest'), [self.another])
+
+
+    # inter_store
+
+    def test_inter_store(self):
+        dest = SortedSet('dest', type_case=JsonTypeCase)
+        self.s.update({'a': 1, 'b': 2})
+        self.another.update({'b': 3, 'c': 4})
+
+        self.assertEqual(self.s.inter_store(dest, [self.another], aggregate='MIN'), 1)
+        self.assertEqual(dest[:], [{'member': 'b', 'score': 2}])
+
+
+    # union_top
+
+    def test_union_top(self):
+        self.s.update({'a': 1, 'b': 2})
+        self.another.update({'b': 3, 'c': 4})
+
+        self.assertEqual(
+            self.s.union_top([self.another], 2),
+            [{'member': 'b', 'score': 5}, {'member': 'c', 'score': 4}]
+        )
+        self.assertEqual(
+            self.s.union_top([self.another], 1, reverse=False),
+            [{'member': 'a', 'score': 1}]
+        )
+
+        # 取出结果之后临时 key 已经被删除
+        self.assertEqual(self.redispy.keys(self.s.name + ':zunionstore:*'), [])
+
+    def test_union_top_RETURN_EMPTY_LIST_when_N_NOT_POSITIVE(self):
+        self.s.update({'one': 1, 'two': 2})
+
+        self.assertEqual(self.s.union_top([self.another], 0), [])
+        self.assertEqual(self.s.inter_top([self.another], -1), [])
+
+
+    # inter_top
+
+    def test_inter_top(self):
+        self.s.update({'a': 1, 'b': 2, 'c': 3})
+        self.another.update({'b': 3, 'c': 4})
+
+        self.assertEqual(
+            self.s.inter_top([self.another], 1, weights=[2, 1]),
+            [{'member': 'c', 'score': 10}]
+        )
+        self.assertEqual(self.redispy.keys(self.s.name + ':zinterstore:*'), [])
+
+    def test_inter_top_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type()
+            self.s.inter_top([self.another], 1)
+
+
+    # pop_min
+
+    def test_pop_min(self):
+        self.s.update({'a': 1, 'b': 2, 'c': 3})
+
+        self.assertEqual(self.s.pop_min(), {'member': 'a', 'score': 1})
+        self.assertEqual(
+            self.s.pop_min(5),
+            [{'member': 'b', 'score': 2}, {'member': 'c', 'score': 3}]
+        )
+        self.assertEqual(self.s.pop_min(5), [])
+
+    def test_pop_min_RAISE_when_EMPTY(self):
+        with self.assertRaises(IndexError):
+            self.s.pop_min()
+
+    def test_pop_min_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type()
+            self.s.pop_min()
+
+
+    # pop_max
+
+    def test_pop_max(self):
+        self.s.update({'a': 1, 'b': 2, 'c': 3})
+
+        self.assertEqual(self.s.pop_max(), {'member': 'c', 'score': 3})
+        self.assertEqual(
+            self.s.pop_max(2),
+            [{'member': 'b', 'score': 2}, {'member': 'a', 'score': 1}]
+        )
+
+    def test_pop_max_RAISE_when_EMPTY(self):
+        with self.assertRaises(IndexError):
+            self.s.pop_max()
+
+
+    # block_pop_min
+
+    def test_block_pop_min_RETURN_NONE_when_EMPTY(self):
+        self.assertIsNone(self.s.block_pop_min(1))
+
+    def test_block_pop_min(self):
+        self.s.update({'a': 1, 'b': 2})
+
+        self.assertEqual(self.s.block_pop_min(1), {'member': 'a', 'score': 1})
+        self.assertEqual(len(self.s), 1)
+
+    def test_block_pop_min_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type()
+            self.s.block_pop_min(1)
+
+
+    # block_pop_max
+
+    def test_block_pop_max(self):
+        self.s.update({'a': 1, 'b': 2})
+
+        self.assertEqual(self.s.block_pop_max(1), {'member': 'b', 'score': 2})
+        self.assertEqual(len(self.s), 1)
+
+    def test_block_pop_with_UNICODE_NAME(self):
+        s = SortedSet(u'排行')
+        s.update({'a': 1, 'b': 2})
+
+        self.assertEqual(s.block_pop_min(1), {'member': 'a', 'score': 1})
+        self.assertEqual(s.block_pop_max(1), {'member': 'b', 'score': 2})
+        self.assertEqual(len(s), 0)
+
+
+    # block_pop_min_any and block_pop_max_any
+
+    def test_block_pop_any_RETURN_FIRST_NOT_EMPTY_SORTED_SET(self):
+        self.another.update({'a': 1, 'b': 2})
+
+        sorted_set, item = block_pop_min_any([self.s, self.another], 1)
+        self.assertEqual(sorted_set, self.another)
+        self.assertEqual(item, {'member': 'a', 'score': 1})
+
+        sorted_set, item = block_pop_max_any([self.s, self.another], 1)
+        self.assertEqual(sorted_set, self.another)
+        self.assertEqual(item, {'member': 'b', 'score': 2})
+
+    def test_block_pop_any_with_UNICODE_NAME(self):
+        another = SortedSet(u'排行')
+        another.update({'a': 1, 'b': 2})
+
+        sorted_set, item = block_pop_min_any([self.s, another], 1)
+        self.assertIs(sorted_set, another)
+        self.assertEqual(item, {'member': 'a', 'score': 1})
+
+    def test_block_pop_any_RETURN_NONE_when_ALL_EMPTY(self):
+        self.assertIsNone(block_pop_min_any([self.s, self.another], 1))
+
+    def test_block_pop_any_RAISE_when_NO_SORTED_SETS(self):
+        with self.assertRaises(ValueError):
+            block_pop_min_any([], 1)
+        with self.assertRaises(ValueError):
+            block_pop_max_any([], 1)
+
 if __name__ == "__main__":
     unittest.main()
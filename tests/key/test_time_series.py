@@ -0,0 +1,207 @@
+#! /usr/bin/env python2.7
+# coding: utf-8
+
+import redis
+import unittest
+
+from ooredis.client import connect
+from ooredis.key.time_series import TimeSeries, SampleTypeCase
+
+class TestTimeSeries(unittest.TestCase):
+
+    def setUp(self):
+        connect()
+
+        self.redispy = redis.Redis()
+        self.redispy.flushdb()
+
+        self.ts = TimeSeries('metric')
+        self.rolled = TimeSeries('rolled', rollups=(10, 60))
+
+        # 每秒一个样本，样本的值等于时间戳除以 10 的余数
+        self.samples = [(t, t % 10) for t in range(120)]
+
+    def tearDown(self):
+        self.redispy.flushdb()
+
+    def set_wrong_type(self):
+        self.redispy.set(self.ts.name, 'string')
+
+    def expected(self, start, end, bucket, func):
+        groups = {}
+        for timestamp, value in self.samples:
+            if start <= timestamp < end:
+                groups.setdefault(timestamp // bucket * bucket, []).append(value)
+
+        result = []
+        for bucket_start in sorted(groups):
+            values = groups[bucket_start]
+            value = {
+                'min': min(values),
+                'max': max(values),
+                'sum': sum(values),
+                'avg': float(sum(values)) / len(values),
+                'count': len(values),
+            }[func]
+            result.append((bucket_start, value))
+        return result
+
+
+    # SampleTypeCase
+
+    def test_sample_type_case(self):
+        member = SampleTypeCase.encode((1.5, -0.1))
+        self.assertEqual(SampleTypeCase.decode(member), (1.5, -0.1))
+
+    def test_sample_type_case_IGNORE_SEQ_SUFFIX(self):
+        member = SampleTypeCase.encode((1.5, -0.1)) + ':42'
+        self.assertEqual(SampleTypeCase.decode(member), (1.5, -0.1))
+
+
+    # append and extend
+
+    def test_append(self):
+        self.assertEqual(self.ts.append(1000, 1.5), 1)
+        self.assertEqual(self.ts.append(1001, 2.5), 1)
+
+        self.assertEqual(list(self.ts), [(1000, 1.5), (1001, 2.5)])
+
+    def test_extend_KEEP_DUPLICATE_SAMPLE(self):
+        self.assertEqual(self.ts.extend([(1, 1.0)] * 3), 3)
+        self.assertEqual(self.ts.append(1, 1.0), 1)
+
+        self.assertEqual(len(self.ts), 4)
+        self.assertEqual(list(self.ts), [(1, 1.0)] * 4)
+        self.assertEqual(self.ts.aggregate(0, 10, 10, 'sum'), [(0, 4.0)])
+
+    def test_extend_in_MULTI_CHUNK(self):
+        self.assertEqual(self.ts.extend(iter(self.samples), chunk_size=7), 120)
+
+        self.assertEqual(len(self.ts), 120)
+        self.assertEqual(self.ts.range_by_score(10, 12), self.samples[10:13])
+
+    def test_extend_TRIM_by_RETENTION(self):
+        ts = TimeSeries('metric', retention=30)
+        ts.extend(self.samples)
+
+        self.assertEqual(list(ts), self.samples[-31:])
+
+    def test_extend_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type()
+            self.ts.append(1000, 1)
+
+
+    # aggregate
+
+    def test_aggregate_from_SAMPLES(self):
+        ts = TimeSeries('metric', page_size=7)
+        ts.extend(self.samples)
+
+        for func in ('min', 'max', 'sum', 'avg', 'count'):
+            self.assertEqual(
+                ts.aggregate(3, 97, 20, func),
+                self.expected(3, 97, 20, func)
+            )
+
+    def test_aggregate_from_ROLLUP(self):
+        self.rolled.extend(self.samples, chunk_size=11)
+        # 清空原始样本，确保结果来自 rollup
+        self.redispy.delete(self.rolled.name)
+
+        for func in ('min', 'max', 'sum', 'avg', 'count'):
+            self.assertEqual(
+                self.rolled.aggregate(0, 120, 60, func),
+                self.expected(0, 120, 60, func)
+            )
+            self.assertEqual(
+                self.rolled.aggregate(20, 100, 20, func),
+                self.expected(20, 100, 20, func)
+            )
+
+    def test_aggregate_from_ROLLUP_and_SAMPLES_when_UNALIGNED(self):
+        self.rolled.extend(self.samples)
+        # 清空中间对齐部分的原始样本，确保中间部分来自 rollup ，两端来自原始样本
+        self.redispy.zremrangebyscore(self.rolled.name, 10, '(110')
+
+        for func in ('min', 'max', 'sum', 'avg', 'count'):
+            self.assertEqual(
+                self.rolled.aggregate(5, 115, 20, func),
+                self.expected(5, 115, 20, func)
+            )
+
+    def test_aggregate_from_ROLLUP_with_INFINITE_BOUND(self):
+        self.rolled.extend(self.samples)
+        self.redispy.delete(self.rolled.name)
+
+        self.assertEqual(
+            self.rolled.aggregate(bucket=60, func='sum'),
+            self.expected(float('-inf'), float('inf'), 60, 'sum')
+        )
+        self.assertEqual(
+            self.rolled.aggregate(end=60, bucket=60, func='count'),
+            self.expected(float('-inf'), 60, 60, 'count')
+        )
+
+    def test_aggregate_ROLLUP_COUNT_DUPLICATE_SAMPLE(self):
+        self.rolled.extend(self.samples)
+        self.rolled.extend(self.samples)
+
+        self.assertEqual(
+            self.rolled.aggregate(0, 120, 60, 'count'),
+            [(0, 120), (60, 120)]
+        )
+        # rollup 和原始样本的统计结果一致
+        self.assertEqual(
+            self.rolled.aggregate(0, 120, 60, 'count'),
+            TimeSeries('rolled').aggregate(0, 120, 60, 'count')
+        )
+
+    def test_aggregate_TRIM_ROLLUP_by_ROLLUP_RETENTION(self):
+        ts = TimeSeries('rolled', retention=50, rollups=(10,), rollup_retention=50)
+        ts.extend(self.samples)
+
+        # rollup 和原始样本覆盖相同的时间段，结果不受 bucket 长度影响
+        from_rollup = ts.aggregate(0, 120, 10, 'count')
+        from_samples = ts.aggregate(0, 120, 5, 'count')
+        self.assertEqual([bucket for bucket, count in from_rollup],
+                         [60, 70, 80, 90, 100, 110])
+        self.assertEqual(from_rollup[1:], self.expected(70, 120, 10, 'count'))
+        self.assertEqual(from_samples[0], (65, 1))
+
+    def test_init_RAISE_when_ROLLUP_RETENTION_SHORTER_than_RETENTION(self):
+        with self.assertRaises(ValueError):
+            TimeSeries('rolled', retention=100, rollups=(10,), rollup_retention=50)
+        with self.assertRaises(ValueError):
+            TimeSeries('rolled', rollups=(10,), rollup_retention=50)
+
+    def test_aggregate_RAISE_when_BOUND_NOT_NUMBER(self):
+        self.ts.extend(self.samples)
+
+        with self.assertRaises(ValueError):
+            self.ts.aggregate('(5', 50, 10)
+        with self.assertRaises(ValueError):
+            self.rolled.aggregate(5, '(50', 10)
+
+    def test_aggregate_RAISE_when_UNKNOWN_FUNC(self):
+        with self.assertRaises(ValueError):
+            self.ts.aggregate(0, 10, 10, 'median')
+
+    def test_aggregate_RAISE_when_WRONG_TYPE(self):
+        with self.assertRaises(TypeError):
+            self.set_wrong_type()
+            self.ts.aggregate(0, 10, 10)
+
+
+    # delete
+
+    def test_delete_REMOVE_ROLLUP(self):
+        self.rolled.extend(self.samples)
+
+        self.rolled.delete()
+
+        self.assertEqual(self.redispy.keys('rolled*'), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
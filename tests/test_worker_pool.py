@@ -0,0 +1,182 @@
+#! /usr/bin/env python2.7
+# coding: utf-8
+
+import time
+import redis
+import unittest
+import threading
+
+from ooredis.client import connect
+from ooredis.key.deque import Deque
+from ooredis.type_case import JsonTypeCase
+from ooredis.worker_pool import WorkerPool
+
+class TestWorkerPool(unittest.TestCase):
+
+    def setUp(self):
+        connect()
+
+        self.redispy = redis.Redis()
+        self.redispy.flushdb()
+
+        self.d = Deque('jobs', type_case=JsonTypeCase)
+
+        self.lock = threading.Lock()
+        self.handled = []
+
+    def tearDown(self):
+        self.redispy.flushdb()
+
+    def handler(self, item):
+        with self.lock:
+            self.handled.append(item)
+
+    def wait_for(self, condition, timeout=5):
+        deadline = time.time() + timeout
+        while not condition() and time.time() < deadline:
+            time.sleep(0.01)
+
+
+    # __init__
+
+    def test_init_RAISE_when_NOT_POSITIVE(self):
+        with self.assertRaises(ValueError):
+            WorkerPool(self.d, self.handler, concurrency=0)
+        with self.assertRaises(ValueError):
+            WorkerPool(self.d, self.handler, batch_size=0)
+
+
+    # start & stop
+
+    def test_process_ALL_ITEMS(self):
+        self.d.extend(range(500))
+
+        pool = WorkerPool(self.d, self.handler, concurrency=4, batch_size=50,
+                          poll_timeout=0.1)
+        pool.start()
+        self.wait_for(lambda: len(self.handled) == 500)
+        pool.stop()
+
+        self.assertEqual(sorted(self.handled), range(500))
+        self.assertEqual(pool.fetched, 500)
+        self.assertEqual(len(self.d), 0)
+
+    def test_process_ITEMS_PUSHED_AFTER_START(self):
+        with WorkerPool(self.d, self.handler, poll_timeout=0.1):
+            self.d.append(1)
+            self.wait_for(lambda: self.handled == [1])
+
+        self.assertEqual(self.handled, [1])
+
+    def test_start_RAISE_when_ALREADY_STARTED(self):
+        with WorkerPool(self.d, self.handler, poll_timeout=0.1) as pool:
+            with self.assertRaises(RuntimeError):
+                pool.start()
+
+    def test_stop_DRAIN_PREFETCHED_ITEMS(self):
+        self.d.extend(range(1000))
+        released = threading.Event()
+
+        def blocked_handler(item):
+            released.wait()
+            self.handler(item)
+
+        pool = WorkerPool(self.d, blocked_handler, concurrency=2, batch_size=5,
+                          prefetch=10, poll_timeout=0.1)
+        pool.start()
+        self.wait_for(lambda: pool.fetched >= 10)
+        # 给 fetcher 足够的时间去取出超过上限的元素
+        time.sleep(0.3)
+
+        # 背压：离开 Redis 的元素最多为 prefetch+batch_size+concurrency 个
+        self.assertLessEqual(pool.fetched, 10 + 5 + 2)
+        self.assertEqual(len(self.d), 1000 - pool.fetched)
+
+        released.set()
+        pool.stop()
+
+        # 离开 Redis 的元素都被处理，其余元素留在队列中
+        self.assertEqual(len(self.handled), pool.fetched)
+        self.assertEqual(len(self.handled) + len(self.d), 1000)
+
+    def test_use_PROCESSES(self):
+        self.d.extend(range(10))
+
+        pool = WorkerPool(self.d, abs, concurrency=2, poll_timeout=0.1,
+                          use_processes=True)
+        pool.start()
+        self.wait_for(lambda: sum(s['processed'] for s in pool.stats()) == 10)
+        pool.stop()
+
+        self.assertEqual(sum(s['processed'] for s in pool.stats()), 10)
+
+
+    # fetch errors
+
+    def test_fetch_RETRY_when_FETCH_RAISE(self):
+        self.redispy.set(self.d.name, 'string')
+
+        pool = WorkerPool(self.d, self.handler, poll_timeout=0.1)
+        pool.start()
+        self.wait_for(lambda: pool.fetch_errors >= 2)
+
+        self.assertIsInstance(pool.last_fetch_error, TypeError)
+
+        self.redispy.delete(self.d.name)
+        self.d.extend(range(10))
+        self.wait_for(lambda: len(self.handled) == 10)
+        pool.stop()
+
+        self.assertEqual(sorted(self.handled), range(10))
+
+
+    # on_error & stats
+
+    def test_on_error_RAISE(self):
+        self.d.extend(range(50))
+        errors = []
+
+        def handler(item):
+            raise ValueError(item)
+
+        def on_error(item, e):
+            with self.lock:
+                errors.append(item)
+            raise RuntimeError(item)
+
+        pool = WorkerPool(self.d, handler, concurrency=2, batch_size=5, prefetch=10,
+                          poll_timeout=0.1, on_error=on_error)
+        pool.start()
+        self.wait_for(lambda: len(errors) == 50)
+        pool.stop(timeout=5)
+
+        self.assertFalse(any(thread.is_alive() for thread in pool._threads))
+        self.assertEqual(sorted(errors), range(50))
+        self.assertEqual(sum(s['failed'] for s in pool.stats()), 50)
+
+    def test_on_error_and_stats(self):
+        self.d.extend(range(10))
+        errors = []
+
+        def handler(item):
+            if item % 2:
+                raise ValueError(item)
+
+        pool = WorkerPool(self.d, handler, concurrency=2, poll_timeout=0.1,
+                          on_error=lambda item, e: errors.append(item))
+        pool.start()
+        self.wait_for(lambda: sum(s['processed'] + s['failed'] for s in pool.stats()) == 10)
+        pool.stop()
+
+        stats = pool.stats()
+        self.assertEqual(len(stats), 2)
+        self.assertEqual(sum(s['processed'] for s in stats), 5)
+        self.assertEqual(sum(s['failed'] for s in stats), 5)
+        self.assertEqual(sorted(errors), [1, 3, 5, 7, 9])
+        for s in stats:
+            self.assertGreaterEqual(s['throughput'], 0)
+            self.assertGreaterEqual(s['latency'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
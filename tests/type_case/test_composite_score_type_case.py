@@ -0,0 +1,59 @@
+# coding: utf-8
+
+from unittest import TestCase
+from ooredis.type_case import CompositeScoreTypeCase
+
+class TestCompositeScore(TestCase):
+
+    def setUp(self):
+        # (priority, timestamp, weight)
+        self.c = CompositeScoreTypeCase((0, 9), (0, 2**32-1), (0.0, 1.0, 0.01))
+
+    # __init__
+
+    def test_init_RAISE_when_TOO_MANY_BITS(self):
+        with self.assertRaises(ValueError):
+            CompositeScoreTypeCase((0, 2**32), (0, 2**32))
+
+    def test_init_RAISE_when_WRONG_COLUMN(self):
+        with self.assertRaises(ValueError):
+            CompositeScoreTypeCase((10, 0))
+        with self.assertRaises(ValueError):
+            CompositeScoreTypeCase()
+
+    # encode
+
+    def test_encode_RETURN_FLOAT(self):
+        assert isinstance(self.c.encode((1, 2, 0.5)), float)
+
+    def test_encode_PRESERVE_ORDER(self):
+        values = [(0, 5, 0.5), (1, 0, 0.0), (1, 0, 0.01), (1, 7, 0.0), (9, 2**32-1, 1.0)]
+        scores = [self.c.encode(value) for value in values]
+        assert scores == sorted(scores)
+        assert len(set(scores)) == len(scores)
+
+    def test_encode_RAISE_when_OUT_OF_RANGE(self):
+        with self.assertRaises(TypeError):
+            self.c.encode((10, 0, 0.0))
+
+    def test_encode_RAISE_when_WRONG_LENGTH(self):
+        with self.assertRaises(TypeError):
+            self.c.encode((1, 2))
+
+    # decode
+
+    def test_decode_RETURN_NONE(self):
+        assert self.c.decode(None) is None
+
+    def test_decode_RETURN_TUPLE(self):
+        priority, timestamp, weight = self.c.decode(self.c.encode((3, 1330000000, 0.25)))
+        assert (priority, timestamp) == (3, 1330000000)
+        assert isinstance(priority, int)
+        assert abs(weight - 0.25) < 1e-9
+
+    # leading_range
+
+    def test_leading_range(self):
+        low, high = self.c.leading_range(1, 2)
+        assert low == self.c.encode((1, 0, 0.0))
+        assert high == self.c.encode((2, 2**32-1, 1.0))